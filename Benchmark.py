@@ -0,0 +1,335 @@
+#!/usr/bin/python3
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#/***************************************************************************/
+#/* Raspberry Pi ELM327 OBBII CAN BUS Diagnostic Software.                  */
+#/*                                                                         */
+#/* (C) Jason Birch 2018-05-15 V1.04                                        */
+#/*                                                                         */
+#/* Acquisition benchmark. Drive the ELM327 class against the Emulator for  */
+#/* each acquisition scenario the application performs, and record the      */
+#/* samples per second, request latency, CPU time and memory allocated per  */
+#/* sample as JSON. Compare against a previous JSON result to catch         */
+#/* regressions between releases.                                           */
+#/*                                                                         */
+#/* Usage: ./Benchmark.py [--duration SECONDS] [--output FILE]              */
+#/*                       [--compare BASELINE_FILE] [--tolerance PERCENT]   */
+#/***************************************************************************/
+
+
+
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+import platform
+import tracemalloc
+import ELM327
+import Emulator
+
+
+
+# Seconds to run each scenario for.
+BENCHMARK_DURATION = 5
+# Iterations of each scenario to trace memory allocations for.
+BENCHMARK_ALLOC_ITERATIONS = 20
+# Default file to write the results to.
+BENCHMARK_OUTPUT = "SAVE/BENCHMARK.JSON"
+# Default percentage a result may be worse than the baseline before reported as a regression.
+BENCHMARK_TOLERANCE = 10
+
+# Transports to run each scenario against, and the simulated response delay of each.
+BENCHMARK_TRANSPORTS = {
+	# Measures the cost of the ELM327 class alone.
+	"MEMORY" : 0.0,
+	# Simulates the response time of a typical ELM327 device and ECU.
+	"EMULATOR" : 0.005,
+}
+
+# Results where a higher value is worse.
+LOWER_IS_BETTER = [ "LatencyP50Ms", "LatencyP99Ms", "CpuPerSampleUs", "AllocBytesPerSample" ]
+# Results where a lower value is worse.
+HIGHER_IS_BETTER = [ "SamplesPerSecond" ]
+
+
+
+#/******************************************************/
+#/* Get the list of PIDs configured on the meters tab. */
+#/******************************************************/
+def GetMeterPIDs():
+	Result = []
+	if os.path.isfile("CONFIG/METERS.CFG"):
+		File = open("CONFIG/METERS.CFG", 'r')
+		for TextLine in File:
+			for ThisElement in TextLine.replace("\n", "").split('|'):
+				if ThisElement[:4] == "PID=" and ThisElement[4:] != "":
+					Result.append(ThisElement[4:])
+		File.close()
+	return Result
+
+
+
+#/***********************************************/
+#/* Read a single PID, as a single meter would. */
+#/***********************************************/
+def ScenarioSinglePid(ThisELM327):
+	ThisELM327.DoPID("010C")
+	return 1
+
+
+
+#/*******************************************************/
+#/* Read all PIDs on the meters tab, as MeterData does. */
+#/*******************************************************/
+def ScenarioMeters(ThisELM327):
+	Count = 0
+	for PID in GetMeterPIDs():
+		ThisELM327.DoPID(PID)
+		Count += 1
+	return Count
+
+
+
+#/***********************************************************/
+#/* Take a snapshot of all valid Mode 01 PIDs, as the Frame */
+#/* tab does, with multi-PID requests on CAN.               */
+#/***********************************************************/
+def ScenarioFrame(ThisELM327):
+	return len(ThisELM327.GetFrame().GetValues())
+
+
+
+#/**********************************************************/
+#/* Take a snapshot of each freeze frame, as the Freeze    */
+#/* Frame tab does when refreshed, with multi-PID requests */
+#/* on CAN.                                                */
+#/**********************************************************/
+def ScenarioFreeze(ThisELM327):
+	Count = 0
+	for FreezeIndex in range(ThisELM327.GetFreezeFrameCount()):
+		Count += len(ThisELM327.GetFreezeFrame(FreezeIndex, True).GetValues())
+	return Count
+
+
+
+#/**********************************************************/
+#/* Read the trouble information, as the Trouble tab does. */
+#/**********************************************************/
+def ScenarioTrouble(ThisELM327):
+	ThisELM327.DoPID("0101")
+	# The MIL status, and each trouble code decoded.
+	return 1 + len(ThisELM327.GetTroubleCodeSweep(True).GetCodes())
+
+
+
+#/*****************************************************/
+#/* Read all SAE J1939 SPNs broadcast by a heavy duty */
+#/* vehicle, as the meters would.                     */
+#/*****************************************************/
+def ScenarioJ1939(ThisELM327):
+	Count = 0
+	for PID in sorted(ThisELM327.GetValidPIDs()):
+		if PID[:1] == 'J':
+			ThisELM327.DoPID(PID)
+			Count += 1
+	return Count
+
+
+
+# Scenarios to benchmark, in the order they are run.
+BENCHMARK_SCENARIOS = {
+	"SINGLE_PID" : ScenarioSinglePid,
+	"METERS" : ScenarioMeters,
+	"FRAME" : ScenarioFrame,
+	"FREEZE" : ScenarioFreeze,
+	"TROUBLE" : ScenarioTrouble,
+	"J1939" : ScenarioJ1939,
+}
+# Scenarios run against an emulated vehicle using a CAN protocol, so several PIDs are read in each request.
+CAN_SCENARIOS = [ "FRAME", "FREEZE" ]
+# Scenarios run against an emulated heavy duty vehicle, only broadcasting SAE J1939.
+J1939_SCENARIOS = [ "J1939" ]
+
+
+
+#/**********************************************************/
+#/* Wrap the GetResponse of an ELM327 instance, to record  */
+#/* the time taken for every request to the ELM327 device. */
+#/**********************************************************/
+def RecordLatency(ThisELM327, Latencies):
+	GetResponse = ThisELM327.GetResponse
+	def TimedGetResponse(Data):
+		Start = time.perf_counter()
+		Response = GetResponse(Data)
+		Latencies.append(time.perf_counter() - Start)
+		return Response
+	ThisELM327.GetResponse = TimedGetResponse
+
+
+
+#/*******************************************************/
+#/* Return the value at the given percentile of a list. */
+#/*******************************************************/
+def Percentile(Values, Fraction):
+	Result = 0
+	if len(Values) > 0:
+		Ordered = sorted(Values)
+		Result = Ordered[int(round(Fraction * (len(Ordered) - 1)))]
+	return Result
+
+
+
+#/**************************************************************/
+#/* Connect a new ELM327 instance to a new Emulator instance,  */
+#/* optionally emulating a heavy duty vehicle only             */
+#/* broadcasting SAE J1939, which must be found on connecting, */
+#/* or a vehicle using a CAN protocol.                         */
+#/**************************************************************/
+def ConnectEmulator(Latency, J1939 = False, Can = False):
+	ThisELM327 = ELM327.ELM327()
+	if ThisELM327.Connect(Emulator.Emulator(Latency, J1939 = J1939, Can = Can)) != ELM327.CONNECT_SUCCESS or ThisELM327.GetIsJ1939() != J1939:
+		raise Exception("FAILED TO CONNECT TO EMULATOR: " + ThisELM327.GetInitResult())
+	return ThisELM327
+
+
+
+#/************************************************************/
+#/* Run one scenario against one transport for the duration. */
+#/************************************************************/
+def RunScenario(Transport, Scenario, Duration):
+	ThisELM327 = ConnectEmulator(BENCHMARK_TRANSPORTS[Transport], Scenario in J1939_SCENARIOS, Scenario in CAN_SCENARIOS)
+	ScenarioFunction = BENCHMARK_SCENARIOS[Scenario]
+
+	# Warm up, so lookup tables and caches are populated before measuring.
+	ScenarioFunction(ThisELM327)
+
+	# Measure throughput, latency and CPU time.
+	Latencies = []
+	RecordLatency(ThisELM327, Latencies)
+	Iterations = 0
+	Samples = 0
+	StartCpu = time.process_time()
+	Start = time.perf_counter()
+	while time.perf_counter() - Start < Duration:
+		Samples += ScenarioFunction(ThisELM327)
+		Iterations += 1
+	Elapsed = time.perf_counter() - Start
+	ElapsedCpu = time.process_time() - StartCpu
+	Requests = len(Latencies)
+	LatencyP50 = Percentile(Latencies, 0.50)
+	LatencyP99 = Percentile(Latencies, 0.99)
+
+	# Measure memory allocated while producing each sample.
+	AllocSamples = 0
+	AllocBytes = 0
+	tracemalloc.start()
+	for Count in range(BENCHMARK_ALLOC_ITERATIONS):
+		tracemalloc.reset_peak()
+		Before = tracemalloc.get_traced_memory()[0]
+		AllocSamples += ScenarioFunction(ThisELM327)
+		AllocBytes += tracemalloc.get_traced_memory()[1] - Before
+	tracemalloc.stop()
+	ThisELM327.Close()
+
+	return {
+		"Transport" : Transport,
+		"Scenario" : Scenario,
+		"Iterations" : Iterations,
+		"Samples" : Samples,
+		"Requests" : Requests,
+		"SamplesPerSecond" : Samples / Elapsed if Elapsed > 0 else 0,
+		"LatencyP50Ms" : 1000 * LatencyP50,
+		"LatencyP99Ms" : 1000 * LatencyP99,
+		"CpuPerSampleUs" : 1000000 * ElapsedCpu / Samples if Samples > 0 else 0,
+		"AllocBytesPerSample" : AllocBytes / AllocSamples if AllocSamples > 0 else 0,
+	}
+
+
+
+#/*************************************************************/
+#/* Compare results against a baseline, return a list of text */
+#/* lines describing each result worse than the tolerance.    */
+#/*************************************************************/
+def CompareResults(Results, Baseline, Tolerance):
+	Regressions = []
+	BaselineResults = {}
+	for ThisResult in Baseline["Results"]:
+		BaselineResults[ThisResult["Transport"] + "/" + ThisResult["Scenario"]] = ThisResult
+	for ThisResult in Results["Results"]:
+		Key = ThisResult["Transport"] + "/" + ThisResult["Scenario"]
+		if Key in BaselineResults:
+			for Field in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+				Old = BaselineResults[Key].get(Field, 0)
+				New = ThisResult[Field]
+				if Old > 0:
+					Change = 100 * (New - Old) / Old
+					if (Field in LOWER_IS_BETTER and Change > Tolerance) or (Field in HIGHER_IS_BETTER and -Change > Tolerance):
+						Regressions.append(Key + " " + Field + ": " + "{:0.3f}".format(Old) + " -> " + "{:0.3f}".format(New) + " (" + "{:+0.1f}".format(Change) + "%)")
+	return Regressions
+
+
+
+#/*********************************************/
+#/* Run all scenarios against all transports. */
+#/*********************************************/
+def Main():
+	Parser = argparse.ArgumentParser(description = "Benchmark ELM327 data acquisition against the Emulator.")
+	Parser.add_argument("--duration", type = float, default = BENCHMARK_DURATION, help = "Seconds to run each scenario for.")
+	Parser.add_argument("--output", default = BENCHMARK_OUTPUT, help = "File to write the JSON results to.")
+	Parser.add_argument("--compare", default = None, help = "JSON results of a previous run to compare against.")
+	Parser.add_argument("--tolerance", type = float, default = BENCHMARK_TOLERANCE, help = "Percentage worse than the baseline to report as a regression.")
+	Arguments = Parser.parse_args()
+
+	# Data files are loaded relative to the application directory.
+	os.chdir(os.path.dirname(os.path.abspath(__file__)))
+	# No need to wait for an emulated ELM327 device to settle.
+	ELM327.ELM_CONNECT_SETTLE_PERIOD = 0
+
+	Results = {
+		"Date" : datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+		"Python" : platform.python_version(),
+		"Platform" : platform.platform(),
+		"Duration" : Arguments.duration,
+		"Results" : [],
+	}
+	for Transport in BENCHMARK_TRANSPORTS:
+		for Scenario in BENCHMARK_SCENARIOS:
+			ThisResult = RunScenario(Transport, Scenario, Arguments.duration)
+			Results["Results"].append(ThisResult)
+			print(Transport + "/" + Scenario + ": " + "{:0.1f}".format(ThisResult["SamplesPerSecond"]) + " samples/s")
+
+	File = open(Arguments.output, 'w')
+	json.dump(Results, File, indent = 1)
+	File.close()
+
+	Result = 0
+	if Arguments.compare != None:
+		File = open(Arguments.compare, 'r')
+		Baseline = json.load(File)
+		File.close()
+		Regressions = CompareResults(Results, Baseline, Arguments.tolerance)
+		for ThisRegression in Regressions:
+			print("REGRESSION: " + ThisRegression)
+		if len(Regressions) > 0:
+			Result = 1
+
+	return Result
+
+
+
+if __name__ == "__main__":
+	sys.exit(Main())
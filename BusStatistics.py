@@ -0,0 +1,232 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#/***************************************************************************/
+#/* Raspberry Pi ELM327 OBBII CAN BUS Diagnostic Software.                  */
+#/*                                                                         */
+#/* (C) Jason Birch 2018-05-15 V1.04                                        */
+#/*                                                                         */
+#/* Class: BusStatistics                                                    */
+#/* Keep streaming timing histograms and outcome counters for each command  */
+#/* sent to the ELM327 device, and the overall utilisation of the link.     */
+#/***************************************************************************/
+
+
+
+import time
+import bisect
+
+
+
+# Upper bound of each histogram bucket, in seconds. The final bucket holds everything longer.
+HISTOGRAM_BOUNDS = [ 0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0 ]
+
+# Timings recorded for each request.
+TIMING_WRITE = 0
+TIMING_LATENCY = 1
+TIMING_TRANSFER = 2
+TIMING_END = 3
+
+# Outcomes counted for each request.
+COUNT_REQUESTS = 0
+COUNT_TIMEOUTS = 1
+COUNT_NO_DATA = 2
+COUNT_ERRORS = 3
+COUNT_END = 4
+
+# Response text which indicates an ELM327 or bus error.
+ERROR_RESPONSES = [ "?", "ERROR", "UNABLE TO CONNECT", "STOPPED", "BUFFER FULL", "BUS BUSY" ]
+
+# Maximum number of commands to show in the statistics information.
+INFO_COMMAND_COUNT = 12
+
+# Bits sent on the serial link for each byte, start + 8 data + stop.
+SERIAL_BITS_PER_BYTE = 10
+
+
+
+class BusStatistics:
+	def __init__(self, Baud = 0):
+		# Serial link speed, used to calculate serial utilisation.
+		self.Baud = Baud
+		self.Reset()
+
+
+
+#/*******************************************/
+#/* Discard all statistics gathered so far. */
+#/*******************************************/
+	def Reset(self):
+		self.StartTime = time.perf_counter()
+		# Total time spent waiting on the ELM327 device.
+		self.BusyTime = 0
+		# Total bytes sent and received on the serial link.
+		self.ByteCount = 0
+		# Per command histograms, a list of bucket counts for each timing.
+		self.Histograms = {}
+		# Per command counters and total time.
+		self.Counters = {}
+		self.CommandTime = {}
+		# Counters for all commands.
+		self.Totals = [0] * COUNT_END
+
+
+
+#/************************************************************/
+#/* Reduce a request to the command it is recorded under.    */
+#/* AT commands are recorded by name, OBDII requests by mode */
+#/* and PID.                                                 */
+#/************************************************************/
+	def GetCommand(self, Request):
+		Command = Request.strip().upper()
+		if Command[:2] == "AT":
+			Command = "AT " + Command[2:].strip().split(' ')[0]
+		else:
+			Command = Command.replace(' ', '')[:4]
+		return Command
+
+
+
+#/********************************************************************/
+#/* Record the timing and outcome of a single request to the ELM327. */
+#/********************************************************************/
+	def AddRequest(self, Request, WriteTime, Latency, TransferTime, ByteCount, TimedOut, Response):
+		Command = self.GetCommand(Request)
+		if Command not in self.Histograms:
+			self.Histograms[Command] = [ [0] * (len(HISTOGRAM_BOUNDS) + 1) for Timing in range(TIMING_END) ]
+			self.Counters[Command] = [0] * COUNT_END
+			self.CommandTime[Command] = 0
+
+		# Add the timings to the histograms of the command.
+		Histograms = self.Histograms[Command]
+		Histograms[TIMING_WRITE][bisect.bisect_left(HISTOGRAM_BOUNDS, WriteTime)] += 1
+		Histograms[TIMING_LATENCY][bisect.bisect_left(HISTOGRAM_BOUNDS, Latency)] += 1
+		Histograms[TIMING_TRANSFER][bisect.bisect_left(HISTOGRAM_BOUNDS, TransferTime)] += 1
+		RequestTime = WriteTime + Latency + TransferTime
+		self.CommandTime[Command] += RequestTime
+		self.BusyTime += RequestTime
+		self.ByteCount += ByteCount
+
+		# Count the outcome of the request.
+		Counters = self.Counters[Command]
+		Outcomes = [ COUNT_REQUESTS ]
+		if TimedOut == True:
+			Outcomes.append(COUNT_TIMEOUTS)
+		elif Response.find("NO DATA") != -1:
+			Outcomes.append(COUNT_NO_DATA)
+		else:
+			for ThisError in ERROR_RESPONSES:
+				if Response.find(ThisError) != -1:
+					Outcomes.append(COUNT_ERRORS)
+					break
+		for Outcome in Outcomes:
+			Counters[Outcome] += 1
+			self.Totals[Outcome] += 1
+
+
+
+#/************************************************************/
+#/* Estimate the value at a fraction through a histogram, as */
+#/* the upper bound of the bucket the value falls into.      */
+#/************************************************************/
+	def GetPercentile(self, Histogram, Fraction):
+		Result = 0
+		Total = sum(Histogram)
+		if Total > 0:
+			Target = Fraction * Total
+			Count = 0
+			for Bucket in range(len(Histogram)):
+				Count += Histogram[Bucket]
+				if Count >= Target:
+					if Bucket < len(HISTOGRAM_BOUNDS):
+						Result = HISTOGRAM_BOUNDS[Bucket]
+					else:
+						Result = float("inf")
+					break
+		return Result
+
+
+
+#/*******************************************************************/
+#/* Fraction of elapsed time spent waiting on the ELM327 device and */
+#/* fraction of the serial link bandwidth used.                     */
+#/*******************************************************************/
+	def GetUtilisation(self):
+		Elapsed = time.perf_counter() - self.StartTime
+		LinkUtilisation = 0
+		SerialUtilisation = 0
+		if Elapsed > 0:
+			LinkUtilisation = self.BusyTime / Elapsed
+			if self.Baud > 0:
+				SerialUtilisation = SERIAL_BITS_PER_BYTE * self.ByteCount / (self.Baud * Elapsed)
+		return (LinkUtilisation, SerialUtilisation)
+
+
+
+#/*****************************************************/
+#/* Get the list of commands recorded, busiest first. */
+#/*****************************************************/
+	def GetCommands(self):
+		return sorted(self.CommandTime, key = self.CommandTime.get, reverse = True)
+
+
+
+#/*****************************************************/
+#/* Get the timing histograms recorded for a command. */
+#/*****************************************************/
+	def GetHistograms(self, Command):
+		return self.Histograms.get(Command, None)
+
+
+
+#/****************************************************/
+#/* Get the outcome counters recorded for a command. */
+#/****************************************************/
+	def GetCounters(self, Command):
+		return self.Counters.get(Command, None)
+
+
+
+#/**************************************************/
+#/* Get the outcome counters for all the commands. */
+#/**************************************************/
+	def GetTotals(self):
+		return self.Totals
+
+
+
+#/***************************************************************/
+#/* Get the statistics as text lines, in the same "Label|Value" */
+#/* form as ELM327.GetInfo, for display and the PDF report.     */
+#/***************************************************************/
+	def GetInfo(self):
+		Result = ""
+
+		(LinkUtilisation, SerialUtilisation) = self.GetUtilisation()
+		Result += "Requests|" + str(self.Totals[COUNT_REQUESTS]) + "\n"
+		Result += "Timeouts / NO DATA / Errors|" + str(self.Totals[COUNT_TIMEOUTS]) + " / " + str(self.Totals[COUNT_NO_DATA]) + " / " + str(self.Totals[COUNT_ERRORS]) + "\n"
+		Result += "ELM327 Link Utilisation|" + "{:0.1f}".format(100 * LinkUtilisation) + "%\n"
+		Result += "Serial Port Utilisation|" + "{:0.1f}".format(100 * SerialUtilisation) + "%\n"
+		Result += "Command  Count  Write / ECU Latency / Transfer (p50 p99 ms)|\n"
+		for Command in self.GetCommands()[:INFO_COMMAND_COUNT]:
+			Histograms = self.Histograms[Command]
+			Counters = self.Counters[Command]
+			Timings = ""
+			for Timing in range(TIMING_END):
+				if Timing > 0:
+					Timings += " / "
+				Timings += "{:0.1f}".format(1000 * self.GetPercentile(Histograms[Timing], 0.50))
+				Timings += " " + "{:0.1f}".format(1000 * self.GetPercentile(Histograms[Timing], 0.99))
+			Result += "[" + Command + "] " + str(Counters[COUNT_REQUESTS]) + "|" + Timings + "\n"
+
+		return Result
@@ -0,0 +1,304 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#/***************************************************************************/
+#/* Raspberry Pi ELM327 OBBII CAN BUS Diagnostic Software.                  */
+#/*                                                                         */
+#/* (C) Jason Birch 2018-05-15 V1.04                                        */
+#/*                                                                         */
+#/* Class: CanMonitor                                                       */
+#/* Parse the raw CAN frames streamed by an ELM327 device in monitor mode.  */
+#/* Text is accepted in whatever pieces the serial port delivers it, frames */
+#/* are kept in a bounded ring buffer, frame rates are kept for each CAN ID */
+#/* and signals are decoded from the latest frame of each CAN ID using the  */
+#/* signal definitions of the vehicle.                                      */
+#/***************************************************************************/
+
+
+
+import time
+import collections
+
+
+
+# Default number of frames held in the ring buffer.
+MONITOR_BUFFER_SIZE = 4096
+
+# Longest partial line kept while waiting for the end of line, longer is garbage.
+MONITOR_MAX_LINE = 64
+
+# Lines the ELM327 device sends in monitor mode which are not CAN frames.
+MONITOR_IGNORE_LINES = [ "OK", "?", "STOPPED", "SEARCHING...", "AT MA", "ATMA" ]
+
+# Line the ELM327 device sends when it can no longer keep up with the CAN BUS.
+MONITOR_BUFFER_FULL = "BUFFER FULL"
+
+# Frame fields held in the ring buffer.
+FRAME_TIME = 0
+FRAME_ID = 1
+FRAME_DATA = 2
+
+# Signal definition fields.
+SIGNAL_NAME = 0
+SIGNAL_START_BIT = 1
+SIGNAL_BIT_LENGTH = 2
+SIGNAL_BYTE_ORDER = 3
+SIGNAL_SCALE = 4
+SIGNAL_OFFSET = 5
+SIGNAL_UNITS = 6
+
+# Per CAN ID statistics fields.
+ID_COUNT = 0
+ID_FIRST_TIME = 1
+ID_LAST_TIME = 2
+ID_LAST_DATA = 3
+
+# Set of valid hex characters in a CAN frame line.
+HEX_DIGITS = set("0123456789ABCDEF")
+
+
+
+class CanMonitor:
+	def __init__(self, BufferSize = MONITOR_BUFFER_SIZE):
+		# Signals defined for each CAN ID, loaded from the vehicle signal file.
+		self.Signals = {}
+		self.BufferSize = BufferSize
+		self.Reset()
+
+
+
+#/******************************************************/
+#/* Discard all frames and statistics gathered so far. */
+#/******************************************************/
+	def Reset(self):
+		# Ring buffer of the most recent frames, oldest frames drop off when full.
+		self.Frames = collections.deque(maxlen = self.BufferSize)
+		# Text received after the last end of line, waiting for the rest of the line.
+		self.PartialLine = ""
+		# Count, first time, last time and last data seen for each CAN ID.
+		self.Ids = {}
+		self.FrameCount = 0
+		self.DroppedCount = 0
+		self.BadLineCount = 0
+		# Number of times the ELM327 device reported its buffer overflowed.
+		self.OverflowCount = 0
+		# The ELM327 device has stopped monitoring, on an overflow or a prompt.
+		self.Stopped = False
+
+
+
+#/**********************************************************/
+#/* Load the CAN signal definitions for a vehicle. Each    */
+#/* line is: ID Name|StartBit|BitLength|Order|Scale|Offset */
+#/* |Units, where Order is L for little endian (Intel) or  */
+#/* B for big endian (Motorola) and StartBit is the least  */
+#/* significant bit counting from bit 0 of the first byte. */
+#/**********************************************************/
+	def LoadSignals(self, SignalFile):
+		Result = True
+		self.ClearSignals()
+		try:
+			with open(SignalFile) as ThisFile:
+				for ThisLine in ThisFile:
+					CanId, Definition = ThisLine.strip().partition(" ")[::2]
+					Fields = Definition.split('|')
+					if CanId != "" and len(Fields) > SIGNAL_UNITS:
+						ThisSignal = [ Fields[SIGNAL_NAME], int(Fields[SIGNAL_START_BIT]), int(Fields[SIGNAL_BIT_LENGTH]), Fields[SIGNAL_BYTE_ORDER].upper(), float(Fields[SIGNAL_SCALE]), float(Fields[SIGNAL_OFFSET]), Fields[SIGNAL_UNITS] ]
+						self.Signals.setdefault(CanId.upper(), []).append(ThisSignal)
+		except Exception as Catch:
+			print(SignalFile + " : " + str(Catch))
+			Result = False
+		return Result
+
+
+
+#/**************************************/
+#/* Forget all CAN signal definitions. */
+#/**************************************/
+	def ClearSignals(self):
+		self.Signals = {}
+
+
+
+#/*******************************************************/
+#/* Get the list of CAN IDs which have signals defined. */
+#/*******************************************************/
+	def GetSignalIds(self):
+		return sorted(self.Signals)
+
+
+
+#/***************************************************************/
+#/* Add text received from the ELM327 device in monitor mode.   */
+#/* Text may end part way through a line, the remainder is kept */
+#/* until the next call. Return the number of frames added.     */
+#/***************************************************************/
+	def AddData(self, Text, ThisTime = None):
+		if ThisTime == None:
+			ThisTime = time.perf_counter()
+		Count = 0
+		Lines = (self.PartialLine + Text).replace('\n', '\r').split('\r')
+		# The last piece has not yet been terminated, keep it for next time.
+		self.PartialLine = Lines.pop()
+		if self.PartialLine.find('>') != -1:
+			# A prompt means the ELM327 device is no longer monitoring.
+			self.Stopped = True
+			Lines.append(self.PartialLine.replace('>', ''))
+			self.PartialLine = ""
+		elif len(self.PartialLine) > MONITOR_MAX_LINE:
+			self.BadLineCount += 1
+			self.PartialLine = ""
+		for ThisLine in Lines:
+			if self.AddLine(ThisLine.strip().replace(' ', ''), ThisTime) == True:
+				Count += 1
+		return Count
+
+
+
+#/**********************************************************/
+#/* Parse a single line from the ELM327 device. With space */
+#/* characters off, an 11 bit CAN ID frame line has 3 hex  */
+#/* digits of ID and a 29 bit one 8, so the line length is */
+#/* odd for 11 bit and even for 29 bit frames.             */
+#/**********************************************************/
+	def AddLine(self, ThisLine, ThisTime):
+		Result = False
+		if ThisLine == "" or ThisLine in MONITOR_IGNORE_LINES:
+			pass
+		elif ThisLine == MONITOR_BUFFER_FULL.replace(' ', ''):
+			self.OverflowCount += 1
+			self.Stopped = True
+		elif not set(ThisLine) <= HEX_DIGITS or len(ThisLine) < 3:
+			self.BadLineCount += 1
+		else:
+			if len(ThisLine) % 2 == 1:
+				CanId = ThisLine[:3]
+				Data = ThisLine[3:]
+			else:
+				CanId = ThisLine[:8]
+				Data = ThisLine[8:]
+			if len(self.Frames) == self.BufferSize:
+				self.DroppedCount += 1
+			self.Frames.append((ThisTime, CanId, Data))
+			self.FrameCount += 1
+			if CanId in self.Ids:
+				IdStatistics = self.Ids[CanId]
+				IdStatistics[ID_COUNT] += 1
+				IdStatistics[ID_LAST_TIME] = ThisTime
+				IdStatistics[ID_LAST_DATA] = Data
+			else:
+				self.Ids[CanId] = [ 1, ThisTime, ThisTime, Data ]
+			Result = True
+		return Result
+
+
+
+#/**************************************************************/
+#/* Check if the ELM327 device has stopped monitoring, because */
+#/* its buffer filled or a prompt was received. Clear the flag */
+#/* ready for monitoring to be restarted.                      */
+#/**************************************************************/
+	def IsStopped(self):
+		Result = self.Stopped
+		self.Stopped = False
+		return Result
+
+
+
+#/**************************************************************/
+#/* Get the frames currently in the ring buffer, oldest first. */
+#/**************************************************************/
+	def GetFrames(self):
+		return list(self.Frames)
+
+
+
+#/*******************************************************/
+#/* Get the frames per second received for each CAN ID, */
+#/* over the period between its first and last frame.   */
+#/*******************************************************/
+	def GetRates(self):
+		Rates = {}
+		for CanId in self.Ids:
+			IdStatistics = self.Ids[CanId]
+			Period = IdStatistics[ID_LAST_TIME] - IdStatistics[ID_FIRST_TIME]
+			if Period > 0:
+				Rates[CanId] = (IdStatistics[ID_COUNT] - 1) / Period
+			else:
+				Rates[CanId] = 0
+		return Rates
+
+
+
+#/************************************************************/
+#/* Extract a value from the data bytes of a CAN frame, as a */
+#/* signal definition describes.                             */
+#/************************************************************/
+	def DecodeSignal(self, Data, ThisSignal):
+		DataBytes = bytes.fromhex(Data)
+		if ThisSignal[SIGNAL_BYTE_ORDER] == "B":
+			RawValue = int.from_bytes(DataBytes, "big")
+			Shift = 8 * len(DataBytes) - ThisSignal[SIGNAL_START_BIT] - ThisSignal[SIGNAL_BIT_LENGTH]
+		else:
+			RawValue = int.from_bytes(DataBytes, "little")
+			Shift = ThisSignal[SIGNAL_START_BIT]
+		if Shift < 0:
+			raise ValueError("SIGNAL " + ThisSignal[SIGNAL_NAME] + " OUTSIDE FRAME DATA")
+		RawValue = (RawValue >> Shift) & ((1 << ThisSignal[SIGNAL_BIT_LENGTH]) - 1)
+		return RawValue * ThisSignal[SIGNAL_SCALE] + ThisSignal[SIGNAL_OFFSET]
+
+
+
+#/*********************************************************/
+#/* Decode all defined signals from the latest frame seen */
+#/* for each CAN ID. Only the latest frame is decoded, so */
+#/* the cost does not rise with the CAN BUS frame rate.   */
+#/* Return a dictionary of name to (value, units).        */
+#/*********************************************************/
+	def GetSignals(self):
+		Result = {}
+		for CanId in self.Signals:
+			if CanId in self.Ids:
+				Data = self.Ids[CanId][ID_LAST_DATA]
+				for ThisSignal in self.Signals[CanId]:
+					try:
+						Result[ThisSignal[SIGNAL_NAME]] = (self.DecodeSignal(Data, ThisSignal), ThisSignal[SIGNAL_UNITS])
+					except Exception as Catch:
+						print(str(Catch))
+		return Result
+
+
+
+#/*************************************************************/
+#/* Get the monitor results as text lines, in the same        */
+#/* "Label|Value" form as ELM327.GetInfo, for display and the */
+#/* PDF report.                                               */
+#/*************************************************************/
+	def GetInfo(self):
+		Result = ""
+
+		Result += "Frames Received|" + str(self.FrameCount) + "\n"
+		Result += "Frames Dropped From Buffer|" + str(self.DroppedCount) + "\n"
+		Result += "ELM327 Buffer Full|" + str(self.OverflowCount) + "\n"
+		Result += "Unreadable Lines|" + str(self.BadLineCount) + "\n"
+		Result += "CAN ID  Frames|Frames Per Second\n"
+		Rates = self.GetRates()
+		for CanId in sorted(Rates):
+			Result += "[" + CanId + "] " + str(self.Ids[CanId][ID_COUNT]) + "|" + "{:0.1f}".format(Rates[CanId]) + "\n"
+		Signals = self.GetSignals()
+		if len(Signals) > 0:
+			Result += "Signal|Value\n"
+			for Name in sorted(Signals):
+				Result += Name + "|" + "{:0.2f}".format(Signals[Name][0]) + " " + Signals[Name][1] + "\n"
+
+		return Result
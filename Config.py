@@ -35,6 +35,13 @@ ConfigValues = {
 	"FontName" : "freemono",
 	"SerialPort" : "/dev/serial/by-id/usb-FTDI_FT232R_USB_UART_A800eaG9-if00-port0",
 	"Vehicle" : "DATA/TroubleCodes-R53_Cooper_S.txt",
+	# Session log compression, LOSSLESS, DEADBAND or SWINGING_DOOR.
+	"LogCompression" : "LOSSLESS",
+	# Longest seconds session log samples are held before they are written, and the bytes written together.
+	"LogFlushPeriod" : "5.0",
+	"LogWriteBatch" : "65536",
+	# Overlay the statistics of the values read on the meters and plots, ON or OFF.
+	"StatisticsOverlay" : "ON",
 }
 
 
@@ -55,6 +62,14 @@ def LoadConfig():
 				ConfigValues["SerialPort"] = str(TextLine[11:])
 			elif TextLine[:8] == "Vehicle=":
 				ConfigValues["Vehicle"] = str(TextLine[8:])
+			elif TextLine[:15] == "LogCompression=":
+				ConfigValues["LogCompression"] = str(TextLine[15:])
+			elif TextLine[:15] == "LogFlushPeriod=":
+				ConfigValues["LogFlushPeriod"] = str(TextLine[15:])
+			elif TextLine[:14] == "LogWriteBatch=":
+				ConfigValues["LogWriteBatch"] = str(TextLine[14:])
+			elif TextLine[:18] == "StatisticsOverlay=":
+				ConfigValues["StatisticsOverlay"] = str(TextLine[18:])
 		File.close()
 
 
@@ -67,6 +82,10 @@ def SaveConfig():
 	File.write("FontName=" + str(ConfigValues["FontName"]) + "\n")
 	File.write("SerialPort=" + str(ConfigValues["SerialPort"]) + "\n")
 	File.write("Vehicle=" + str(ConfigValues["Vehicle"]) + "\n")
+	File.write("LogCompression=" + str(ConfigValues["LogCompression"]) + "\n")
+	File.write("LogFlushPeriod=" + str(ConfigValues["LogFlushPeriod"]) + "\n")
+	File.write("LogWriteBatch=" + str(ConfigValues["LogWriteBatch"]) + "\n")
+	File.write("StatisticsOverlay=" + str(ConfigValues["StatisticsOverlay"]) + "\n")
 	File.close()
 
 
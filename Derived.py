@@ -0,0 +1,196 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#/***************************************************************************/
+#/* Raspberry Pi ELM327 OBBII CAN BUS Diagnostic Software.                  */
+#/*                                                                         */
+#/* (C) Jason Birch 2018-05-15 V1.04                                        */
+#/*                                                                         */
+#/* Class: Derived                                                          */
+#/* Virtual PIDs, calculated from the values of real PIDs rather than read  */
+#/* from the ECU. Each virtual PID is an arithmetic expression of Mode 01   */
+#/* PIDs, read from a table. The latest value of each real PID is kept as   */
+#/* it is read, and a virtual PID is only calculated again when one of its  */
+#/* inputs has changed.                                                     */
+#/***************************************************************************/
+
+
+
+import ast
+import re
+import time
+
+
+
+# Names an expression can use for the value of a Mode 01 PID, P followed by the PID.
+INPUT_NAME_FORMAT = re.compile("^P(01[0-9A-F]{2})$")
+
+# Functions an expression can use.
+EXPRESSION_FUNCTIONS = { "abs" : abs, "min" : min, "max" : max }
+
+# Parts of the Python syntax an expression can be made from. Powers are not allowed, as a large power would hold up reading the ECU.
+EXPRESSION_NODES = ( ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.Name, ast.Load, ast.Call, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.USub, ast.UAdd )
+
+# Input value fields.
+INPUT_VALUE = 0
+INPUT_TIME = 1
+
+
+
+class Derived:
+	def __init__(self, DefinitionFile = "DATA/VirtualPids.txt"):
+		self.InitResult = ""
+		# Compiled expression of each virtual PID.
+		self.Expressions = {}
+		# Real PIDs each virtual PID is calculated from.
+		self.Inputs = {}
+		# Virtual PIDs calculated from each real PID.
+		self.Dependents = {}
+		self.Reset()
+
+		try:
+			with open(DefinitionFile) as ThisFile:
+				for ThisLine in ThisFile:
+					VirtualPid, Expression = ThisLine.strip().partition(" ")[::2]
+					if VirtualPid != "":
+						try:
+							self.AddVirtualPid(VirtualPid, Expression)
+						except Exception as Catch:
+							print(DefinitionFile + " : " + VirtualPid + " : " + str(Catch))
+							self.InitResult += "INVALID VIRTUAL PID: " + VirtualPid + "\n"
+		except Exception as Catch:
+			print(DefinitionFile + " : " + str(Catch))
+			self.InitResult += "FAILED TO READ FILE: " + DefinitionFile + "\n"
+
+
+
+#/*************************************************/
+#/* Get any errors or warnings which occured      */
+#/* during creation of an instance of this class. */
+#/*************************************************/
+	def GetInitResult(self):
+		return self.InitResult
+
+
+
+#/*****************************************************/
+#/* Forget all real PID values and calculated values. */
+#/*****************************************************/
+	def Reset(self):
+		# Latest value and time read of each real PID.
+		self.Values = {}
+		# Latest calculated value of each virtual PID.
+		self.Results = {}
+		# Virtual PIDs with an input changed since they were last calculated.
+		self.Changed = set()
+
+
+
+#/*************************************************************/
+#/* Define a virtual PID from an expression. Only arithmetic, */
+#/* numbers, the functions abs, min and max, and input names  */
+#/* are allowed, so the table can not run any other code.     */
+#/*************************************************************/
+	def AddVirtualPid(self, VirtualPid, Expression):
+		Tree = ast.parse(Expression, mode = "eval")
+		Inputs = []
+		for Node in ast.walk(Tree):
+			if not isinstance(Node, EXPRESSION_NODES):
+				raise ValueError("NOT ALLOWED IN EXPRESSION: " + type(Node).__name__)
+			if isinstance(Node, ast.Call) and (not isinstance(Node.func, ast.Name) or Node.func.id not in EXPRESSION_FUNCTIONS):
+				raise ValueError("UNKNOWN FUNCTION IN EXPRESSION")
+			if isinstance(Node, ast.Name) and Node.id not in EXPRESSION_FUNCTIONS:
+				Match = INPUT_NAME_FORMAT.match(Node.id)
+				if Match == None:
+					raise ValueError("UNKNOWN NAME IN EXPRESSION: " + Node.id)
+				if Match.group(1) not in Inputs:
+					Inputs.append(Match.group(1))
+		self.Expressions[VirtualPid] = compile(Tree, VirtualPid, "eval")
+		self.Inputs[VirtualPid] = Inputs
+		for PID in Inputs:
+			self.Dependents.setdefault(PID, []).append(VirtualPid)
+		self.Changed.add(VirtualPid)
+
+
+
+#/***********************************************************/
+#/* Get the virtual PIDs which can be calculated from a set */
+#/* of valid PIDs, those which have all their inputs valid. */
+#/***********************************************************/
+	def GetVirtualPids(self, ValidPIDs):
+		Result = []
+		for VirtualPid in sorted(self.Expressions):
+			if all(PID in ValidPIDs for PID in self.Inputs[VirtualPid]):
+				Result.append(VirtualPid)
+		return Result
+
+
+
+#/*******************************************************/
+#/* Get the real PIDs a virtual PID is calculated from. */
+#/*******************************************************/
+	def GetInputs(self, VirtualPid):
+		return self.Inputs.get(VirtualPid, [])
+
+
+
+#/***********************************************************/
+#/* Keep the latest value read of a real PID. Virtual PIDs  */
+#/* using it are marked to be calculated again, only if the */
+#/* value has changed.                                      */
+#/***********************************************************/
+	def SetValue(self, PID, Value, ThisTime = None):
+		if PID in self.Dependents:
+			if ThisTime == None:
+				ThisTime = time.time()
+			if PID not in self.Values or self.Values[PID][INPUT_VALUE] != Value:
+				self.Changed.update(self.Dependents[PID])
+			self.Values[PID] = (Value, ThisTime)
+
+
+
+#/************************************************************/
+#/* Get the inputs of a virtual PID which have not been read */
+#/* within a number of seconds, and so need reading again.   */
+#/************************************************************/
+	def GetStaleInputs(self, VirtualPid, MaxAge, ThisTime = None):
+		if ThisTime == None:
+			ThisTime = time.time()
+		Result = []
+		for PID in self.GetInputs(VirtualPid):
+			if PID not in self.Values or ThisTime - self.Values[PID][INPUT_TIME] > MaxAge:
+				Result.append(PID)
+		return Result
+
+
+
+#/**************************************************************/
+#/* Get the value of a virtual PID from the latest values of   */
+#/* its inputs. Return None when an input has not been read or */
+#/* the value can't be calculated, such as economy at a stop.  */
+#/**************************************************************/
+	def GetValue(self, VirtualPid):
+		if VirtualPid in self.Changed:
+			self.Changed.discard(VirtualPid)
+			Result = None
+			Names = dict(EXPRESSION_FUNCTIONS)
+			for PID in self.Inputs[VirtualPid]:
+				if PID in self.Values:
+					Names["P" + PID] = self.Values[PID][INPUT_VALUE]
+			if len(Names) == len(EXPRESSION_FUNCTIONS) + len(self.Inputs[VirtualPid]):
+				try:
+					Result = eval(self.Expressions[VirtualPid], { "__builtins__" : {} }, Names)
+				except (ArithmeticError, TypeError):
+					pass
+			self.Results[VirtualPid] = Result
+		return self.Results.get(VirtualPid)
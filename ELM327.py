@@ -23,8 +23,21 @@
 
 
 
+import os
+import re
 import time
 import serial
+import BusStatistics
+import PidStatistics
+import CanMonitor
+import J1939
+import Derived
+import Enhanced
+import MonitorTests
+import Snapshot
+import TroubleCodeSweep
+import TroubleCodeIndex
+import VehicleIdentity
 
 
 
@@ -36,9 +49,61 @@ CONNECT_CAN_BUS_FAIL = 2
 SERIAL_PORT_NAME = None
 SERIAL_PORT_BAUD = 38400
 SERIAL_PORT_TIME_OUT = 7
+# Serial port read time out while monitoring the CAN BUS, so reads return what is available.
+MONITOR_READ_TIME_OUT = 0.05
 
 # ELM327 Device related constants.
 ELM_CONNECT_SETTLE_PERIOD = 5
+# Seconds to listen for SAE J1939 broadcasts when connecting to a heavy duty vehicle.
+J1939_LISTEN_PERIOD = 2
+# Seconds the link may be idle before a heartbeat request, within the K-line P3 maximum of 5 seconds.
+KEEP_ALIVE_IDLE_PERIOD = 3
+# Seconds between wakeup messages the ELM327 device sends by itself while idle on a K-line protocol.
+KEEP_ALIVE_WAKEUP_PERIOD = 2
+# Unit of the ELM327 wakeup message period (AT SW), in seconds.
+KEEP_ALIVE_WAKEUP_UNIT = 0.02
+# Seconds a real PID value can be used to calculate virtual PIDs, before it is read again.
+DERIVED_MAX_AGE = 2
+
+# OBDII protocol numbers (AT DPN) of K-line protocols, which need a slow initialisation of the ECU session.
+KLINE_PROTOCOLS = [ "3", "4", "5" ]
+# OBDII protocol numbers (AT DPN) of CAN protocols, which accept several PIDs in a single request.
+CAN_PROTOCOLS = [ "6", "7", "8", "9" ]
+# OBDII protocol number (AT SP) of SAE J1939, CAN broadcasts only read by monitoring the CAN BUS.
+J1939_PROTOCOL = "A"
+# Most PIDs which can be sent in a single CAN request.
+MULTI_PID_MAX = 6
+# Scaling of each Mode 05 test (TID) result, into volts or seconds.
+MODE05_SCALING = { "01" : 0.005, "02" : 0.005, "03" : 0.005, "04" : 0.005, "05" : 0.004, "06" : 0.004, "07" : 0.005, "08" : 0.005, "09" : 0.04, "0A" : 0.04 }
+# ELM327 default header (AT SH) of each OBDII protocol number, restored after enhanced PID requests.
+DEFAULT_HEADERS = { "1" : "616AF1", "2" : "686AF1", "3" : "686AF1", "4" : "C133F1", "5" : "C133F1", "6" : "7DF", "7" : "18DB33F1", "8" : "7DF", "9" : "18DB33F1" }
+# OBDII protocol numbers (AT DPN) of CAN protocols with 29 bit CAN IDs, the others have 11 bit CAN IDs.
+CAN_29BIT_PROTOCOLS = [ "7", "9" ]
+# Modes read in a trouble code sweep, and the kind of trouble code each mode reads.
+TROUBLE_CODE_MODES = [ ("03", TroubleCodeSweep.KIND_STORED), ("07", TroubleCodeSweep.KIND_PENDING), ("0A", TroubleCodeSweep.KIND_PERMANENT) ]
+
+# PIDs returning a bitmap of the supported PIDs in the following range, each returning 4 data bytes.
+BITMAP_PIDS = [ "00", "20", "40", "60", "80", "A0", "C0" ]
+BITMAP_DATA_LENGTH = 4
+
+# Number of data bytes returned for each Mode 01 / Mode 02 PID, so several PIDs can be split from one response.
+PID_DATA_LENGTHS = {
+	"00" : 4, "01" : 4, "02" : 2, "03" : 2, "04" : 1, "05" : 1, "06" : 1, "07" : 1,
+	"08" : 1, "09" : 1, "0A" : 1, "0B" : 1, "0C" : 2, "0D" : 1, "0E" : 1, "0F" : 1,
+	"10" : 2, "11" : 1, "12" : 1, "13" : 1, "14" : 2, "15" : 2, "16" : 2, "17" : 2,
+	"18" : 2, "19" : 2, "1A" : 2, "1B" : 2, "1C" : 1, "1D" : 1, "1E" : 1, "1F" : 2,
+	"20" : 4, "21" : 2, "22" : 2, "23" : 2, "24" : 4, "25" : 4, "26" : 4, "27" : 4,
+	"28" : 4, "29" : 4, "2A" : 4, "2B" : 4, "2C" : 1, "2D" : 1, "2E" : 1, "2F" : 1,
+	"30" : 1, "31" : 2, "32" : 2, "33" : 1, "34" : 4, "35" : 4, "36" : 4, "37" : 4,
+	"38" : 4, "39" : 4, "3A" : 4, "3B" : 4, "3C" : 2, "3D" : 2, "3E" : 2, "3F" : 2,
+	"40" : 4, "41" : 4, "42" : 2, "43" : 2, "44" : 2, "45" : 1, "46" : 1, "47" : 1,
+	"48" : 1, "49" : 1, "4A" : 1, "4B" : 1, "4C" : 1, "4D" : 2, "4E" : 2, "4F" : 4,
+	"50" : 4, "51" : 1, "52" : 1, "53" : 2, "54" : 2, "55" : 2, "56" : 2, "57" : 2,
+	"58" : 2, "59" : 2, "5A" : 1, "5B" : 1, "5C" : 1, "5D" : 2, "5E" : 2, "5F" : 1,
+	"60" : 4,
+}
+# Response text showing the ECU session was lost, and the ELM327 device had to initialise it again.
+SESSION_DROP_RESPONSES = [ "BUS INIT", "UNABLE TO CONNECT", "BUS ERROR", "FB ERROR" ]
 
 # Constant string responses.
 STRING_NOT_IMPLEMENTED = "!NOT IMPLEMENTED!"
@@ -58,12 +123,17 @@ FIELD_PID_FORMAT_2 = 5
 FIELD_PID_MIN_2 = 6
 FIELD_PID_MAX_2 = 7
 FIELD_PID_HIGH_2 = 8
+# Decimal places of a PID value format, giving the resolution the value is displayed at.
+PID_FORMAT_DECIMALS = re.compile(r"\.([0-9]+)f\}")
 
 
 
 # PID Numbers and their function pointers implemented in this class.
 PidFunctions = {}
 
+# PID prefixes and their function pointers, for PIDs which are not requested individually.
+ModeFunctions = {}
+
 
 
 class ELM327:
@@ -71,8 +141,61 @@ class ELM327:
 		self.InitResult = ""
 		self.ValidPIDs = {}
 		self.ValidFreezePIDs = {}
+		# Freeze frames which have had their supported PIDs discovered.
+		self.FreezeFramesDiscovered = []
+		# Latest snapshot of each freeze frame.
+		self.FreezeSnapshots = {}
+		# Latest snapshot of the Mode 01 PIDs.
+		self.FrameSnapshot = None
+		# PID data already fetched in a batch, used instead of a request for each PID.
+		self.PrefetchData = {}
+		# Mode 06 on-board monitor test results of this drive cycle, None until read.
+		self.MonitorTests = MonitorTests.MonitorTests()
+		self.InitResult += self.MonitorTests.GetInitResult()
+		self.MonitorMidsDiscovered = False
+		self.MonitorTestResults = None
+		# Mode 05 oxygen sensor test results, None until read.
+		self.OxygenSensorResults = None
+		# Latest sweep of the trouble codes of every ECU, None until read, and every sweep taken since connecting.
+		self.TroubleCodes = None
+		self.SessionTroubleCodes = []
+		# Mode 09 vehicle information of the vehicle connected to, None until read, and of each vehicle seen before.
+		self.VehicleInfo = None
+		# VIN of the vehicle connected to, read once each connect, None until read, and the VIN as given by PID 0902.
+		self.Vin = None
+		self.VinData = None
+		self.VehicleIdentity = VehicleIdentity.VehicleIdentity()
+		# Session log every live value read is logged to, None when not logging.
+		self.SessionLog = None
+		# Session log replayed in place of the ECU, None when connecting to the ECU.
+		self.Replay = None
 		self.MilOn = False
 		self.FreezeFrameCount = 0
+		self.Statistics = BusStatistics.BusStatistics(SERIAL_PORT_BAUD)
+		# Statistics of the live values read of each PID during the session.
+		self.PidStatistics = PidStatistics.PidStatistics()
+		self.Monitor = CanMonitor.CanMonitor()
+		self.Monitoring = False
+		# OBDII protocol number connected with, and ECU session keep alive state. A K-line ECU session needs keeping
+		# alive while idle, by the ELM327 device wakeup messages when enabled, otherwise by heartbeat requests.
+		self.Protocol = ""
+		self.KeepAliveNeeded = False
+		self.KeepAliveEnabled = False
+		self.LastRequestTime = 0
+		self.SessionActive = False
+		self.SessionDropped = False
+		self.SessionDropCount = 0
+		# Connected to a heavy duty vehicle broadcasting SAE J1939, rather than OBDII.
+		self.IsJ1939 = False
+		self.J1939 = J1939.J1939()
+		self.InitResult += self.J1939.GetInitResult()
+		# Virtual PIDs, calculated from the values of real PIDs.
+		self.Derived = Derived.Derived()
+		self.InitResult += self.Derived.GetInitResult()
+		# Manufacturer enhanced PIDs of the configured vehicle.
+		self.Enhanced = Enhanced.Enhanced()
+		# Header (AT SH) set for enhanced PID requests, empty when the protocol default.
+		self.Header = ""
 
 #  /*************************************************/
 # /* Read Vehicle OBD Standards lookup table data. */
@@ -129,6 +252,9 @@ class ELM327:
 #  /**********************************************************/
 # /* Read OBDII Trouble Code Description lookup table data. */
 #/**********************************************************/
+		# Compiled trouble code indexes, kept so they are only opened once.
+		self.IsoTroubleCodes = None
+		self.VehicleTroubleCodes = {}
 		self.LoadVehicle("DATA/TroubleCodes-R53_Cooper_S.txt")
 
 #  /***************************************************/
@@ -167,6 +293,30 @@ class ELM327:
 		except:
 			self.InitResult += "FAILED TO READ FILE: DATA/PidDescriptionsMode09.txt\n"
 
+#  /*************************************************/
+# /* Read J1939 SPN description lookup table data. */
+#/*************************************************/
+		self.PidDescriptionsJ1939 = {}
+		try:
+			with open("DATA/PidDescriptionsJ1939.txt") as ThisFile:
+				for ThisLine in ThisFile:
+					Digit, Code = ThisLine.partition(" ")[::2]
+					self.PidDescriptionsJ1939[Digit] = Code.strip()
+		except:
+			self.InitResult += "FAILED TO READ FILE: DATA/PidDescriptionsJ1939.txt\n"
+
+#  /***************************************************/
+# /* Read virtual PID description lookup table data. */
+#/***************************************************/
+		self.PidDescriptionsVirtual = {}
+		try:
+			with open("DATA/PidDescriptionsVirtual.txt") as ThisFile:
+				for ThisLine in ThisFile:
+					Digit, Code = ThisLine.partition(" ")[::2]
+					self.PidDescriptionsVirtual[Digit] = Code.strip()
+		except:
+			self.InitResult += "FAILED TO READ FILE: DATA/PidDescriptionsVirtual.txt\n"
+
 
 
 	def __del__(self):
@@ -175,30 +325,42 @@ class ELM327:
 
 
 
-#/******************************************************/
-#/* Load the trouble codes for the configured vehicle. */
-#/******************************************************/
+#/***************************************************************/
+#/* Load the trouble codes for the configured vehicle. The text */
+#/* files are compiled into indexes, which are opened again     */
+#/* rather than read, and only compiled again when changed.     */
+#/***************************************************************/
 	def LoadVehicle(self, VehicleFile):
-		self.TroubleCodeDescriptions = {}
 		# Load the ISO/SAE Trouble Code Descriptions.
-		try:
-			with open("DATA/TroubleCodes-ISO-SAE.txt") as ThisFile:
-				for ThisLine in ThisFile:
-					Code, Description = ThisLine.partition(" ")[::2]
-					self.TroubleCodeDescriptions[Code] = Description.strip()
-		except Exception as Catch:
-			print(STRING_ERROR + " DATA/TroubleCodes-ISO-SAE.txt : " + str(Catch))
-			self.InitResult += "FAILED TO READ FILE: DATA/TroubleCodes-ISO-SAE.txt\n"
+		if self.IsoTroubleCodes == None:
+			self.IsoTroubleCodes = TroubleCodeIndex.TroubleCodeIndex("DATA/TroubleCodes-ISO-SAE.txt")
+		else:
+			self.IsoTroubleCodes.Refresh()
+		self.InitResult += self.IsoTroubleCodes.GetInitResult()
 
-		# Load the Vehicle/Manufacturer Trouble Code Descriptions.
-		try:
-			with open(VehicleFile) as ThisFile:
-				for ThisLine in ThisFile:
-					Code, Description = ThisLine.partition(" ")[::2]
-					self.TroubleCodeDescriptions[Code] = Description.strip()
-		except Exception as Catch:
-			print(STRING_ERROR + " " + VehicleFile + " : " + str(Catch))
-			self.InitResult += "FAILED TO READ FILE: " + VehicleFile + "\n"
+		# Load the Vehicle/Manufacturer Trouble Code Descriptions, laid over the ISO/SAE descriptions.
+		if VehicleFile not in self.VehicleTroubleCodes:
+			self.VehicleTroubleCodes[VehicleFile] = TroubleCodeIndex.TroubleCodeIndex(VehicleFile, self.IsoTroubleCodes)
+		else:
+			self.VehicleTroubleCodes[VehicleFile].Refresh()
+		self.TroubleCodeDescriptions = self.VehicleTroubleCodes[VehicleFile]
+		self.InitResult += self.TroubleCodeDescriptions.GetInitResult()
+
+		# Load the Vehicle CAN signal definitions, when the vehicle has any.
+		SignalFile = VehicleFile.replace("TroubleCodes-", "Signals-")
+		if SignalFile != VehicleFile and os.path.isfile(SignalFile):
+			if self.Monitor.LoadSignals(SignalFile) == False:
+				self.InitResult += "FAILED TO READ FILE: " + SignalFile + "\n"
+		else:
+			self.Monitor.ClearSignals()
+
+		# Load the Vehicle enhanced PID pack, when the vehicle has one.
+		PackFile = VehicleFile.replace("TroubleCodes-", "EnhancedPids-")
+		if PackFile != VehicleFile and os.path.isfile(PackFile):
+			if self.Enhanced.Load(PackFile) == False:
+				self.InitResult += "FAILED TO READ FILE: " + PackFile + "\n"
+		else:
+			self.Enhanced.Clear()
 
 
 
@@ -249,6 +411,139 @@ class ELM327:
 
 
 
+#/***************************************************************/
+#/* Check if connected to a vehicle using SAE J1939, not OBDII. */
+#/***************************************************************/
+	def GetIsJ1939(self):
+		return self.IsJ1939
+
+
+
+#/*************************************************/
+#/* Get the OBDII protocol number connected with. */
+#/*************************************************/
+	def GetProtocol(self):
+		return self.Protocol
+
+
+
+#/*******************************************************/
+#/* Check if connected with a CAN protocol, which sends */
+#/* several PIDs in a single request.                   */
+#/*******************************************************/
+	def IsCan(self):
+		return self.Protocol in CAN_PROTOCOLS
+
+
+
+#/***************************************************************/
+#/* Check if connected to a CAN BUS, with an OBDII CAN protocol */
+#/* or SAE J1939, so the CAN BUS can be monitored.              */
+#/***************************************************************/
+	def IsCanBus(self):
+		return self.IsCan() == True or self.Protocol == J1939_PROTOCOL
+
+
+
+#/*****************************************************/
+#/* Check if connected with a slow initialisation     */
+#/* K-line protocol, ISO 9141-2 or ISO 14230-4 (KWP). */
+#/*****************************************************/
+	def IsKLine(self):
+		return self.Protocol in KLINE_PROTOCOLS
+
+
+
+#/*************************************************************/
+#/* Set the header (AT SH) of the following requests, to talk */
+#/* to a particular ECU. An empty header sets the default of  */
+#/* the protocol. The header is only sent when it changes.    */
+#/*************************************************************/
+	def SetHeader(self, Header):
+		Result = True
+		if Header != self.Header:
+			ThisHeader = Header
+			if ThisHeader == "":
+				ThisHeader = DEFAULT_HEADERS.get(self.Protocol, DEFAULT_HEADERS["3"])
+			Response = self.GetResponse(bytearray("AT SH " + ThisHeader + "\r", 'UTF-8'))
+			if Response == 'OK\n':
+				self.Header = Header
+			else:
+				Result = False
+		return Result
+
+
+
+#/***********************************************************/
+#/* Turn the ELM327 device wakeup messages on or off. While */
+#/* idle at the prompt the ELM327 device sends a wakeup     */
+#/* message to the ECU every period (AT SW), so the K-line  */
+#/* session does not time out. Optionally set the wakeup    */
+#/* message sent (AT WM), such as b'68 6A F1 01 00'.        */
+#/***********************************************************/
+	def SetKeepAlive(self, Enable, Period = KEEP_ALIVE_WAKEUP_PERIOD, Message = None):
+		Result = True
+
+		if Enable == True:
+			Rate = min(max(int(Period / KEEP_ALIVE_WAKEUP_UNIT), 1), 0xFF)
+		else:
+			Rate = 0
+		Response = self.GetResponse(b'AT SW ' + bytes("{:02X}".format(Rate), 'utf-8') + b'\r')
+		if Response != 'OK\n':
+			Result = False
+		if Result == True and Message != None:
+			Response = self.GetResponse(b'AT WM ' + Message + b'\r')
+			if Response != 'OK\n':
+				Result = False
+		self.KeepAliveEnabled = (Result == True and Enable == True)
+
+		return Result
+
+
+
+#/*************************************************************/
+#/* Check if the link has been idle long enough to need a     */
+#/* heartbeat request, before the ECU session times out. Only */
+#/* when the ECU session needs keeping alive and the ELM327   */
+#/* device wakeup messages are not doing so. Does not         */
+#/* communicate, so it can be checked at any time.            */
+#/*************************************************************/
+	def IsKeepAliveDue(self):
+		return self.KeepAliveNeeded == True and self.KeepAliveEnabled == False and self.Monitoring == False and time.perf_counter() - self.LastRequestTime > KEEP_ALIVE_IDLE_PERIOD
+
+
+
+#/***************************************************************/
+#/* Send a heartbeat request to keep the ECU session alive, and */
+#/* confirm the session has not dropped. Return True when the   */
+#/* session is still alive.                                     */
+#/***************************************************************/
+	def KeepAlive(self):
+		SessionDropCount = self.SessionDropCount
+		self.GetResponse(b'0100\r')
+		return self.SessionDropCount == SessionDropCount
+
+
+
+#/**************************************************************/
+#/* Check if the ECU session dropped since the last check, and */
+#/* the ELM327 device had to initialise it again.              */
+#/**************************************************************/
+	def GetSessionDropped(self):
+		Result = self.SessionDropped
+		self.SessionDropped = False
+		return Result
+
+
+
+#/********************************************************/
+#/* Get the number of times the ECU session has dropped. */
+#/********************************************************/
+	def GetSessionDropCount(self):
+		return self.SessionDropCount
+
+
+
 #/*************************************************/
 #/* Get any errors or warnings which occured      */
 #/* during creation of an instance of this class. */
@@ -258,105 +553,288 @@ class ELM327:
 
 
 
+#/*************************************************************/
+#/* Get the timing and outcome statistics of ELM327 requests. */
+#/*************************************************************/
+	def GetStatistics(self):
+		return self.Statistics
+
+
+
+#/**********************************************************/
+#/* Get the ELM327 request statistics as displayable text. */
+#/**********************************************************/
+	def GetStatisticsInfo(self):
+		return self.Statistics.GetInfo()
+
+
+
+#/******************************************************/
+#/* Get the statistics of the values read of each PID. */
+#/******************************************************/
+	def GetPidStatistics(self):
+		return self.PidStatistics
+
+
+
+#/*********************************************************/
+#/* Get the statistics of the values read of each PID as  */
+#/* displayable text, with the PIDs named by description. */
+#/*********************************************************/
+	def GetPidStatisticsInfo(self):
+		Names = {}
+		for PID in self.PidStatistics.GetPids():
+			Names[PID] = self.ValidPIDs.get(PID, "").split('|')[FIELD_PID_DESCRIPTION]
+		return self.PidStatistics.GetInfo(Names)
+
+
+
 #/*******************************************/
 #/* Get infomation about the ELM327 device. */
 #/*******************************************/
 	def GetInfo(self):
 		Result = ""
 
-		# Get the current serial port in use by the ELM327 device.
-		Result += "Serial Port|" + self.ELM327.name + "\n"
-		# Get the ELM device version.
-		Response = self.GetResponse(b'AT I\r')
-		Result += "ELM Device Version|" + Response
-		# Get the ELM device description.
-		Response = self.GetResponse(b'AT @1\r')
-		Result += "ELM Device Description|" + Response
-		# Get the ELM device user supplied description.
-		Response = self.GetResponse(b'AT @2\r')
-		Result += "ELM Device User Data|" + Response
-		# Get the current OBDII data protocol after OBDII CAN BUS communication.
-		Response = self.GetResponse(b'AT DP\r')
-		Result += "Using CAN BUS Protocol|" + Response
-		# Get the Voltage measured at the OBDII connector.
-		Response = self.GetResponse(b'AT RV\r')
-		Result += "Volt At OBDII Connector|" + Response
-		# Get the CAN status.
-		Response = self.GetResponse(b'AT CS\r')
-		Result += "CAN Status|" + Response
-		# Get the key words.
-		Response = self.GetResponse(b'AT KW\r')
-		Result += "Key Words|" + Response
-		# Get the ELM327 buffer dump.
-		Response = self.GetResponse(b'AT BD\r')
-		Result += "ELM327 Buffer Dump|" + Response
-		# Get the programmable paramaters.
-		Response = self.GetResponse(b'AT PPS\r')
-		Result += "ELM327 Programmable Paramaters:|\n" + Response
+		# There is no ELM327 device when replaying a session log.
+		if self.Replay != None:
+			Result += self.Replay.GetInfo()
+		else:
+			# Get the current serial port in use by the ELM327 device.
+			Result += "Serial Port|" + self.ELM327.name + "\n"
+			# Get the ELM device version.
+			Response = self.GetResponse(b'AT I\r')
+			Result += "ELM Device Version|" + Response
+			# Get the ELM device description.
+			Response = self.GetResponse(b'AT @1\r')
+			Result += "ELM Device Description|" + Response
+			# Get the ELM device user supplied description.
+			Response = self.GetResponse(b'AT @2\r')
+			Result += "ELM Device User Data|" + Response
+			# Get the current OBDII data protocol after OBDII CAN BUS communication.
+			Response = self.GetResponse(b'AT DP\r')
+			Result += "Using CAN BUS Protocol|" + Response
+			# Get the Voltage measured at the OBDII connector.
+			Response = self.GetResponse(b'AT RV\r')
+			Result += "Volt At OBDII Connector|" + Response
+			# Get the CAN status.
+			Response = self.GetResponse(b'AT CS\r')
+			Result += "CAN Status|" + Response
+			# Get the key words.
+			Response = self.GetResponse(b'AT KW\r')
+			Result += "Key Words|" + Response
+			# Get the ELM327 buffer dump.
+			Response = self.GetResponse(b'AT BD\r')
+			Result += "ELM327 Buffer Dump|" + Response
+			# Get the programmable paramaters.
+			Response = self.GetResponse(b'AT PPS\r')
+			Result += "ELM327 Programmable Paramaters:|\n" + Response
+			# Get the ECU session keep alive state.
+			Result += "OBDII Protocol Number|" + self.Protocol + "\n"
+			KeepAlive = "OFF"
+			if self.KeepAliveEnabled == True:
+				KeepAlive = "ELM327 WAKEUP MESSAGES"
+			elif self.KeepAliveNeeded == True:
+				KeepAlive = "HEARTBEAT REQUESTS"
+			Result += "Keep Alive|" + KeepAlive + "\n"
+			Result += "ECU Session Drops|" + str(self.SessionDropCount) + "\n"
 
 		return Result
 
 
 
+#/*****************************************************************/
+#/* Get the CAN monitor, holding the frames received and decoded. */
+#/*****************************************************************/
+	def GetMonitor(self):
+		return self.Monitor
+
+
+
+#/****************************************************/
+#/* Get the CAN monitor results as displayable text. */
+#/****************************************************/
+	def GetMonitorInfo(self):
+		return self.Monitor.GetInfo()
+
+
+
+#/******************************************************************/
+#/* Put the ELM327 device into monitor mode, streaming all frames  */
+#/* on the CAN BUS. Optionally provide a receive address filter,   */
+#/* such as b'316', so only frames with that CAN ID are streamed.  */
+#/* Headers are turned on so the CAN ID of each frame is known.    */
+#/* Optionally keep the frames already received, when resuming.    */
+#/* Monitoring is only started when connected with a CAN protocol, */
+#/* as the frames streamed are read as CAN frames.                 */
+#/******************************************************************/
+	def StartMonitor(self, Filter = None, KeepFrames = False):
+		Result = True
+		if KeepFrames == False:
+			self.Monitor.Reset()
+
+		if self.IsCanBus() == False:
+			print(STRING_ERROR + " StartMonitor : NOT CONNECTED WITH A CAN PROTOCOL")
+			Result = False
+		else:
+			try:
+				Response = self.GetResponse(b'AT H1\r')
+				if Response != 'OK\n':
+					Result = False
+				elif Filter != None:
+					Response = self.GetResponse(b'AT CRA ' + Filter + b'\r')
+					if Response != 'OK\n':
+						Result = False
+				if Result == True:
+					# Return from reads with what is available, rather than waiting for a prompt.
+					self.ELM327.timeout = MONITOR_READ_TIME_OUT
+					self.ELM327.write(b'AT MA\r')
+					self.Monitoring = True
+				else:
+					self.GetResponse(b'AT H0\r')
+			except Exception as Catch:
+				print(STRING_ERROR + " StartMonitor : " + str(Catch))
+				Result = False
+
+		return Result
+
+
+
+#/***************************************************************/
+#/* Read the frames the ELM327 device has streamed since the    */
+#/* last call into the CAN monitor, return the number of frames */
+#/* received. When the ELM327 device buffer fills, it stops     */
+#/* monitoring, so monitoring is restarted.                     */
+#/***************************************************************/
+	def ReadMonitor(self):
+		Result = 0
+
+		if self.Monitoring == True:
+			try:
+				Data = self.ELM327.read(max(1, self.ELM327.in_waiting))
+				Result = self.Monitor.AddData(str(Data, 'utf-8', 'replace'))
+				if self.Monitor.IsStopped() == True:
+					self.ELM327.write(b'AT MA\r')
+			except Exception as Catch:
+				print(STRING_ERROR + " ReadMonitor : " + str(Catch))
+
+		return Result
+
+
+
+#/**************************************************************/
+#/* Stop the ELM327 device monitoring the CAN BUS. Sending any */
+#/* character stops monitoring, then wait for the prompt and   */
+#/* restore the settings used for OBDII requests.              */
+#/**************************************************************/
+	def StopMonitor(self):
+		if self.Monitoring == True:
+			self.Monitoring = False
+			try:
+				self.ELM327.timeout = SERIAL_PORT_TIME_OUT
+				self.ELM327.write(b'\r')
+				ReadChar = 1
+				while ReadChar != b'>' and ReadChar != b'':
+					ReadChar = self.ELM327.read()
+					self.Monitor.AddData(str(ReadChar, 'utf-8', 'replace'))
+				self.GetResponse(b'AT AR\r')
+				self.GetResponse(b'AT H0\r')
+			except Exception as Catch:
+				print(STRING_ERROR + " StopMonitor : " + str(Catch))
+
+
+
 #/********************************************************/
 #/* Connect the ELM327 device to the CAN BUS on the ECU. */
 #/* Then get a list of all of the valid PID addresses    */
 #/* the ECU supports.                                    */
+#/* Optionally provide an already open port object, such */
+#/* as an Emulator, to use instead of the serial port.   */
 #/********************************************************/
-	def Connect(self):
+	def Connect(self, Port = None):
 		Result = CONNECT_SUCCESS
 		self.InitResult = ""
+		self.IsJ1939 = False
+		self.Monitoring = False
+		self.Protocol = ""
+		self.KeepAliveNeeded = False
+		self.KeepAliveEnabled = False
+		self.SessionActive = False
+		self.ValidPIDs = {}
+		self.ValidFreezePIDs = {}
+		self.FreezeFramesDiscovered = []
+		self.FreezeSnapshots = {}
+		self.FrameSnapshot = None
+		self.Header = ""
+		self.MonitorMidsDiscovered = False
+		self.MonitorTestResults = None
+		self.OxygenSensorResults = None
+		self.TroubleCodes = None
+		self.SessionTroubleCodes = []
+		self.VehicleInfo = None
+		self.Vin = None
+		self.VinData = None
+		self.Statistics.Reset()
+		self.PidStatistics.Reset()
 
 #  /****************************************************************/
 # /* Open the required serial port which the ELM327 device is on. */
 #/****************************************************************/
-		try:
-			self.ELM327 = serial.Serial(SERIAL_PORT_NAME, SERIAL_PORT_BAUD)
-			self.ELM327.timeout = SERIAL_PORT_TIME_OUT
-			self.ELM327.write_timeout = SERIAL_PORT_TIME_OUT
-
-			# Initialize the ELM327 device.
-			Response = self.GetResponse(b'AT Z\r')
-
-			# Echo Off, for faster communications.
-			Response = self.GetResponse(b'AT E0\r')
-			if Response != 'AT E0\nOK\n':
-				self.InitResult += "FAILED: AT E0 (Set Echo Off)\n"
-
-			# Don't print space characters, for faster communications.
-			if self.InitResult == "":
-				Response = self.GetResponse(b'AT S0\r')
-				if Response != 'OK\n':
-					self.InitResult += "FAILED: AT S0 (Set Space Characters Off)\n"
-
-			# Set CAN communication protocol to ISO 9141-2 or auto detect on fail.
-			if self.InitResult == "":
-				Response = self.GetResponse(b'AT SP A3\r')
-				if Response != 'OK\n':
-					self.InitResult += "FAILED: AT SP A3 (Set Protocol ISO 9141-2 / Auto)\n"
-
-			# Set CAN Baud to high speed.
-			if self.InitResult == "":
-				Response = self.GetResponse(b'AT IB 10\r')
-				if Response != 'OK\n':
-					self.InitResult += "FAILED: AT IB 10 (Set High Speed CAN BUS)\n"
-
-			if self.InitResult != "":
+		if self.Replay != None:
+			# A session log being replayed takes the place of the ELM327 device and ECU.
+			Result = self.ConnectReplay()
+		else:
+			try:
+				if Port == None:
+					self.ELM327 = serial.Serial(SERIAL_PORT_NAME, SERIAL_PORT_BAUD)
+				else:
+					self.ELM327 = Port
+				self.ELM327.timeout = SERIAL_PORT_TIME_OUT
+				self.ELM327.write_timeout = SERIAL_PORT_TIME_OUT
+
+				# Initialize the ELM327 device.
+				Response = self.GetResponse(b'AT Z\r')
+
+				# Echo Off, for faster communications.
+				Response = self.GetResponse(b'AT E0\r')
+				if Response != 'AT E0\nOK\n':
+					self.InitResult += "FAILED: AT E0 (Set Echo Off)\n"
+
+				# Don't print space characters, for faster communications.
+				if self.InitResult == "":
+					Response = self.GetResponse(b'AT S0\r')
+					if Response != 'OK\n':
+						self.InitResult += "FAILED: AT S0 (Set Space Characters Off)\n"
+
+				# Set CAN communication protocol to ISO 9141-2 or auto detect on fail.
+				if self.InitResult == "":
+					Response = self.GetResponse(b'AT SP A3\r')
+					if Response != 'OK\n':
+						self.InitResult += "FAILED: AT SP A3 (Set Protocol ISO 9141-2 / Auto)\n"
+
+				# Set CAN Baud to high speed.
+				if self.InitResult == "":
+					Response = self.GetResponse(b'AT IB 10\r')
+					if Response != 'OK\n':
+						self.InitResult += "FAILED: AT IB 10 (Set High Speed CAN BUS)\n"
+
+				if self.InitResult != "":
+					Result = CONNECT_ELM327_FAIL
+					self.InitResult += "FAILED TO INITIALIZE ELM327 DEVICE.\n"
+			except:
 				Result = CONNECT_ELM327_FAIL
 				self.InitResult += "FAILED TO INITIALIZE ELM327 DEVICE.\n"
-		except:
-			Result = CONNECT_ELM327_FAIL
-			self.InitResult += "FAILED TO INITIALIZE ELM327 DEVICE.\n"
 
-		if Result == CONNECT_SUCCESS:
+		if Result == CONNECT_SUCCESS and self.Replay == None:
 			# Wait before tring to connect to ensure EML device is idle.
 			time.sleep(ELM_CONNECT_SETTLE_PERIOD)
 			# Request Mode 01 PID 01 (MIL Information) to test connection.
 			Response = self.GetResponse(b'0101\r')
 			if Response.find("UNABLE TO CONNECT") != -1:
-				Result = CONNECT_CAN_BUS_FAIL
-				# Close serial port if connection failed.
-				self.ELM327.close()
+				# Heavy duty vehicles may only broadcast SAE J1939, which the automatic protocol search does not try.
+				if self.ConnectJ1939() == False:
+					Result = CONNECT_CAN_BUS_FAIL
+					# Close serial port if connection failed.
+					self.ELM327.close()
 			else:
 				Response = self.PruneData(Response, 2)
 				ResultVal1 = int(Response[:2], 16)
@@ -364,38 +842,186 @@ class ELM327:
 					self.MilOn = True
 				self.FreezeFrameCount = ResultVal1 & 0x7F
 
-		if Result == CONNECT_SUCCESS:
+		if Result == CONNECT_SUCCESS and self.IsJ1939 == False and self.Replay == None:
+			# Slow initialisation K-line protocols need the ECU session keeping alive while idle.
+			Response = self.GetResponse(b'AT DPN\r').strip()
+			self.Protocol = Response[-1:]
+			if self.IsKLine() == True:
+				self.KeepAliveNeeded = True
+				if self.SetKeepAlive(True) == False:
+					self.InitResult += "FAILED: AT SW (Set Wakeup Message Period), SENDING HEARTBEAT REQUESTS INSTEAD\n"
+
 			# Manually add standard PIDs supported, prefix with '!', don't show as user selectable option.
 			# Application specific display locations.
 			self.ValidPIDs['03'] = "! Show stored Diagnostic Trouble Codes"
 			self.ValidPIDs['04'] = "! Clear Diagnostic Trouble Codes and stored values"
 			self.ValidPIDs['07'] = "! Show pending Diagnostic Trouble Codes (detected during current or last driving cycle)"
+			self.ValidPIDs['06'] = "! Show on-board monitor test results"
+			self.ValidPIDs['0A'] = "! Show permanent Diagnostic Trouble Codes (cleared by the ECU once the fault is no longer detected)"
 
-			# Get Mode 01 PID support [01 -> 20].
-			self.PID0100()
-			# If Mode 01 PID 20 is supported, get Mode 01 PID support [21 -> 40].
-			if '0120' in self.ValidPIDs:
-				self.PID0120()
-			# If Mode 01 PID 40 is supported, get Mode 01 PID support [41 -> 60].
-			if '0140' in self.ValidPIDs:
-				self.PID0140()
-			# If Mode 01 PID 60 is supported, get Mode 01 PID support [61 -> 80].
-			if '0160' in self.ValidPIDs:
-				self.PID0160()
-			# If Mode 01 PID 80 is supported, get Mode 01 PID support [81 -> A0].
-			if '0180' in self.ValidPIDs:
-				self.PID0180()
-			# If Mode 01 PID A0 is supported, get Mode 01 PID support [A1 -> C0].
-			if '01A0' in self.ValidPIDs:
-				self.PID01A0()
-			# If Mode 01 PID C0 is supported, get Mode 01 PID support [C1 -> E0].
-			if '01C0' in self.ValidPIDs:
-				self.PID01C0()
+			# Get Mode 01 PID support [01 -> E0].
+			self.DiscoverPids('01', self.PidDescriptionsMode01)
 			# Get Mode 05 PID support.
 			self.PID050100()
 			# Get Mode 09 PID support.
 			self.PID0900()
+			# Get Mode 02 PID support of each freeze frame.
+			for FreezeIndex in range(self.FreezeFrameCount):
+				self.GetValidPIDs(FreezeIndex)
+
+		if Result == CONNECT_SUCCESS:
+			# Add the virtual PIDs which can be calculated from the PIDs the ECU supports.
+			self.Derived.Reset()
+			for VirtualPid in self.Derived.GetVirtualPids(self.ValidPIDs):
+				self.ValidPIDs[VirtualPid] = self.PidDescriptionsVirtual.get(VirtualPid, STRING_NO_DESCRIPTION)
+			# Add the enhanced PIDs of the configured vehicle the ECU answers, these can't be discovered from a bitmap so
+			# each is asked for once. When replaying, those which were logged are added instead.
+			if self.Replay == None:
+				for EnhancedPid in self.Enhanced.GetPids():
+					if self.GetEnhancedValue(EnhancedPid) != None:
+						self.ValidPIDs[EnhancedPid] = self.Enhanced.GetDescription(EnhancedPid)
+				self.SetHeader("")
+			# From now on, the ECU session reinitialising is reported as a dropped session.
+			self.SessionActive = True
+
+		return Result
+
+
+
+#/*************************************************************/
+#/* Switch the ELM327 device to SAE J1939 and listen for the  */
+#/* parameter groups broadcast on the CAN BUS. Each SPN found */
+#/* in the broadcasts is added to the valid PIDs, prefixed    */
+#/* with 'J', so it can be used in the same way as an OBDII   */
+#/* PID.                                                      */
+#/*************************************************************/
+	def ConnectJ1939(self):
+		Result = False
+
+		Response = self.GetResponse(b'AT SP A\r')
+		if Response == 'OK\n':
+			self.Protocol = J1939_PROTOCOL
+			# Show the raw 29 bit CAN ID, rather than J1939 formatted priority, PGN and source address.
+			Response = self.GetResponse(b'AT JHF0\r')
+		if Response == 'OK\n' and self.StartMonitor() == True:
+			StartTime = time.time()
+			while time.time() - StartTime < J1939_LISTEN_PERIOD:
+				self.ReadMonitor()
+			for Spn in self.J1939.GetSeenSpns(self.Monitor):
+				self.ValidPIDs['J' + Spn] = self.PidDescriptionsJ1939.get(Spn, STRING_NO_DESCRIPTION)
+				Result = True
+			if Result == True:
+				self.IsJ1939 = True
+			else:
+				self.StopMonitor()
+				self.InitResult += "NO SAE J1939 BROADCASTS FOUND\n"
+
+		return Result
+
+
+
+#/**************************************************************/
+#/* Set the session log every live value read is logged to, or */
+#/* None to stop logging.                                      */
+#/**************************************************************/
+	def SetSessionLog(self, ThisSessionLog):
+		self.SessionLog = ThisSessionLog
+
+
+
+#/*************************************************************/
+#/* Set a session log to replay in place of the ECU when next */
+#/* connecting, or None to connect to the ECU.                */
+#/*************************************************************/
+	def SetReplay(self, ThisReplay):
+		self.Replay = ThisReplay
+
+
+
+#/*********************************************************/
+#/* Get the time of the values read, the replay time when */
+#/* replaying a session log, otherwise the time now.      */
+#/*********************************************************/
+	def GetTime(self):
+		if self.Replay != None:
+			Result = self.Replay.GetTime()
+		else:
+			Result = time.time()
+		return Result
+
+
+
+#/**************************************************************/
+#/* Connect to a session log being replayed, starting it from  */
+#/* the beginning. The PIDs logged are the valid PIDs, and are */
+#/* read from the log rather than the ECU.                     */
+#/**************************************************************/
+	def ConnectReplay(self):
+		Result = CONNECT_SUCCESS
+		self.ELM327 = None
+		self.MilOn = False
+		self.FreezeFrameCount = 0
+		self.InitResult += self.Replay.GetInitResult()
+		if self.InitResult != "":
+			Result = CONNECT_ELM327_FAIL
+		else:
+			self.Replay.Start()
+			for PID in self.Replay.GetPids():
+				self.ValidPIDs[PID] = self.GetPidDescription(PID)
+		return Result
+
+
 
+#/**************************************************************/
+#/* Get the description of a PID from the PID descriptions of  */
+#/* its mode, for a PID which was not discovered from the ECU. */
+#/**************************************************************/
+	def GetPidDescription(self, PID):
+		Result = STRING_NO_DESCRIPTION
+		if PID[:1] == 'J':
+			Result = self.PidDescriptionsJ1939.get(PID[1:], STRING_NO_DESCRIPTION)
+		elif PID[:1] == 'V':
+			Result = self.PidDescriptionsVirtual.get(PID, STRING_NO_DESCRIPTION)
+		elif PID in self.Enhanced.GetPids():
+			Result = self.Enhanced.GetDescription(PID)
+		elif PID[:2] == '01':
+			Result = self.PidDescriptionsMode01.get(PID[2:], STRING_NO_DESCRIPTION)
+		elif PID[:2] == '05':
+			Result = self.PidDescriptionsMode05.get(PID[2:], STRING_NO_DESCRIPTION)
+		elif PID[:2] == '09':
+			Result = self.PidDescriptionsMode09.get(PID[2:], STRING_NO_DESCRIPTION)
+		return Result
+
+
+
+#/**************************************************************/
+#/* Get the resolution a PID value is displayed at, from the   */
+#/* decimal places of its value format, or None when the value */
+#/* is not displayed as a number with decimal places.          */
+#/**************************************************************/
+	def GetPidResolution(self, PID):
+		Result = None
+		Fields = self.ValidPIDs.get(PID, "").split('|')
+		if len(Fields) > FIELD_PID_FORMAT_1:
+			Match = PID_FORMAT_DECIMALS.search(Fields[FIELD_PID_FORMAT_1])
+			if Match != None:
+				Result = 10**-int(Match.group(1))
+		return Result
+
+
+
+#/*************************************************************/
+#/* Get the display range of a PID value, the lowest and      */
+#/* highest from its description, or None when not described. */
+#/*************************************************************/
+	def GetPidRange(self, PID):
+		Result = None
+		Fields = self.ValidPIDs.get(PID, "").split('|')
+		if len(Fields) > FIELD_PID_MAX_1:
+			try:
+				Result = (float(Fields[FIELD_PID_MIN_1]), float(Fields[FIELD_PID_MAX_1]))
+			except Exception as Catch:
+				Result = None
 		return Result
 
 
@@ -407,27 +1033,15 @@ class ELM327:
 		Result = self.ValidPIDs
 
 		if FreezeIndex != -1:
-			# Get Mode 02 PID support [01 -> 20].
-			self.PID0200(FreezeIndex)
-			# If Mode 02 PID 20 is supported, get Mode 02 PID support [21 -> 40].
-			if '0120' in self.ValidFreezePIDs:
-				self.PID0220(FreezeIndex)
-			# If Mode 02 PID 40 is supported, get Mode 02 PID support [41 -> 60].
-			if '0140' in self.ValidFreezePIDs:
-				self.PID0240(FreezeIndex)
-			# If Mode 02 PID 60 is supported, get Mode 02 PID support [61 -> 80].
-			if '0160' in self.ValidFreezePIDs:
-				self.PID0260(FreezeIndex)
-			# If Mode 02 PID 80 is supported, get Mode 02 PID support [81 -> A0].
-			if '0180' in self.ValidFreezePIDs:
-				self.PID0280(FreezeIndex)
-			# If Mode 02 PID A0 is supported, get Mode 02 PID support [A1 -> C0].
-			if '01A0' in self.ValidFreezePIDs:
-				self.PID02A0(FreezeIndex)
-			# If Mode 02 PID C0 is supported, get Mode 02 PID support [C1 -> E0].
-			if '01C0' in self.ValidFreezePIDs:
-				self.PID02C0(FreezeIndex)
-			Result = self.ValidFreezePIDs
+			# Get Mode 02 PID support [01 -> E0], only once for each freeze frame.
+			if FreezeIndex not in self.FreezeFramesDiscovered:
+				self.DiscoverPids('02', self.PidDescriptionsMode01, FreezeIndex)
+				self.FreezeFramesDiscovered.append(FreezeIndex)
+			ThisFreezeIndex = "{:02d}".format(FreezeIndex)
+			Result = {}
+			for PID in self.ValidFreezePIDs:
+				if PID[4:] == ThisFreezeIndex:
+					Result[PID] = self.ValidFreezePIDs[PID]
 
 		return Result
 
@@ -438,14 +1052,33 @@ class ELM327:
 #/**********************************************************************/
 	def DoPID(self, PID, FreezeIndex = -1):
 		try:
-			if PID in PidFunctions:
+			# Enhanced PIDs change the header, restore the default before any other request.
+			if PID[:1] != 'E':
+				self.SetHeader("")
+			if self.Replay != None and self.Replay.HasPid(PID):
+				# Replayed PIDs are read from the session log, virtual PIDs which were not logged are still calculated from them.
+				Result = self.Replay.GetValue(PID)
+				if Result == None:
+					Result = STRING_NO_DATA
+			elif PID in PidFunctions:
 				Result = PidFunctions[PID](self, FreezeIndex)
+			elif PID[:1] in ModeFunctions:
+				Result = ModeFunctions[PID[:1]](self, PID, FreezeIndex)
+			elif PID[:2] in ModeFunctions:
+				Result = ModeFunctions[PID[:2]](self, PID, FreezeIndex)
 			else:
 				Result = STRING_NOT_IMPLEMENTED
 		except Exception as Catch:
 			print(STRING_ERROR + " in PID" + str(PID) + " : " + str(Catch))
 			Result = STRING_ERROR
 
+		# Keep live values for calculating virtual PIDs, so the PIDs are not read again for them.
+		if FreezeIndex == -1 and type(Result) in (int, float):
+			self.Derived.SetValue(PID, Result)
+			self.PidStatistics.Add(PID, Result, self.GetTime(), self.GetPidRange(PID))
+			if self.SessionLog != None:
+				self.SessionLog.Add(PID, Result, None, self.GetPidResolution(PID))
+
 		return Result
 
 
@@ -457,17 +1090,163 @@ class ELM327:
 #/* character '>', the ELM327 provides promting   */
 #/* for more user requests.                       */
 #/* Otherwise a timeout occurs waiting for a      */
-#/* response.                                     */
+#/* response. The time taken to write the request */
+#/* for the ECU to respond and for the response   */
+#/* to transfer are recorded in the statistics.   */
+#/* Responses are checked for a dropped session.  */
 #/*************************************************/
 	def GetResponse(self, Data):
+		# Requests can't be made while the ELM327 device is monitoring.
+		if self.Monitoring == True:
+			self.StopMonitor()
+		StartTime = time.perf_counter()
 		self.ELM327.write(Data)
+		WriteTime = time.perf_counter()
+		FirstTime = 0
 		Response = ""
 		ReadChar = 1
 		while ReadChar != b'>' and ReadChar != b'' and ReadChar != 0:
 			ReadChar = self.ELM327.read()
+			if FirstTime == 0:
+				FirstTime = time.perf_counter()
 			if ReadChar != b'>':
 				Response += str(ReadChar, 'utf-8')
-		return Response.replace('\r', '\n').replace('\n\n', '\n').replace('NO DATA', '00000000000000')
+		EndTime = time.perf_counter()
+		self.LastRequestTime = EndTime
+		# Record where the time went for this request.
+		self.Statistics.AddRequest(str(bytes(Data), 'utf-8'), WriteTime - StartTime, FirstTime - WriteTime, EndTime - FirstTime, len(Data) + len(Response) + 1, ReadChar == b'', Response)
+		Response = Response.replace('\r', '\n').replace('\n\n', '\n')
+		if self.SessionActive == True:
+			Response = self.CheckSession(Response)
+		return Response.replace('NO DATA', '00000000000000')
+
+
+
+#/*************************************************************/
+#/* Check a response for signs the ECU session was lost, such */
+#/* as the ELM327 device having to initialise the bus again,  */
+#/* and count the dropped session. Remove the bus init line   */
+#/* so the rest of the response can be processed as normal.   */
+#/*************************************************************/
+	def CheckSession(self, Response):
+		for ThisDrop in SESSION_DROP_RESPONSES:
+			if Response.find(ThisDrop) != -1:
+				self.SessionDropCount += 1
+				self.SessionDropped = True
+				if ThisDrop == "BUS INIT":
+					Response = "".join(ThisLine + "\n" for ThisLine in Response.split('\n') if ThisLine != "" and ThisLine[:8] != "BUS INIT")
+				break
+		return Response
+
+
+
+#/*************************************************************/
+#/* Get the data bytes of a Mode 01 PID from the ECU, as hex. */
+#/* With a freeze frame index, the Mode 02 PID of that freeze */
+#/* frame is requested instead. Data already fetched in a     */
+#/* batch is used rather than making another request.         */
+#/*************************************************************/
+	def GetPidResponse(self, PID, FreezeIndex = -1):
+		if FreezeIndex == -1:
+			Request = PID
+			PruneCount = 2
+		else:
+			Request = "02" + PID[2:4] + "{:02X}".format(FreezeIndex)
+			PruneCount = 3
+		if Request in self.PrefetchData:
+			Response = self.PrefetchData[Request]
+		else:
+			Response = self.GetResponse(bytearray(Request + "\r", 'UTF-8'))
+			Response = self.PruneData(Response, PruneCount)
+		return Response
+
+
+
+#/***************************************************************/
+#/* On CAN, fetch the data of a list of Mode 01 or Mode 02 PIDs */
+#/* with a few multi-PID requests, ready for GetPidResponse.    */
+#/* Other protocols only allow one PID in each request.         */
+#/***************************************************************/
+	def PrefetchPids(self, PIDs, FreezeIndex = -1):
+		self.PrefetchData = {}
+		if self.IsCan() == True:
+			self.SetHeader("")
+			PidMode = '01'
+			ThisFreezeIndex = ""
+			if FreezeIndex != -1:
+				PidMode = '02'
+				ThisFreezeIndex = "{:02X}".format(FreezeIndex)
+			Pids = []
+			for PID in PIDs:
+				if PID[:2] == PidMode and PID[2:4] in PID_DATA_LENGTHS and PID[2:4] not in BITMAP_PIDS:
+					Pids.append(PID[2:4])
+			for Pid, Data in self.GetMultiPidData(PidMode, Pids, PID_DATA_LENGTHS, FreezeIndex).items():
+				self.PrefetchData[PidMode + Pid + ThisFreezeIndex] = Data
+
+
+
+#/**************************************************************/
+#/* Get a snapshot of all the supported Mode 01 PIDs, and any  */
+#/* J1939 broadcast values, read as close together in time as  */
+#/* possible. The time taken to read them all is kept with the */
+#/* snapshot, so frames can be compared.                       */
+#/**************************************************************/
+	def GetFrame(self):
+		ValidPIDs = self.GetValidPIDs()
+		PIDs = []
+		for PID in sorted(ValidPIDs):
+			if ValidPIDs[PID][FIELD_PID_DESCRIPTION] != '!':
+				if PID[:2] == '01' or PID[0] == 'J' or PID[0] == 'V':
+					PIDs.append(PID)
+		StartTime = time.time()
+		try:
+			self.PrefetchPids(PIDs)
+			Values = []
+			for PID in PIDs:
+				Values.append((PID, ValidPIDs[PID], self.DoPID(PID)))
+		finally:
+			self.PrefetchData = {}
+		self.FrameSnapshot = Snapshot.Snapshot("FRAME", -1, Values, StartTime, time.time())
+		return self.FrameSnapshot
+
+
+
+#/**************************************************************/
+#/* Get the snapshot last taken by GetFrame, None if none yet. */
+#/**************************************************************/
+	def GetLastFrame(self):
+		return self.FrameSnapshot
+
+
+
+#/***************************************************************/
+#/* Get a snapshot of all the supported PIDs in a freeze frame. */
+#/* On CAN, the data of all the PIDs is fetched with a few      */
+#/* multi-PID requests, rather than one request for each PID.   */
+#/* The snapshot is kept, and returned again until the freeze   */
+#/* frame is refreshed or the trouble codes are cleared.        */
+#/***************************************************************/
+	def GetFreezeFrame(self, FreezeIndex, Refresh = False):
+		if Refresh == True or FreezeIndex not in self.FreezeSnapshots:
+			ValidPIDs = self.GetValidPIDs(FreezeIndex)
+			try:
+				self.PrefetchPids(sorted(ValidPIDs), FreezeIndex)
+				Values = []
+				for PID in sorted(ValidPIDs):
+					Values.append((PID, ValidPIDs[PID], self.DoPID(PID[:4], FreezeIndex)))
+			finally:
+				self.PrefetchData = {}
+			self.FreezeSnapshots[FreezeIndex] = Snapshot.Snapshot("FREEZE FRAME " + str(FreezeIndex), FreezeIndex, Values)
+		return self.FreezeSnapshots[FreezeIndex]
+
+
+
+#/************************************************************/
+#/* Get the snapshots of all freeze frames taken so far, for */
+#/* the report and logger to share.                          */
+#/************************************************************/
+	def GetFreezeSnapshots(self):
+		return [ self.FreezeSnapshots[FreezeIndex] for FreezeIndex in sorted(self.FreezeSnapshots) ]
 
 
 
@@ -498,6 +1277,102 @@ class ELM327:
 
 
 
+#/**************************************************************/
+#/* Split a response into the data of each message in it. On   */
+#/* CAN, a message too long for one frame is shown as a byte   */
+#/* count line, followed by lines prefixed with a frame index  */
+#/* "0:", "1:"... Several ECUs may each answer with a message. */
+#/**************************************************************/
+	def GetMessages(self, Response):
+		Messages = []
+		Length = 0
+		for ThisLine in Response.split('\n'):
+			if len(ThisLine) == 3:
+				# Byte count of a multiple frame message.
+				Length = 2 * int(ThisLine, 16)
+				Messages.append("")
+			elif ThisLine[1:2] == ':' and len(Messages) > 0:
+				Messages[-1] += ThisLine[2:]
+				Messages[-1] = Messages[-1][:Length]
+			elif ThisLine != "":
+				Messages.append(ThisLine)
+		return Messages
+
+
+
+#/*************************************************************/
+#/* Request several PIDs of a mode at once, as CAN protocols  */
+#/* allow, up to six PIDs in each request. A Mode 02 request  */
+#/* has the freeze frame number after each PID, so only three */
+#/* PIDs fit. Provide the data byte count of each PID, so the */
+#/* response can be split. Return the data of each PID, as    */
+#/* hex. When several ECUs answer, the first answer is used.  */
+#/*************************************************************/
+	def GetMultiPidData(self, PidMode, Pids, DataLengths, FreezeIndex = -1):
+		Result = {}
+
+		ThisFreezeIndex = ""
+		PidCount = MULTI_PID_MAX
+		if PidMode == '02':
+			ThisFreezeIndex = "{:02X}".format(FreezeIndex)
+			PidCount = MULTI_PID_MAX // 2
+		ResponseMode = "{:02X}".format(int(PidMode, 16) + 0x40)
+		for Index in range(0, len(Pids), PidCount):
+			Request = PidMode
+			for Pid in Pids[Index:Index + PidCount]:
+				Request += Pid + ThisFreezeIndex
+			Response = self.GetResponse(bytearray(Request + "\r", 'UTF-8'))
+			for Message in self.GetMessages(Response):
+				if Message[:2] == ResponseMode:
+					Offset = 2
+					while Offset < len(Message):
+						Pid = Message[Offset:Offset + 2]
+						Offset += 2 + len(ThisFreezeIndex)
+						if Pid not in DataLengths:
+							break
+						if Pid not in Result:
+							Result[Pid] = Message[Offset:Offset + 2 * DataLengths[Pid]]
+						Offset += 2 * DataLengths[Pid]
+
+		return Result
+
+
+
+#/***************************************************************/
+#/* Discover the PIDs of a mode the ECU supports, from the      */
+#/* supported PID bitmaps. On CAN several bitmaps are requested */
+#/* in each request, on other protocols one at a time. Further  */
+#/* requests are only made when the last bitmap received shows  */
+#/* the next range is supported.                                */
+#/***************************************************************/
+	def DiscoverPids(self, PidMode, PidDescriptions, FreezeIndex = -1):
+		PidCount = 1
+		if self.IsCan() == True:
+			PidCount = MULTI_PID_MAX
+			if PidMode == '02':
+				PidCount = MULTI_PID_MAX // 2
+
+		DataLengths = dict.fromkeys(BITMAP_PIDS, BITMAP_DATA_LENGTH)
+		for Index in range(0, len(BITMAP_PIDS), PidCount):
+			Pids = BITMAP_PIDS[Index:Index + PidCount]
+			if PidCount == 1:
+				PruneCount = 2
+				if PidMode == '02':
+					PruneCount = 3
+				Response = self.GetResponse(bytearray(PidMode + Pids[0] + ("{:02X}".format(FreezeIndex) if PidMode == '02' else "") + "\r", 'UTF-8'))
+				Bitmaps = { Pids[0] : self.PruneData(Response, PruneCount)[:2 * BITMAP_DATA_LENGTH] }
+			else:
+				Bitmaps = self.GetMultiPidData(PidMode, Pids, DataLengths, FreezeIndex)
+			for Pid in Pids:
+				if Pid in Bitmaps and len(Bitmaps[Pid]) == 2 * BITMAP_DATA_LENGTH:
+					self.ResolvePidData(PidMode, Bitmaps[Pid], Pid, PidDescriptions, FreezeIndex)
+			# The lowest bit of the last bitmap shows if the next range is supported.
+			LastBitmap = Bitmaps.get(Pids[-1], "")
+			if len(LastBitmap) != 2 * BITMAP_DATA_LENGTH or int(LastBitmap, 16) & 0x01 == 0:
+				break
+
+
+
 #/**********************************************************/
 #/* Convert pairs of data bytes into actual trouble codes, */
 #/* translating the first digit as required, and ignoring  */
@@ -507,7 +1382,7 @@ class ELM327:
 		TroubleCodes = list()
 		while len(Data) > 0:
 			ThisCode = Data[:4]
-			if int(ThisCode) != 0:
+			if int(ThisCode, 16) != 0:
 				TroubleCodes.append(self.TroubleCodePrefix[ThisCode[0]] + ThisCode[1:])
 			Data = Data[4:]
 		return TroubleCodes
@@ -522,8 +1397,8 @@ class ELM327:
 	def GetTroubleCodeData(self, OBDIImode):
 		TroubleCodeData = {}
 		Response = self.GetResponse(OBDIImode + b'\r')
-		Response = self.PruneData(Response, 1)
-		TroubleCodes = self.DataToTroubleCodes(Response)
+		Messages = [ ("", Message) for Message in self.GetMessages(Response) ]
+		TroubleCodes = self.DataToTroubleCodes("".join(RawCode for Ecu, RawCode in self.GetRawTroubleCodes(str(OBDIImode, 'utf-8'), Messages)))
 		for TroubleCode in TroubleCodes:
 			if TroubleCode in self.TroubleCodeDescriptions:
 				TroubleCodeData[TroubleCode] = self.TroubleCodeDescriptions[TroubleCode]
@@ -533,6 +1408,118 @@ class ELM327:
 
 
 
+#/****************************************************************/
+#/* Split a response into the messages of each ECU which         */
+#/* answered, with headers turned on. CAN frames are the CAN ID, */
+#/* the frame type and length, and data. Multiple frame messages */
+#/* are joined, keeping the messages of each ECU apart. Other    */
+#/* protocols have a three byte header, ending with the address  */
+#/* of the ECU, and a checksum byte after the data. Return a     */
+#/* list of tuples of ECU and message data, in the order sent.   */
+#/****************************************************************/
+	def GetEcuMessages(self, Response):
+		Messages = []
+		# Multiple frame messages still being received, with the byte count expected.
+		Receiving = {}
+		IdLength = 3
+		if self.Protocol in CAN_29BIT_PROTOCOLS:
+			IdLength = 8
+		for ThisLine in Response.split('\n'):
+			try:
+				int(ThisLine, 16)
+			except ValueError:
+				continue
+			if self.IsCan() == False:
+				if len(ThisLine) > 8:
+					Messages.append([ThisLine[4:6], ThisLine[6:-2]])
+			elif len(ThisLine) > IdLength + 2:
+				CanId = ThisLine[:IdLength]
+				FrameType = ThisLine[IdLength]
+				if FrameType == '0':
+					Messages.append([CanId, ThisLine[IdLength + 2:IdLength + 2 + 2 * int(ThisLine[IdLength + 1], 16)]])
+				elif FrameType == '1':
+					Messages.append([CanId, ThisLine[IdLength + 4:]])
+					Receiving[CanId] = (Messages[-1], 2 * int(ThisLine[IdLength + 1:IdLength + 4], 16))
+				elif FrameType == '2' and CanId in Receiving:
+					Message, Length = Receiving[CanId]
+					Message[1] = (Message[1] + ThisLine[IdLength + 2:])[:Length]
+		return [ (Ecu, Data) for Ecu, Data in Messages ]
+
+
+
+#/*************************************************************/
+#/* Get the trouble codes in the messages answering a trouble */
+#/* code mode, as pairs of data bytes, skipping zero codes    */
+#/* used as padding. Provide a list of tuples of ECU and      */
+#/* message. Return a list of tuples of ECU and trouble code. */
+#/*************************************************************/
+	def GetRawTroubleCodes(self, Mode, Messages):
+		Result = []
+		ResponseMode = "{:02X}".format(int(Mode, 16) + 0x40)
+		for Ecu, Message in Messages:
+			if Message[:2] == ResponseMode:
+				# CAN messages have a count of the trouble codes before the codes.
+				Data = Message[2:]
+				if self.IsCan() == True:
+					Data = Data[2:]
+				for Index in range(0, len(Data) - 3, 4):
+					if int(Data[Index:Index + 4], 16) != 0:
+						Result.append((Ecu, Data[Index:Index + 4]))
+		return Result
+
+
+
+#/***************************************************************/
+#/* Read the stored, pending and permanent trouble codes of     */
+#/* every ECU in one pass, with headers turned on to tell the   */
+#/* ECUs apart. All the codes found are then translated and     */
+#/* looked up in a single pass, and kept as a sweep, until      */
+#/* reconnected, the trouble codes are cleared or a refresh is  */
+#/* asked for. If headers can't be turned on, the trouble codes */
+#/* are still read, without knowing which ECU sent them.        */
+#/***************************************************************/
+	def GetTroubleCodeSweep(self, Refresh = False):
+		if Refresh == True or self.TroubleCodes == None:
+			StartTime = time.time()
+			RawCodes = []
+			Headers = False
+			try:
+				self.SetHeader("")
+				Headers = self.GetResponse(b'AT H1\r') == 'OK\n'
+				for Mode, Kind in TROUBLE_CODE_MODES:
+					Response = self.GetResponse(bytearray(Mode + "\r", 'UTF-8'))
+					if Headers == True:
+						Messages = self.GetEcuMessages(Response)
+					else:
+						Messages = [ ("", Message) for Message in self.GetMessages(Response) ]
+					for Ecu, RawCode in self.GetRawTroubleCodes(Mode, Messages):
+						RawCodes.append((Ecu, Kind, RawCode))
+			except Exception as Catch:
+				print(STRING_ERROR + " GetTroubleCodeSweep : " + str(Catch))
+			if Headers == True:
+				self.GetResponse(b'AT H0\r')
+			# Translate and look up each different trouble code once, however many ECUs or modes reported it.
+			Lookup = {}
+			for RawCode in set(ThisCode[2] for ThisCode in RawCodes):
+				TroubleCode = self.DataToTroubleCodes(RawCode)[0]
+				Lookup[RawCode] = (TroubleCode, self.TroubleCodeDescriptions.get(TroubleCode, STRING_NO_DESCRIPTION))
+			Codes = [ (Ecu, Kind) + Lookup[RawCode] for Ecu, Kind, RawCode in RawCodes ]
+			self.TroubleCodes = TroubleCodeSweep.TroubleCodeSweep(Codes, StartTime, time.time())
+			self.SessionTroubleCodes.append(self.TroubleCodes)
+		return self.TroubleCodes
+
+
+
+#/*************************************************************/
+#/* Get every trouble code sweep taken since connecting, so   */
+#/* codes read and then cleared are still known at the end of */
+#/* the session.                                              */
+#/*************************************************************/
+	def GetSessionTroubleCodes(self):
+		return list(self.SessionTroubleCodes)
+
+
+
 #/*******************************************************/
 #/* The OBDII protocol will sometimes prefix a response */
 #/* with confirmation of the request sent or other      */
@@ -566,12 +1553,7 @@ class ELM327:
 		ResultArray = ()
 
 		if '0101' in self.ValidPIDs:
-			if FreezeIndex == -1:
-				Response = self.GetResponse(b'0101\r')
-				Response = self.PruneData(Response, 2)
-			else:
-				Response = self.GetResponse(bytearray("0201" + "{:02d}".format(FreezeIndex) + "\r", 'UTF-8'))
-				Response = self.PruneData(Response, 3)
+			Response = self.GetPidResponse('0101', FreezeIndex)
 
 			ResultVal1 = int(Response[:2], 16)
 			if (ResultVal1 & 0x80) != 0:
@@ -740,12 +1722,7 @@ class ELM327:
 	def PID0102(self, FreezeIndex = -1):
 		Result = STRING_NO_DATA
 
-		if FreezeIndex == -1:
-			Response = self.GetResponse(b'0102\r')
-			Response = self.PruneData(Response, 2)
-		else:
-			Response = self.GetResponse(bytearray("0202" + "{:02d}".format(FreezeIndex) + "\r", 'UTF-8'))
-			Response = self.PruneData(Response, 3)
+		Response = self.GetPidResponse('0102', FreezeIndex)
 
 		TroubleCodes = self.DataToTroubleCodes(Response)
 		if TroubleCodes[0] in self.TroubleCodeDescriptions:
@@ -764,12 +1741,7 @@ class ELM327:
 		ResultArray = ()
 
 		if '0103' in self.ValidPIDs:
-			if FreezeIndex == -1:
-				Response = self.GetResponse(b'0103\r')
-				Response = self.PruneData(Response, 2)
-			else:
-				Response = self.GetResponse(bytearray("0203" + "{:02d}".format(FreezeIndex) + "\r", 'UTF-8'))
-				Response = self.PruneData(Response, 3)
+			Response = self.GetPidResponse('0103', FreezeIndex)
 			if Response[:2] in self.FuelSystemStatus:
 				ResultArray += ("Fuel System 1",)
 				ResultArray += (self.FuelSystemStatus[Response[:2]],)
@@ -795,12 +1767,7 @@ class ELM327:
 		Result = STRING_NO_DATA
 
 		if '0104' in self.ValidPIDs:
-			if FreezeIndex == -1:
-				Response = self.GetResponse(b'0104\r')
-				Response = self.PruneData(Response, 2)
-			else:
-				Response = self.GetResponse(bytearray("0204" + "{:02d}".format(FreezeIndex) + "\r", 'UTF-8'))
-				Response = self.PruneData(Response, 3)
+			Response = self.GetPidResponse('0104', FreezeIndex)
 			Result = 100 * int(Response, 16) / 255
 
 		return Result
@@ -814,12 +1781,7 @@ class ELM327:
 		Result = STRING_NO_DATA
 
 		if '0105' in self.ValidPIDs:
-			if FreezeIndex == -1:
-				Response = self.GetResponse(b'0105\r')
-				Response = self.PruneData(Response, 2)
-			else:
-				Response = self.GetResponse(bytearray("0205" + "{:02d}".format(FreezeIndex) + "\r", 'UTF-8'))
-				Response = self.PruneData(Response, 3)
+			Response = self.GetPidResponse('0105', FreezeIndex)
 			Result = int(Response, 16) - 40
 
 		return Result
@@ -832,12 +1794,7 @@ class ELM327:
 		Result = STRING_NO_DATA
 
 		if '0106' in self.ValidPIDs:
-			if FreezeIndex == -1:
-				Response = self.GetResponse(b'0106\r')
-				Response = self.PruneData(Response, 2)
-			else:
-				Response = self.GetResponse(bytearray("0206" + "{:02d}".format(FreezeIndex) + "\r", 'UTF-8'))
-				Response = self.PruneData(Response, 3)
+			Response = self.GetPidResponse('0106', FreezeIndex)
 			Result = (100 * int(Response, 16) / 128) - 100
 
 		return Result
@@ -850,12 +1807,7 @@ class ELM327:
 		Result = STRING_NO_DATA
 
 		if '0107' in self.ValidPIDs:
-			if FreezeIndex == -1:
-				Response = self.GetResponse(b'0107\r')
-				Response = self.PruneData(Response, 2)
-			else:
-				Response = self.GetResponse(bytearray("0207" + "{:02d}".format(FreezeIndex) + "\r", 'UTF-8'))
-				Response = self.PruneData(Response, 3)
+			Response = self.GetPidResponse('0107', FreezeIndex)
 			Result = (100 * int(Response, 16) / 128) - 100
 
 		return Result
@@ -868,12 +1820,7 @@ class ELM327:
 		Result = STRING_NO_DATA
 
 		if '0108' in self.ValidPIDs:
-			if FreezeIndex == -1:
-				Response = self.GetResponse(b'0108\r')
-				Response = self.PruneData(Response, 2)
-			else:
-				Response = self.GetResponse(bytearray("0208" + "{:02d}".format(FreezeIndex) + "\r", 'UTF-8'))
-				Response = self.PruneData(Response, 3)
+			Response = self.GetPidResponse('0108', FreezeIndex)
 			Result = (100 * int(Response, 16) / 128) - 100
 
 		return Result
@@ -886,12 +1833,7 @@ class ELM327:
 		Result = STRING_NO_DATA
 
 		if '0109' in self.ValidPIDs:
-			if FreezeIndex == -1:
-				Response = self.GetResponse(b'0109\r')
-				Response = self.PruneData(Response, 2)
-			else:
-				Response = self.GetResponse(bytearray("0209" + "{:02d}".format(FreezeIndex) + "\r", 'UTF-8'))
-				Response = self.PruneData(Response, 3)
+			Response = self.GetPidResponse('0109', FreezeIndex)
 			Result = (100 * int(Response, 16) / 128) - 100
 
 		return Result
@@ -904,12 +1846,7 @@ class ELM327:
 		Result = STRING_NO_DATA
 
 		if '010A' in self.ValidPIDs:
-			if FreezeIndex == -1:
-				Response = self.GetResponse(b'010A\r')
-				Response = self.PruneData(Response, 2)
-			else:
-				Response = self.GetResponse(bytearray("020A" + "{:02d}".format(FreezeIndex) + "\r", 'UTF-8'))
-				Response = self.PruneData(Response, 3)
+			Response = self.GetPidResponse('010A', FreezeIndex)
 			Result = 3 * int(Response, 16)
 
 		return Result
@@ -922,12 +1859,7 @@ class ELM327:
 		Result = STRING_NO_DATA
 
 		if '010B' in self.ValidPIDs:
-			if FreezeIndex == -1:
-				Response = self.GetResponse(b'010B\r')
-				Response = self.PruneData(Response, 2)
-			else:
-				Response = self.GetResponse(bytearray("020B" + "{:02d}".format(FreezeIndex) + "\r", 'UTF-8'))
-				Response = self.PruneData(Response, 3)
+			Response = self.GetPidResponse('010B', FreezeIndex)
 			Result = int(Response, 16)
 
 		return Result
@@ -940,12 +1872,7 @@ class ELM327:
 		Result = STRING_NO_DATA
 
 		if '010C' in self.ValidPIDs:
-			if FreezeIndex == -1:
-				Response = self.GetResponse(b'010C\r')
-				Response = self.PruneData(Response, 2)
-			else:
-				Response = self.GetResponse(bytearray("020C" + "{:02d}".format(FreezeIndex) + "\r", 'UTF-8'))
-				Response = self.PruneData(Response, 3)
+			Response = self.GetPidResponse('010C', FreezeIndex)
 			Result = (256 * int(Response[:2], 16) + int(Response[2:4], 16)) / 4
 
 		return Result
@@ -958,12 +1885,7 @@ class ELM327:
 		Result = STRING_NO_DATA
 
 		if '010D' in self.ValidPIDs:
-			if FreezeIndex == -1:
-				Response = self.GetResponse(b'010D\r')
-				Response = self.PruneData(Response, 2)
-			else:
-				Response = self.GetResponse(bytearray("020D" + "{:02d}".format(FreezeIndex) + "\r", 'UTF-8'))
-				Response = self.PruneData(Response, 3)
+			Response = self.GetPidResponse('010D', FreezeIndex)
 			Result = int(Response[:2], 16)
 
 		return Result
@@ -976,12 +1898,7 @@ class ELM327:
 		Result = STRING_NO_DATA
 
 		if '010E' in self.ValidPIDs:
-			if FreezeIndex == -1:
-				Response = self.GetResponse(b'010E\r')
-				Response = self.PruneData(Response, 2)
-			else:
-				Response = self.GetResponse(bytearray("020E" + "{:02d}".format(FreezeIndex) + "\r", 'UTF-8'))
-				Response = self.PruneData(Response, 3)
+			Response = self.GetPidResponse('010E', FreezeIndex)
 			Result = (int(Response[:2], 16) / 2) - 64
 
 		return Result
@@ -994,12 +1911,7 @@ class ELM327:
 		Result = STRING_NO_DATA
 
 		if '010F' in self.ValidPIDs:
-			if FreezeIndex == -1:
-				Response = self.GetResponse(b'010F\r')
-				Response = self.PruneData(Response, 2)
-			else:
-				Response = self.GetResponse(bytearray("020F" + "{:02d}".format(FreezeIndex) + "\r", 'UTF-8'))
-				Response = self.PruneData(Response, 3)
+			Response = self.GetPidResponse('010F', FreezeIndex)
 			Result = int(Response[:2], 16) - 40
 
 		return Result
@@ -1012,12 +1924,7 @@ class ELM327:
 		Result = STRING_NO_DATA
 
 		if '0110' in self.ValidPIDs:
-			if FreezeIndex == -1:
-				Response = self.GetResponse(b'0110\r')
-				Response = self.PruneData(Response, 2)
-			else:
-				Response = self.GetResponse(bytearray("0210" + "{:02d}".format(FreezeIndex) + "\r", 'UTF-8'))
-				Response = self.PruneData(Response, 3)
+			Response = self.GetPidResponse('0110', FreezeIndex)
 			Result = (256 * int(Response[:2], 16) + int(Response[2:4], 16)) / 100
 
 		return Result
@@ -1030,12 +1937,7 @@ class ELM327:
 		Result = STRING_NO_DATA
 
 		if '0111' in self.ValidPIDs:
-			if FreezeIndex == -1:
-				Response = self.GetResponse(b'0111\r')
-				Response = self.PruneData(Response, 2)
-			else:
-				Response = self.GetResponse(bytearray("0211" + "{:02d}".format(FreezeIndex) + "\r", 'UTF-8'))
-				Response = self.PruneData(Response, 3)
+			Response = self.GetPidResponse('0111', FreezeIndex)
 			Result = 100 * int(Response[:2], 16) / 255
 
 		return Result
@@ -1048,12 +1950,7 @@ class ELM327:
 		Result = STRING_NO_DATA
 
 		if '0112' in self.ValidPIDs:
-			if FreezeIndex == -1:
-				Response = self.GetResponse(b'0112\r')
-				Response = self.PruneData(Response, 2)
-			else:
-				Response = self.GetResponse(bytearray("0212" + "{:02d}".format(FreezeIndex) + "\r", 'UTF-8'))
-				Response = self.PruneData(Response, 3)
+			Response = self.GetPidResponse('0112', FreezeIndex)
 			if Response in self.CommandedSecondaryAirStatus:
 				Result = self.CommandedSecondaryAirStatus[Response]
 			else:
@@ -1069,12 +1966,7 @@ class ELM327:
 		Result = STRING_NO_DATA
 
 		if '0113' in self.ValidPIDs:
-			if FreezeIndex == -1:
-				Response = self.GetResponse(b'0113\r')
-				Response = self.PruneData(Response, 2)
-			else:
-				Response = self.GetResponse(bytearray("0213" + "{:02d}".format(FreezeIndex) + "\r", 'UTF-8'))
-				Response = self.PruneData(Response, 3)
+			Response = self.GetPidResponse('0113', FreezeIndex)
 			ResultVal = int(Response[:2], 16)
 			Result = ( "BANK1", (ResultVal & 0x0F), "BANK2", (ResultVal & 0xF0) >> 4)
 
@@ -1088,12 +1980,7 @@ class ELM327:
 		Result = STRING_NO_DATA
 
 		if '0114' in self.ValidPIDs:
-			if FreezeIndex == -1:
-				Response = self.GetResponse(b'0114\r')
-				Response = self.PruneData(Response, 2)
-			else:
-				Response = self.GetResponse(bytearray("0214" + "{:02d}".format(FreezeIndex) + "\r", 'UTF-8'))
-				Response = self.PruneData(Response, 3)
+			Response = self.GetPidResponse('0114', FreezeIndex)
 			Result = ( int(Response[:2], 16) / 200, (100 * int(Response[2:4], 16) / 128) - 100 )
 
 		return Result
@@ -1106,12 +1993,7 @@ class ELM327:
 		Result = STRING_NO_DATA
 
 		if '0115' in self.ValidPIDs:
-			if FreezeIndex == -1:
-				Response = self.GetResponse(b'0115\r')
-				Response = self.PruneData(Response, 2)
-			else:
-				Response = self.GetResponse(bytearray("0215" + "{:02d}".format(FreezeIndex) + "\r", 'UTF-8'))
-				Response = self.PruneData(Response, 3)
+			Response = self.GetPidResponse('0115', FreezeIndex)
 			Result = ( int(Response[:2], 16) / 200, (100 * int(Response[2:4], 16) / 128) - 100 )
 
 		return Result
@@ -1124,12 +2006,7 @@ class ELM327:
 		Result = STRING_NO_DATA
 
 		if '0116' in self.ValidPIDs:
-			if FreezeIndex == -1:
-				Response = self.GetResponse(b'0116\r')
-				Response = self.PruneData(Response, 2)
-			else:
-				Response = self.GetResponse(bytearray("0216" + "{:02d}".format(FreezeIndex) + "\r", 'UTF-8'))
-				Response = self.PruneData(Response, 3)
+			Response = self.GetPidResponse('0116', FreezeIndex)
 			Result = ( int(Response[:2], 16) / 200, (100 * int(Response[2:4], 16) / 128) - 100 )
 
 		return Result
@@ -1142,12 +2019,7 @@ class ELM327:
 		Result = STRING_NO_DATA
 
 		if '0117' in self.ValidPIDs:
-			if FreezeIndex == -1:
-				Response = self.GetResponse(b'0117\r')
-				Response = self.PruneData(Response, 2)
-			else:
-				Response = self.GetResponse(bytearray("0217" + "{:02d}".format(FreezeIndex) + "\r", 'UTF-8'))
-				Response = self.PruneData(Response, 3)
+			Response = self.GetPidResponse('0117', FreezeIndex)
 			Result = ( int(Response[:2], 16) / 200, (100 * int(Response[2:4], 16) / 128) - 100 )
 
 		return Result
@@ -1160,12 +2032,7 @@ class ELM327:
 		Result = STRING_NO_DATA
 
 		if '0118' in self.ValidPIDs:
-			if FreezeIndex == -1:
-				Response = self.GetResponse(b'0118\r')
-				Response = self.PruneData(Response, 2)
-			else:
-				Response = self.GetResponse(bytearray("0218" + "{:02d}".format(FreezeIndex) + "\r", 'UTF-8'))
-				Response = self.PruneData(Response, 3)
+			Response = self.GetPidResponse('0118', FreezeIndex)
 			Result = ( int(Response[:2], 16) / 200, (100 * int(Response[2:4], 16) / 128) - 100 )
 
 		return Result
@@ -1178,12 +2045,7 @@ class ELM327:
 		Result = STRING_NO_DATA
 
 		if '0119' in self.ValidPIDs:
-			if FreezeIndex == -1:
-				Response = self.GetResponse(b'0119\r')
-				Response = self.PruneData(Response, 2)
-			else:
-				Response = self.GetResponse(bytearray("0219" + "{:02d}".format(FreezeIndex) + "\r", 'UTF-8'))
-				Response = self.PruneData(Response, 3)
+			Response = self.GetPidResponse('0119', FreezeIndex)
 			Result = ( int(Response[:2], 16) / 200, (100 * int(Response[2:4], 16) / 128) - 100 )
 
 		return Result
@@ -1196,12 +2058,7 @@ class ELM327:
 		Result = STRING_NO_DATA
 
 		if '011A' in self.ValidPIDs:
-			if FreezeIndex == -1:
-				Response = self.GetResponse(b'011A\r')
-				Response = self.PruneData(Response, 2)
-			else:
-				Response = self.GetResponse(bytearray("021A" + "{:02d}".format(FreezeIndex) + "\r", 'UTF-8'))
-				Response = self.PruneData(Response, 3)
+			Response = self.GetPidResponse('011A', FreezeIndex)
 			Result = ( int(Response[:2], 16) / 200, (100 * int(Response[2:4], 16) / 128) - 100 )
 
 		return Result
@@ -1214,12 +2071,7 @@ class ELM327:
 		Result = STRING_NO_DATA
 
 		if '011B' in self.ValidPIDs:
-			if FreezeIndex == -1:
-				Response = self.GetResponse(b'011B\r')
-				Response = self.PruneData(Response, 2)
-			else:
-				Response = self.GetResponse(bytearray("021B" + "{:02d}".format(FreezeIndex) + "\r", 'UTF-8'))
-				Response = self.PruneData(Response, 3)
+			Response = self.GetPidResponse('011B', FreezeIndex)
 			Result = ( int(Response[:2], 16) / 200, (100 * int(Response[2:4], 16) / 128) - 100 )
 
 		return Result
@@ -1232,12 +2084,7 @@ class ELM327:
 		Result = STRING_NO_DATA
 
 		if '011C' in self.ValidPIDs:
-			if FreezeIndex == -1:
-				Response = self.GetResponse(b'011C\r')
-				Response = self.PruneData(Response, 2)
-			else:
-				Response = self.GetResponse(bytearray("021C" + "{:02d}".format(FreezeIndex) + "\r", 'UTF-8'))
-				Response = self.PruneData(Response, 3)
+			Response = self.GetPidResponse('011C', FreezeIndex)
 			if Response in self.VehicleObdStandards:
 				Result = self.VehicleObdStandards[Response]
 			else:
@@ -1266,12 +2113,7 @@ class ELM327:
 		Result = STRING_NO_DATA
 
 		if '0121' in self.ValidPIDs:
-			if FreezeIndex == -1:
-				Response = self.GetResponse(b'0121\r')
-				Response = self.PruneData(Response, 2)
-			else:
-				Response = self.GetResponse(bytearray("0221" + "{:02d}".format(FreezeIndex) + "\r", 'UTF-8'))
-				Response = self.PruneData(Response, 3)
+			Response = self.GetPidResponse('0121', FreezeIndex)
 			Result = 256 * int(Response[:2], 16) + int(Response[2:4], 16)
 
 		return Result
@@ -1572,7 +2414,7 @@ class ELM327:
 	def PID02C0(self, FreezeIndex = -1):
 		Response = self.GetResponse(bytearray("02C0" + "{:02d}".format(FreezeIndex) + "\r", 'UTF-8'))
 		Response = self.PruneData(Response, 3)
-		self.ResolvePidData('02', Response, 'C0', self.PidDescriptionsMode01)
+		self.ResolvePidData('02', Response, 'C0', self.PidDescriptionsMode01, FreezeIndex)
 	PidFunctions["02C0"] = PID02C0
 
 
@@ -1592,6 +2434,14 @@ class ELM327:
 
 # PID04 Erase all Pending/Stored Trouble Codes and Data from the ECU.
 	def PID04(self, FreezeIndex = -1):
+		# Freeze frames are cleared along with the trouble codes.
+		self.ValidFreezePIDs = {}
+		self.FreezeFramesDiscovered = []
+		self.FreezeSnapshots = {}
+		# As are the monitor test results, the monitors start again.
+		self.MonitorTestResults = None
+		self.OxygenSensorResults = None
+		self.TroubleCodes = None
 		return self.GetResponse(b'04\r')
 	PidFunctions["04"] = PID04
 
@@ -1600,45 +2450,54 @@ class ELM327:
 #/* ODBII MODE 05 - Test results, oxygen sensor monitoring (non CAN only). */
 #/**************************************************************************/
 
-# PID050100 Supported PIDs for Mode 0501 [01 -> 20].
+# PID050100 Supported oxygen sensors of each Mode 05 test [01 -> 20]. CAN vehicles report these tests in Mode 06.
 	def PID050100(self, FreezeIndex = -1):
-		Response = self.GetResponse(b'050100\r')
-		Response = self.PruneData(Response, 3)
-		self.ResolvePidData('05', Response, '00', self.PidDescriptionsMode05)
+		if self.IsCan() == False:
+			for Tid in sorted(set(PID[:2] for PID in self.PidDescriptionsMode05)):
+				Response = self.GetResponse(bytearray("05" + Tid + "00\r", 'UTF-8'))
+				Response = self.PruneData(Response, 3)[:2 * BITMAP_DATA_LENGTH]
+				if len(Response) == 2 * BITMAP_DATA_LENGTH:
+					Bitmap = int(Response, 16)
+					for Sensor in range(1, 8 * BITMAP_DATA_LENGTH + 1):
+						if Bitmap & (1 << (8 * BITMAP_DATA_LENGTH - Sensor)) != 0:
+							PID = Tid + "{:02X}".format(Sensor)
+							self.ValidPIDs['05' + PID] = self.PidDescriptionsMode05.get(PID, STRING_NO_DESCRIPTION)
 	PidFunctions["050100"] = PID050100
 
 
-# PID050101
-# PID050102
-# PID050103
-# PID050104
-# PID050105
-# PID050106
-# PID050107
-# PID050108
-# PID050109
-# PID05010A
-# PID05010B
-# PID05010C
-# PID05010D
-# PID05010E
-# PID05010F
-# PID050110
-# PID050121
-# PID050122
-# PID050123
-# PID050124
-# PID050125
-# PID050126
-# PID050127
-# PID050128
-# PID050129
-# PID05012A
-# PID05012B
-# PID05012C
-# PID05012D
-# PID05012E
-# PID05012F
+# Get all the supported oxygen sensor test results from the ECU, in one pass. A test not answered, or answered with a
+# negative response, is no data, and the rest are still kept. The results are kept until reconnected, the trouble
+# codes are cleared or a refresh is asked for.
+	def GetOxygenSensorTests(self, Refresh = False):
+		if Refresh == True or self.OxygenSensorResults == None:
+			Results = {}
+			for PID in sorted(self.ValidPIDs):
+				if PID[:2] == '05' and PID[4:6] != '00':
+					Results[PID] = STRING_NO_DATA
+					Response = self.GetResponse(bytearray(PID + "\r", 'UTF-8'))
+					# A positive response echoes the test and sensor, with the mode plus 0x40.
+					for Message in self.GetMessages(Response):
+						if Message[:6] == "45" + PID[2:6]:
+							try:
+								Results[PID] = int(Message[6:8], 16) * MODE05_SCALING.get(PID[2:4], 1)
+							except Exception as Catch:
+								print(STRING_ERROR + " in PID" + PID + " : " + str(Catch))
+							break
+			self.OxygenSensorResults = Results
+		return self.OxygenSensorResults
+
+
+# PID05 Get an oxygen sensor test result, the test and sensor follow the '05' prefix.
+	def PID05(self, PID, FreezeIndex = -1):
+		Result = STRING_NO_DATA
+
+		if PID in self.ValidPIDs and FreezeIndex == -1:
+			Results = self.GetOxygenSensorTests()
+			if PID in Results:
+				Result = Results[PID]
+
+		return Result
+	ModeFunctions["05"] = PID05
 
 
 #/***********************************************************************/
@@ -1646,6 +2505,37 @@ class ELM327:
 #/*               (Test results, oxygen sensor monitoring for CAN only) */
 #/***********************************************************************/
 
+# PID06 Get the on-board monitor test results from the ECU. The supported MIDs are discovered once, with several
+# MID ranges in each request, then each MID is requested once, answering all of its tests. The results are kept
+# for the drive cycle, until reconnected, the trouble codes are cleared or a refresh is asked for.
+	def PID06(self, FreezeIndex = -1, Refresh = False):
+		if Refresh == True or self.MonitorTestResults == None:
+			Results = []
+			# Non CAN protocols use a different Mode 06 format, not supported.
+			if self.IsCan() == True:
+				if self.MonitorMidsDiscovered == False:
+					self.DiscoverPids('06', self.MonitorTests.GetMidDescriptions())
+					self.MonitorMidsDiscovered = True
+				for PID in sorted(self.ValidPIDs):
+					if PID[:2] == '06' and len(PID) == 4 and PID[2:4] not in BITMAP_PIDS:
+						Response = self.GetResponse(bytearray(PID + "\r", 'UTF-8'))
+						for Message in self.GetMessages(Response):
+							if Message[:4] == "46" + PID[2:4]:
+								Results += self.MonitorTests.Decode(Message[2:])
+			self.MonitorTestResults = Results
+		return self.MonitorTestResults
+	PidFunctions["06"] = PID06
+
+
+
+#/************************************************************/
+#/* Get on-board monitor test results as text lines, for the */
+#/* trouble tab and the PDF report.                          */
+#/************************************************************/
+	def GetMonitorTestsText(self, Results):
+		return self.MonitorTests.GetText(Results)
+
+
 
 #/*******************************************************************/
 #/* ODBII MODE 07 - Show pending diagnostic trouble codes.          */
@@ -1670,7 +2560,11 @@ class ELM327:
 # PID0900 Supported PIDs for Mode 09 [01 -> 20].
 	def PID0900(self, FreezeIndex = -1):
 		Response = self.GetResponse(b'0900\r')
-		Response = self.PruneData(Response, 3)
+		# Non CAN responses include a message count byte.
+		if self.IsCan() == True:
+			Response = self.PruneData(Response, 2)
+		else:
+			Response = self.PruneData(Response, 3)
 		self.ResolvePidData('09', Response, '00', self.PidDescriptionsMode09)
 	PidFunctions["0900"] = PID0900
 
@@ -1827,7 +2721,139 @@ class ELM327:
 # PID090B
 
 
+# Get the vehicle information of all the supported Mode 09 PIDs, such as the VIN, calibration IDs, CVNs and ECU name.
+# These don't change, so are kept by VIN from one session to the next. The VIN is read once each connect, a vehicle
+# seen before with the same Mode 01 supported PIDs has the rest taken from what was kept. Otherwise, or when a
+# refresh is asked for, the rest are read. The information is kept until reconnected.
+	def GetVehicleInfo(self, Refresh = False):
+		if Refresh == True or self.VehicleInfo == None:
+			Pids = [ PID for PID in sorted(self.ValidPIDs) if PID[:2] == '09' and self.ValidPIDs[PID][FIELD_PID_DESCRIPTION] != '!' ]
+			Bitmap = self.GetPidBitmap()
+			Vin = self.ReadVin(Refresh)
+			Info = None
+			if Refresh == False and Vin != "" and self.VehicleIdentity.GetBitmap(Vin) == Bitmap:
+				Info = self.VehicleIdentity.GetValues(Vin)
+			if Info == None or any(PID not in Info for PID in Pids):
+				Info = {}
+				for PID in Pids:
+					if PID == '0902' and self.VinData != None:
+						Info[PID] = self.VinData
+					else:
+						Info[PID] = self.DoPID(PID)
+			# Only keep vehicle information read without error, under a VIN.
+			if Vin != "" and STRING_ERROR not in Info.values():
+				self.VehicleIdentity.SetValues(Vin, Bitmap, Info)
+			self.VehicleInfo = Info
+		return self.VehicleInfo
+
+
+# Get the Mode 01 supported PIDs of the vehicle connected to, as kept with its vehicle information.
+	def GetPidBitmap(self):
+		return ",".join(PID for PID in sorted(self.ValidPIDs) if PID[:2] == '01' and len(PID) == 4)
+
+
+# Read the VIN of the vehicle connected to from the ECU, only once each connect unless a refresh is asked for.
+# Return the VIN, empty when the ECU does not give one.
+	def ReadVin(self, Refresh = False):
+		if Refresh == True or self.Vin == None:
+			self.Vin = ""
+			self.VinData = None
+			if '0902' in self.ValidPIDs:
+				VinData = self.DoPID('0902')
+				if VinData not in (STRING_NO_DATA, STRING_ERROR):
+					self.Vin = str(VinData).replace(' ', '')
+					self.VinData = VinData
+		return self.Vin
+
+
+# Get the VIN of the vehicle connected to without reading from the ECU, empty when not read or not known.
+	def GetVin(self):
+		Vin = self.Vin
+		if Vin == None:
+			Vin = ""
+		return Vin
+
+
+#/**************************************************/
+#/* SAE J1939 - Broadcast parameters (heavy duty). */
+#/**************************************************/
+
+# PIDJ Get the latest value of a J1939 SPN broadcast on the CAN BUS, the SPN follows the 'J' prefix.
+	def PIDJ(self, PID, FreezeIndex = -1):
+		Result = STRING_NO_DATA
+
+		if PID in self.ValidPIDs:
+			# Broadcasts are only received while monitoring, which stops for other requests.
+			if self.Monitoring == False:
+				self.StartMonitor(KeepFrames = True)
+			self.ReadMonitor()
+			Value = self.J1939.GetValue(PID[1:], self.Monitor)
+			if Value != None:
+				Result = Value
+
+		return Result
+	ModeFunctions["J"] = PIDJ
+
+
+#/***********************************************************/
+#/* Virtual PIDs - Calculated from the values of real PIDs. */
+#/***********************************************************/
+
+# PIDV Get the value of a virtual PID, from the latest values of the PIDs it is calculated from. Inputs are only read
+# from the ECU when they have not been read recently, such as for another meter.
+	def PIDV(self, PID, FreezeIndex = -1):
+		Result = STRING_NO_DATA
+
+		if PID in self.ValidPIDs and FreezeIndex == -1:
+			for InputPID in self.Derived.GetStaleInputs(PID, DERIVED_MAX_AGE):
+				self.DoPID(InputPID)
+			Value = self.Derived.GetValue(PID)
+			if Value != None:
+				Result = Value
+
+		return Result
+	ModeFunctions["V"] = PIDV
+
+
+#/****************************************************************************/
+#/* ODBII MODE 21 / MODE 22 - Manufacturer enhanced data, from vehicle pack. */
+#/****************************************************************************/
+
+# PIDE Get the value of an enhanced PID, from the ECU and request the vehicle enhanced PID pack defines.
+	def PIDE(self, PID, FreezeIndex = -1):
+		Result = STRING_NO_DATA
+
+		if PID in self.ValidPIDs and FreezeIndex == -1:
+			Value = self.GetEnhancedValue(PID)
+			if Value != None:
+				Result = Value
+
+		return Result
+	ModeFunctions["E"] = PIDE
+
+# Ask the ECU for an enhanced PID, return the value decoded from a positive response, or None when the ECU gives a
+# negative response (7F), NO DATA, or a response too short to hold the value. The header is left set to the ECU asked.
+	def GetEnhancedValue(self, PID):
+		Result = None
+
+		if self.SetHeader(self.Enhanced.GetHeader(PID)) == True:
+			Request = self.Enhanced.GetRequest(PID)
+			Response = self.GetResponse(bytearray(Request + "\r", 'UTF-8'))
+			# A positive response echoes the request, with the mode plus 0x40.
+			ResponsePrefix = "{:02X}".format(int(Request[:2], 16) + 0x40) + Request[2:]
+			for Message in self.GetMessages(Response):
+				if Message[:len(ResponsePrefix)] == ResponsePrefix:
+					Result = self.Enhanced.Decode(PID, Message[len(ResponsePrefix):])
+					break
+
+		return Result
+
+
 #/****************************************************************************/
 #/* ODBII MODE 0A - Permanent diagnostic trouble codes (DTCs, Cleared DTCs). */
 #/****************************************************************************/
 
+# PID0A Get the permanent trouble codes, those which can't be cleared by Mode 04.
+	def PID0A(self, FreezeIndex = -1):
+		return self.GetTroubleCodeData(b'0A')
+	PidFunctions["0A"] = PID0A
@@ -0,0 +1,590 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#/***************************************************************************/
+#/* Raspberry Pi ELM327 OBBII CAN BUS Diagnostic Software.                  */
+#/*                                                                         */
+#/* (C) Jason Birch 2018-05-15 V1.04                                        */
+#/*                                                                         */
+#/* Class: Emulator                                                         */
+#/* In memory replacement for the serial port an ELM327 device is on.       */
+#/* Answers AT commands and OBDII requests from a simulated vehicle, so the */
+#/* ELM327 class can be driven without an ELM327 device or a vehicle.       */
+#/***************************************************************************/
+
+
+
+import time
+
+
+
+# Default simulated ELM327 device response delay, in seconds.
+EMULATOR_LATENCY = 0.0
+
+# Simulated vehicle identification number.
+EMULATOR_VIN = "WMWRE32030TE12345"
+
+# Simulated stored, pending and permanent trouble codes of the engine ECU, as ECU data bytes.
+EMULATOR_STORED_CODES = [ "0171", "0300" ]
+EMULATOR_PENDING_CODES = [ "0420" ]
+EMULATOR_PERMANENT_CODES = [ "0171" ]
+
+# Simulated ECUs answering trouble code requests: CAN ID, K-line address, and the trouble codes of each mode.
+EMULATOR_TROUBLE_CODE_ECUS = [
+	("7E8", "10", { "03" : EMULATOR_STORED_CODES, "07" : EMULATOR_PENDING_CODES, "0A" : EMULATOR_PERMANENT_CODES }),
+	# Transmission ECU, with a stored code of its own.
+	("7E9", "18", { "03" : [ "0700" ], "07" : [], "0A" : [] }),
+]
+
+# Byte CAN frames are padded with, after the end of the message.
+EMULATOR_CAN_PADDING = "55"
+
+# Mode 01 PIDs the simulated vehicle supports.
+EMULATOR_MODE01_PIDS = [
+	0x01, 0x03, 0x04, 0x05, 0x06, 0x07, 0x0B, 0x0C, 0x0D, 0x0E, 0x0F, 0x10,
+	0x11, 0x13, 0x14, 0x15, 0x1C, 0x20, 0x21,
+]
+
+# Mode 09 PIDs the simulated vehicle supports.
+EMULATOR_MODE09_PIDS = [ 0x02, 0x04, 0x0A ]
+
+# Oxygen sensors the simulated vehicle supports Mode 05 tests for, bank 1 sensors 1 and 2.
+EMULATOR_MODE05_SENSORS = [ 0x01, 0x02 ]
+
+# Mode 06 on-board monitor tests the simulated vehicle supports on CAN, for each MID:
+# TID, unit and scaling ID, test value, minimum limit and maximum limit.
+EMULATOR_MODE06_TESTS = {
+	# Oxygen sensor monitor bank 1 sensor 1, rich to lean and lean to rich switch times.
+	0x01 : [ (0x05, 0x10, 72, 0, 100), (0x06, 0x10, 64, 0, 100) ],
+	# Catalyst monitor bank 1, oxygen storage ratio.
+	0x21 : [ (0x80, 0x20, 0x0066, 0x0000, 0x00C0) ],
+	# Misfire monitor general data, and cylinders 1 to 4, EWMA and current cycle misfire counts.
+	0xA1 : [ (0x0B, 0x24, 3, 0, 0xFFFF), (0x0C, 0x24, 5, 0, 0xFFFF) ],
+	0xA2 : [ (0x0B, 0x24, 0, 0, 0xFFFF), (0x0C, 0x24, 0, 0, 0xFFFF) ],
+	0xA3 : [ (0x0B, 0x24, 3, 0, 0xFFFF), (0x0C, 0x24, 5, 0, 0xFFFF) ],
+	0xA4 : [ (0x0B, 0x24, 0, 0, 0xFFFF), (0x0C, 0x24, 0, 0, 0xFFFF) ],
+	0xA5 : [ (0x0B, 0x24, 0, 0, 0xFFFF), (0x0C, 0x24, 0, 0, 0xFFFF) ],
+}
+# Mode 06 MIDs the simulated vehicle reports as supported, including the MIDs linking the supported MID ranges.
+EMULATOR_MODE06_MIDS = sorted(list(EMULATOR_MODE06_TESTS) + [ 0x20, 0x40, 0x60, 0x80, 0xA0 ])
+
+# Header (AT SH) of the simulated engine ECU, which answers manufacturer enhanced requests.
+EMULATOR_ENHANCED_HEADER = "8012F1"
+
+# Mode 21 / Mode 22 enhanced requests the simulated engine ECU answers, and the data byte count of each.
+EMULATOR_ENHANCED_PIDS = {
+	"221001" : 2,
+	"221002" : 1,
+	"221010" : 1,
+	"221011" : 1,
+	"221012" : 1,
+	"221013" : 1,
+	"2107" : 1,
+}
+
+# Fixed responses to ELM327 AT commands, any other AT command answers OK.
+EMULATOR_AT_RESPONSES = {
+	"ATZ" : "\r\rELM327 v1.5",
+	"ATI" : "ELM327 v1.5",
+	"AT@1" : "OBDII to RS232 Interpreter",
+	"AT@2" : "?",
+	"ATDP" : "AUTO, ISO 9141-2",
+	"ATDPN" : "A3",
+	"ATRV" : "12.6V",
+	"ATCS" : "?",
+	"ATKW" : "1:08 2:08",
+	"ATBD" : "00 00 00 00 00 00 00 00 00 00 00 00 00",
+	"ATPPS" : "00:FF F 01:FF F 02:FF F 03:32 F\r04:01 F 05:FF F 06:F1 F 07:09 F",
+}
+
+# Seconds a simulated K-line ECU session survives without communication, the P3 maximum.
+EMULATOR_P3_TIMEOUT = 5.0
+
+# Default simulated ELM327 device wakeup message period (AT SW 92), in seconds.
+EMULATOR_WAKEUP_PERIOD = 0x92 * 0.02
+
+# CAN IDs broadcast periodically on the simulated CAN BUS, and the period of each in seconds.
+EMULATOR_CAN_FRAMES = {
+	"316" : 0.01,
+	"329" : 0.01,
+	"1F0" : 0.02,
+	"545" : 0.1,
+}
+
+# 29 bit CAN IDs a simulated heavy duty vehicle broadcasts with SAE J1939, and the period of each in seconds.
+EMULATOR_J1939_FRAMES = {
+	# EEC1 - Electronic engine controller 1.
+	"0CF00400" : 0.02,
+	# CCVS - Cruise control/vehicle speed.
+	"18FEF100" : 0.1,
+	# ET1 - Engine temperature 1.
+	"18FEEE00" : 1.0,
+}
+
+# Size of the simulated ELM327 device transmit buffer, in monitor mode it fills when not read fast enough.
+EMULATOR_MONITOR_BUFFER = 512
+
+
+
+class Emulator:
+	def __init__(self, Latency = EMULATOR_LATENCY, J1939 = False, Can = False):
+		# Attributes expected of a serial port by the ELM327 class.
+		self.name = "EMULATOR"
+		self.timeout = 0
+		self.write_timeout = 0
+
+		# Delay before each response becomes available.
+		self.Latency = Latency
+		# Simulate a heavy duty vehicle, only broadcasting SAE J1939.
+		self.J1939 = J1939
+		# Simulate a CAN vehicle, accepting several PIDs in each Mode 01 and Mode 02 request.
+		self.Can = Can
+		# Simulated ELM327 device settings.
+		self.Echo = True
+		self.Protocol = "0"
+		self.WakeupPeriod = EMULATOR_WAKEUP_PERIOD
+		self.Header = ""
+		# Show headers (AT H1) on trouble code answers.
+		self.Headers = False
+		# Time of the last communication with the simulated ECU.
+		self.LastRequestTime = None
+		# Response bytes waiting to be read.
+		self.ReadBuffer = bytearray()
+		self.ReadIndex = 0
+		# Count of requests processed, drives the simulated vehicle values.
+		self.RequestCount = 0
+		# Simulated CAN BUS monitor state.
+		self.Monitoring = False
+		self.MonitorFilter = ""
+		self.MonitorStart = 0
+		self.MonitorSent = {}
+
+
+
+#/**********************************************************/
+#/* Nothing to release, provided for serial compatibility. */
+#/**********************************************************/
+	def close(self):
+		self.ReadBuffer = bytearray()
+		self.ReadIndex = 0
+
+
+
+#/*************************************************************/
+#/* Receive a request, as if sent to an ELM327 device, and    */
+#/* queue the response to be read back, ending with a prompt. */
+#/*************************************************************/
+	def write(self, Data):
+		Request = str(bytes(Data), 'utf-8').replace('\r', '')
+		self.RequestCount += 1
+		if self.Latency > 0:
+			time.sleep(self.Latency)
+		Response = ""
+		if self.Monitoring == True:
+			# Any character stops monitoring, after the frames already queued.
+			self.Monitoring = False
+			self.ReadBuffer = self.ReadBuffer[self.ReadIndex:] + bytearray("STOPPED\r\r>", 'utf-8')
+		else:
+			if self.Echo == True:
+				Response += Request + "\r"
+			if Request.replace(' ', '').upper() == "ATMA":
+				# Monitoring streams frames without a prompt.
+				self.Monitoring = True
+				self.MonitorStart = time.perf_counter()
+				self.MonitorSent = {}
+				self.ReadBuffer = bytearray(Response, 'utf-8')
+			else:
+				Response += self.GetSessionInit(Request.replace(' ', '').upper())
+				Response += self.GetAnswer(Request.replace(' ', '').upper())
+				self.ReadBuffer = bytearray(Response + "\r\r>", 'utf-8')
+		self.ReadIndex = 0
+		return len(Data)
+
+
+
+#/*****************************************************************/
+#/* Read a single byte of the queued response, or empty on a time */
+#/* out when no more response data is available.                  */
+#/*****************************************************************/
+	def read(self, Size = 1):
+		Result = b''
+		if self.Monitoring == True:
+			self.AddMonitorFrames()
+		if self.ReadIndex < len(self.ReadBuffer):
+			Result = bytes(self.ReadBuffer[self.ReadIndex:self.ReadIndex + Size])
+			self.ReadIndex += len(Result)
+		return Result
+
+
+
+#/******************************************************/
+#/* Number of bytes waiting to be read, as on a serial */
+#/* port.                                              */
+#/******************************************************/
+	@property
+	def in_waiting(self):
+		if self.Monitoring == True:
+			self.AddMonitorFrames()
+		return len(self.ReadBuffer) - self.ReadIndex
+
+
+
+#/****************************************************************/
+#/* In monitor mode, queue the frames broadcast on the simulated */
+#/* CAN BUS since the last call. When more is queued than the    */
+#/* ELM327 device buffer holds, stop with BUFFER FULL as the     */
+#/* ELM327 device does.                                          */
+#/****************************************************************/
+	def AddMonitorFrames(self):
+		Elapsed = time.perf_counter() - self.MonitorStart
+		Frames = ""
+		CanFrames = EMULATOR_CAN_FRAMES
+		if self.J1939 == True:
+			CanFrames = EMULATOR_J1939_FRAMES
+		for CanId in CanFrames:
+			if self.MonitorFilter == "" or self.MonitorFilter == CanId:
+				Due = int(Elapsed / CanFrames[CanId])
+				Sent = self.MonitorSent.get(CanId, 0)
+				for Count in range(Sent, Due):
+					Frames += CanId + self.GetCanFrameData(CanId, Count) + "\r"
+				self.MonitorSent[CanId] = Due
+		if Frames != "":
+			self.ReadBuffer = self.ReadBuffer[self.ReadIndex:] + bytearray(Frames, 'utf-8')
+			self.ReadIndex = 0
+			if len(self.ReadBuffer) > EMULATOR_MONITOR_BUFFER:
+				End = self.ReadBuffer.rfind(b'\r', 0, EMULATOR_MONITOR_BUFFER) + 1
+				self.ReadBuffer = self.ReadBuffer[:End] + bytearray("BUFFER FULL\r\r>", 'utf-8')
+				self.Monitoring = False
+
+
+
+#/******************************************************/
+#/* Data bytes of a frame broadcast on the CAN BUS, as */
+#/* hex, slowly varying between frames.                */
+#/******************************************************/
+	def GetCanFrameData(self, CanId, Count):
+		Phase = Count % 256
+		if CanId == "316":
+			Rpm = int((800 + 20 * Phase) / 0.15625)
+			Data = "0500" + "{:02X}{:02X}".format(Rpm & 0xFF, Rpm >> 8) + "00000000"
+		elif CanId == "329":
+			Data = "00" + "{:02X}".format(int((85 + 48.373) / 0.75)) + "000000000000"
+		elif CanId == "1F0":
+			Speed = 16 * (Phase % 120)
+			Data = "{:02X}{:02X}".format(Speed & 0xFF, Speed >> 8) * 4
+		elif CanId == "0CF00400":
+			Rpm = int((700 + 10 * Phase) / 0.125)
+			Data = "F0" + "7D" + "{:02X}".format(125 + Phase % 100) + "{:02X}{:02X}".format(Rpm & 0xFF, Rpm >> 8) + "00FFFF"
+		elif CanId == "18FEF100":
+			Speed = 256 * (Phase % 100)
+			Data = "FF" + "{:02X}{:02X}".format(Speed & 0xFF, Speed >> 8) + "FFFFFFFFFF"
+		elif CanId == "18FEEE00":
+			Data = "{:02X}".format(40 + 88) + "{:02X}".format(40 + 35) + "FFFF" + "FFFFFFFF"
+		else:
+			Data = "{:02X}".format(Phase) + "00000000000000"
+		return Data
+
+
+
+#/***************************************************************/
+#/* A K-line ECU session times out when neither requests nor    */
+#/* wakeup messages are sent within the P3 time, and the ELM327 */
+#/* device has to initialise the bus again before the next      */
+#/* request. Return the bus init text shown when this happens.  */
+#/***************************************************************/
+	def GetSessionInit(self, Request):
+		Result = ""
+		if Request[:2] != "AT" and self.J1939 == False:
+			Now = time.perf_counter()
+			if self.Protocol[-1:] in ("3", "4", "5") and self.LastRequestTime != None:
+				Idle = Now - self.LastRequestTime
+				if Idle > EMULATOR_P3_TIMEOUT and (self.WakeupPeriod == 0 or self.WakeupPeriod > EMULATOR_P3_TIMEOUT):
+					Result = "BUS INIT: ...OK\r"
+			self.LastRequestTime = Now
+		return Result
+
+
+
+#/*************************************************/
+#/* Produce the answer to a single request, as an */
+#/* ELM327 device with spaces turned off would.   */
+#/*************************************************/
+	def GetAnswer(self, Request):
+		if Request[:2] == "AT":
+			if Request == "ATE0":
+				self.Echo = False
+			elif Request == "ATE1":
+				self.Echo = True
+			elif Request == "ATZ":
+				self.Echo = True
+				self.MonitorFilter = ""
+				self.Header = ""
+				self.Headers = False
+			elif Request == "ATH1":
+				self.Headers = True
+			elif Request == "ATH0":
+				self.Headers = False
+			elif Request[:4] == "ATSH":
+				self.Header = Request[4:]
+			elif Request[:4] == "ATSW":
+				self.WakeupPeriod = int(Request[4:], 16) * 0.02
+			elif Request[:4] == "ATSP":
+				self.Protocol = Request[4:]
+			elif Request[:5] == "ATCRA":
+				self.MonitorFilter = Request[5:]
+			elif Request == "ATAR":
+				self.MonitorFilter = ""
+			Result = EMULATOR_AT_RESPONSES.get(Request, "OK")
+			if Request == "ATDPN" and self.Can == True:
+				Result = "A6"
+		elif self.J1939 == True:
+			# A heavy duty vehicle doesn't answer OBDII requests.
+			Result = "UNABLE TO CONNECT"
+		elif self.Can == True and Request[:2] in ("01", "02"):
+			Result = self.GetCanPidAnswer(Request)
+		elif self.Can == True and Request[:2] == "06":
+			Result = self.GetMonitorTestAnswer(Request)
+		elif self.Can == True and Request == "0900":
+			Result = "4900" + self.GetBitmap(EMULATOR_MODE09_PIDS, 0x00)
+		elif Request[:2] == "01" and len(Request) == 4:
+			Result = self.GetPidAnswer("41", Request[2:4], "")
+		elif Request[:2] == "02" and len(Request) == 6:
+			Result = self.GetPidAnswer("42", Request[2:4], Request[4:6])
+		elif Request in ("03", "07", "0A"):
+			Result = self.GetTroubleCodeAnswer(Request)
+		elif Request == "04":
+			Result = "44"
+		elif Request[:2] == "05" and len(Request) == 6:
+			Result = self.GetOxygenSensorAnswer(Request[2:4], int(Request[4:6], 16))
+		elif Request[:2] == "09" and len(Request) == 4:
+			Result = self.GetVehicleAnswer(Request[2:4])
+		elif Request[:2] in ("21", "22"):
+			Result = self.GetEnhancedAnswer(Request)
+		else:
+			Result = "NO DATA"
+		return Result
+
+
+
+#/***********************************************************/
+#/* Build a bitmap of supported PIDs, in the range starting */
+#/* at the given PID.                                       */
+#/***********************************************************/
+	def GetBitmap(self, Pids, PidStart):
+		Bitmap = 0
+		for Pid in Pids:
+			if Pid > PidStart and Pid <= PidStart + 0x20:
+				Bitmap |= 1 << (0x20 - (Pid - PidStart))
+		return "{:08X}".format(Bitmap)
+
+
+
+#/***********************************************************/
+#/* Answer a Mode 01 or Mode 02 request with data values of */
+#/* a simulated vehicle, slowly varying between requests.   */
+#/***********************************************************/
+	def GetPidAnswer(self, Prefix, Pid, Frame):
+		PidValue = int(Pid, 16)
+		Phase = self.RequestCount % 256
+		if PidValue % 0x20 == 0:
+			if PidValue in EMULATOR_MODE01_PIDS or PidValue == 0:
+				Data = self.GetBitmap(EMULATOR_MODE01_PIDS, PidValue)
+			else:
+				return "NO DATA"
+		elif PidValue not in EMULATOR_MODE01_PIDS:
+			return "NO DATA"
+		elif PidValue == 0x01:
+			Data = "{:02X}".format(0x80 + len(EMULATOR_STORED_CODES)) + "076500"
+		elif PidValue == 0x03:
+			Data = "0200"
+		elif PidValue == 0x0C:
+			Data = "{:04X}".format(4 * (800 + 20 * Phase))
+		elif PidValue == 0x10:
+			Data = "{:04X}".format(250 + 10 * Phase)
+		elif PidValue == 0x13:
+			Data = "03"
+		elif PidValue in (0x14, 0x15):
+			Data = "{:02X}".format(Phase % 200) + "80"
+		elif PidValue == 0x1C:
+			Data = "06"
+		elif PidValue == 0x21:
+			Data = "0010"
+		else:
+			Data = "{:02X}".format((PidValue * 7 + Phase) % 256)
+		return Prefix + Pid + Frame + Data
+
+
+
+#/**************************************************************/
+#/* Answer a Mode 01 or Mode 02 request on CAN, which may hold */
+#/* up to six PIDs, or three PID and freeze frame pairs. Only  */
+#/* the supported PIDs are answered, in a single message which */
+#/* is split over several frames when too long for one.        */
+#/**************************************************************/
+	def GetCanPidAnswer(self, Request):
+		Mode = Request[:2]
+		Step = 2
+		if Mode == "02":
+			Step = 4
+		Data = ""
+		for Index in range(2, len(Request), Step):
+			Answer = self.GetPidAnswer("", Request[Index:Index + 2], Request[Index + 2:Index + Step])
+			if Answer != "NO DATA":
+				Data += Answer
+		if Data == "":
+			return "NO DATA"
+		return self.GetCanMessage("{:02X}".format(int(Mode, 16) + 0x40) + Data)
+
+
+
+#/*************************************************************/
+#/* Format a CAN message as the ELM327 device shows it, split */
+#/* over several numbered frames when too long for one.       */
+#/*************************************************************/
+	def GetCanMessage(self, Data):
+		if len(Data) <= 14:
+			return Data
+		Lines = [ "{:03X}".format(len(Data) // 2), "0:" + Data[:12] ]
+		Index = 12
+		while Index < len(Data):
+			Lines.append("{:X}:".format((len(Lines) - 1) % 16) + Data[Index:Index + 14])
+			Index += 14
+		return "\r".join(Lines)
+
+
+
+#/*************************************************************/
+#/* Format a CAN message as the ELM327 device shows it with   */
+#/* headers turned on, each frame starting with the CAN ID    */
+#/* and the frame type and length, and padded to eight bytes. */
+#/*************************************************************/
+	def GetCanHeaderMessage(self, CanId, Data):
+		if len(Data) <= 14:
+			return CanId + "{:02X}".format(len(Data) // 2) + Data + EMULATOR_CAN_PADDING * ((14 - len(Data)) // 2)
+		Lines = [ CanId + "1{:03X}".format(len(Data) // 2) + Data[:12] ]
+		Index = 12
+		while Index < len(Data):
+			Frame = Data[Index:Index + 14]
+			Lines.append(CanId + "2{:X}".format(len(Lines) % 16) + Frame + EMULATOR_CAN_PADDING * ((14 - len(Frame)) // 2))
+			Index += 14
+		return "\r".join(Lines)
+
+
+
+#/************************************************************/
+#/* Answer a Mode 03, Mode 07 or Mode 0A request, from each  */
+#/* simulated ECU. CAN messages start with a count of the    */
+#/* trouble codes, other protocols send three codes in each  */
+#/* message, padded with zero codes. With headers turned on, */
+#/* K-line messages have a header and a checksum byte.       */
+#/************************************************************/
+	def GetTroubleCodeAnswer(self, Mode):
+		ResponseMode = "{:02X}".format(int(Mode, 16) + 0x40)
+		Lines = []
+		for CanId, Address, Codes in EMULATOR_TROUBLE_CODE_ECUS:
+			if self.Can == True:
+				Data = ResponseMode + "{:02X}".format(len(Codes[Mode])) + "".join(Codes[Mode])
+				if self.Headers == True:
+					Lines.append(self.GetCanHeaderMessage(CanId, Data))
+				else:
+					Lines.append(self.GetCanMessage(Data))
+			else:
+				for Index in range(0, max(len(Codes[Mode]), 1), 3):
+					Data = ResponseMode + "".join(Codes[Mode][Index:Index + 3]).ljust(12, "0")
+					if self.Headers == True:
+						Data = "486B" + Address + Data
+						Data += "{:02X}".format(sum(bytes.fromhex(Data)) % 256)
+					Lines.append(Data)
+		return "\r".join(Lines)
+
+
+
+#/**************************************************************/
+#/* Answer a Mode 06 request on CAN. Up to six supported MID   */
+#/* ranges can be asked for at once, otherwise a single MID is */
+#/* asked for and all of its test results are answered.        */
+#/**************************************************************/
+	def GetMonitorTestAnswer(self, Request):
+		Mids = [ int(Request[Index:Index + 2], 16) for Index in range(2, len(Request), 2) ]
+		Data = ""
+		if all(Mid % 0x20 == 0 for Mid in Mids):
+			for Mid in Mids:
+				if Mid == 0 or Mid in EMULATOR_MODE06_MIDS:
+					Data += "{:02X}".format(Mid) + self.GetBitmap(EMULATOR_MODE06_MIDS, Mid)
+		elif len(Mids) == 1 and Mids[0] in EMULATOR_MODE06_TESTS:
+			for Tid, UnitScaling, Value, Minimum, Maximum in EMULATOR_MODE06_TESTS[Mids[0]]:
+				Data += "{:02X}{:02X}{:02X}{:04X}{:04X}{:04X}".format(Mids[0], Tid, UnitScaling, Value, Minimum, Maximum)
+		if Data == "":
+			return "NO DATA"
+		return self.GetCanMessage("46" + Data)
+
+
+
+#/***********************************************************/
+#/* Answer a Mode 05 oxygen sensor test request, for a test */
+#/* (TID) of an oxygen sensor, or of sensor 00 for a bitmap */
+#/* of the sensors supporting the test.                     */
+#/***********************************************************/
+	def GetOxygenSensorAnswer(self, Tid, Sensor):
+		if Tid not in ("01", "02"):
+			Result = "NO DATA"
+		elif Sensor == 0:
+			Result = "45" + Tid + "00" + self.GetBitmap(EMULATOR_MODE05_SENSORS, 0x00)
+		elif Sensor in EMULATOR_MODE05_SENSORS:
+			Result = "45" + Tid + "{:02X}".format(Sensor) + "{:02X}".format(0x5A if Tid == "01" else 0x50)
+		else:
+			Result = "NO DATA"
+		return Result
+
+
+
+#/**************************************************************/
+#/* Answer a manufacturer enhanced Mode 21 or Mode 22 request. */
+#/* Only the engine ECU answers, when addressed by its header, */
+#/* unknown requests get a request out of range response.      */
+#/**************************************************************/
+	def GetEnhancedAnswer(self, Request):
+		if self.Header != EMULATOR_ENHANCED_HEADER:
+			Result = "NO DATA"
+		elif Request not in EMULATOR_ENHANCED_PIDS:
+			Result = "7F" + Request[:2] + "31"
+		else:
+			Value = (self.RequestCount * 37 + int(Request[2:], 16)) % (256 ** EMULATOR_ENHANCED_PIDS[Request])
+			Result = "{:02X}".format(int(Request[:2], 16) + 0x40) + Request[2:] + "{:0{}X}".format(Value, 2 * EMULATOR_ENHANCED_PIDS[Request])
+		return Result
+
+
+
+#/********************************************************/
+#/* Answer a Mode 09 request, splitting text values over */
+#/* several response lines as non CAN ECUs do.           */
+#/********************************************************/
+	def GetVehicleAnswer(self, Pid):
+		PidValue = int(Pid, 16)
+		if PidValue == 0x00:
+			return "490001" + self.GetBitmap(EMULATOR_MODE09_PIDS, 0x00)
+		elif PidValue not in EMULATOR_MODE09_PIDS:
+			return "NO DATA"
+		elif PidValue == 0x02:
+			Text = EMULATOR_VIN
+		elif PidValue == 0x04:
+			Text = "CAL0123456789AB"
+		else:
+			Text = "ECM-EngineControl"
+		Data = bytearray(Text, 'utf-8')
+		while len(Data) % 4 != 0:
+			Data.insert(0, 0)
+		Lines = []
+		for Index in range(0, len(Data), 4):
+			Lines.append("49" + Pid + "{:02X}".format(Index // 4 + 1) + Data[Index:Index + 4].hex().upper())
+		return "\r".join(Lines)
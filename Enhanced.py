@@ -0,0 +1,139 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#/***************************************************************************/
+#/* Raspberry Pi ELM327 OBBII CAN BUS Diagnostic Software.                  */
+#/*                                                                         */
+#/* (C) Jason Birch 2018-05-15 V1.04                                        */
+#/*                                                                         */
+#/* Class: Enhanced                                                         */
+#/* Manufacturer enhanced PIDs (Mode 21 and Mode 22) of a vehicle, read     */
+#/* from the enhanced PID pack of the vehicle. Each PID has the header of   */
+#/* the ECU to ask, the request, the position and scaling of the value in   */
+#/* the response, and a description in the same form as the standard PIDs.  */
+#/***************************************************************************/
+
+
+
+# Enhanced PID definition fields, the rest of the line is the description.
+PACK_HEADER = 0
+PACK_REQUEST = 1
+PACK_START_BYTE = 2
+PACK_BYTE_COUNT = 3
+PACK_SIGNED = 4
+PACK_SCALE = 5
+PACK_OFFSET = 6
+PACK_DESCRIPTION = 7
+
+# Decoder fields, the definition fields worked out ready for decoding.
+DECODE_START = 0
+DECODE_END = 1
+DECODE_SIGNED = 2
+DECODE_SCALE = 3
+DECODE_OFFSET = 4
+
+
+
+class Enhanced:
+	def __init__(self):
+		self.Clear()
+
+
+
+#/*************************************************/
+#/* Forget the enhanced PIDs of the last vehicle. */
+#/*************************************************/
+	def Clear(self):
+		# Header and request of each enhanced PID.
+		self.Requests = {}
+		# Decoder of each enhanced PID.
+		self.Decoders = {}
+		# Description of each enhanced PID.
+		self.Descriptions = {}
+
+
+
+#/**************************************************************/
+#/* Load the enhanced PID pack of a vehicle. Each line is:     */
+#/* PID Header|Request|StartByte|ByteCount|Signed|Scale|Offset */
+#/* |Description, where Signed is S for a signed value or U    */
+#/* for unsigned, StartByte counts from the first data byte    */
+#/* after the echoed request, and the description is in the    */
+#/* same form as the standard PID descriptions. Lines starting */
+#/* with # are comments.                                       */
+#/**************************************************************/
+	def Load(self, PackFile):
+		Result = True
+		self.Clear()
+		try:
+			with open(PackFile) as ThisFile:
+				for ThisLine in ThisFile:
+					PID, Definition = ThisLine.strip().partition(" ")[::2]
+					Fields = Definition.split('|', PACK_DESCRIPTION)
+					if PID != "" and PID[:1] != "#" and len(Fields) > PACK_DESCRIPTION:
+						StartByte = int(Fields[PACK_START_BYTE])
+						self.Requests[PID] = (Fields[PACK_HEADER].upper(), Fields[PACK_REQUEST].upper())
+						self.Decoders[PID] = (2 * StartByte, 2 * (StartByte + int(Fields[PACK_BYTE_COUNT])), Fields[PACK_SIGNED].upper() == "S", float(Fields[PACK_SCALE]), float(Fields[PACK_OFFSET]))
+						self.Descriptions[PID] = Fields[PACK_DESCRIPTION]
+		except Exception as Catch:
+			print(PackFile + " : " + str(Catch))
+			self.Clear()
+			Result = False
+		return Result
+
+
+
+#/********************************************/
+#/* Get the list of enhanced PIDs, in order. */
+#/********************************************/
+	def GetPids(self):
+		return sorted(self.Requests)
+
+
+
+#/*******************************************/
+#/* Get the description of an enhanced PID. */
+#/*******************************************/
+	def GetDescription(self, PID):
+		return self.Descriptions[PID]
+
+
+
+#/****************************************************/
+#/* Get the header of the ECU an enhanced PID is on. */
+#/****************************************************/
+	def GetHeader(self, PID):
+		return self.Requests[PID][0]
+
+
+
+#/********************************************************/
+#/* Get the request to send for an enhanced PID, as hex. */
+#/********************************************************/
+	def GetRequest(self, PID):
+		return self.Requests[PID][1]
+
+
+
+#/*************************************************************/
+#/* Get the value of an enhanced PID from the data bytes of a */
+#/* response, after the echoed request. Return None when the  */
+#/* response is too short to hold the value.                  */
+#/*************************************************************/
+	def Decode(self, PID, Data):
+		Result = None
+		Decoder = self.Decoders[PID]
+		if len(Data) >= Decoder[DECODE_END]:
+			RawValue = int.from_bytes(bytes.fromhex(Data[Decoder[DECODE_START]:Decoder[DECODE_END]]), "big", signed = Decoder[DECODE_SIGNED])
+			Result = RawValue * Decoder[DECODE_SCALE] + Decoder[DECODE_OFFSET]
+		return Result
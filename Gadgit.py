@@ -19,6 +19,9 @@
 #/* Class: Gadgit                                                           */
 #/* Display value data in various visual formats. Such as meter,            */
 #/* vertial bar, horizontal bar, info...                                    */
+#/* The statistics of the values read are overlaid, the lowest, mean and    */
+#/* highest marked on the meter or bar, and the time at each band of values */
+#/* shown along the side of a bar.                                          */
 #/***************************************************************************/
 
 
@@ -28,6 +31,7 @@ import pygame
 import pygame.color
 import pygame.freetype
 import ELM327
+import PidStatistics
 import Visual
 import Button
 
@@ -40,6 +44,11 @@ STYLE_HORIZONTAL_BAR = 2
 STYLE_TEXT = 3
 STYLE_END = 4
 
+# Overlay the statistics of the values read, set from the configuration.
+STATISTICS_OVERLAY = True
+# Fraction of the width or height of a bar the time at value histogram is drawn across.
+HISTOGRAM_DEPTH = 0.25
+
 
 
 class Gadgit(Visual.Visual):
@@ -67,7 +76,8 @@ class Gadgit(Visual.Visual):
 				"BACKGROUND_COLOUR" : pygame.Color(0x5F, 0x5F, 0x5F),
 				"BAR_COLOUR" : pygame.Color(0x00, 0xFF, 0x00),
 				"BAR_HIGH_COLOUR" : pygame.Color(0xFF, 0x00, 0x00),
-				"FILL_COLOUR" : pygame.Color(0xFF, 0xFF, 0xFF)
+				"FILL_COLOUR" : pygame.Color(0xFF, 0xFF, 0xFF),
+				"STATISTICS_COLOUR" : pygame.Color(0x00, 0x7F, 0xFF)
 			},
 			STYLE_VERTICAL_BAR : {
 				"LABEL" : Text,
@@ -80,7 +90,8 @@ class Gadgit(Visual.Visual):
 				"BACKGROUND_COLOUR" : pygame.Color(0x00, 0x00, 0x00),
 				"BAR_COLOUR" : pygame.Color(0x00, 0xFF, 0x00),
 				"BAR_HIGH_COLOUR" : pygame.Color(0xFF, 0x00, 0x00),
-				"FILL_COLOUR" : pygame.Color(0x5F, 0x5F, 0x5F)
+				"FILL_COLOUR" : pygame.Color(0x5F, 0x5F, 0x5F),
+				"STATISTICS_COLOUR" : pygame.Color(0x00, 0xBF, 0xFF)
 			},
 			STYLE_HORIZONTAL_BAR : {
 				"LABEL" : Text,
@@ -93,7 +104,8 @@ class Gadgit(Visual.Visual):
 				"BACKGROUND_COLOUR" : pygame.Color(0x00, 0x00, 0x00),
 				"BAR_COLOUR" : pygame.Color(0x00, 0xFF, 0x00),
 				"BAR_HIGH_COLOUR" : pygame.Color(0xFF, 0x00, 0x00),
-				"FILL_COLOUR" : pygame.Color(0x5F, 0x5F, 0x5F)
+				"FILL_COLOUR" : pygame.Color(0x5F, 0x5F, 0x5F),
+				"STATISTICS_COLOUR" : pygame.Color(0x00, 0xBF, 0xFF)
 			},
 			STYLE_TEXT : {
 				"LABEL" : Text,
@@ -106,7 +118,8 @@ class Gadgit(Visual.Visual):
 				"BACKGROUND_COLOUR" : pygame.Color(0x00, 0x00, 0x00),
 				"BAR_COLOUR" : pygame.Color(0x00, 0xFF, 0x00),
 				"BAR_HIGH_COLOUR" : pygame.Color(0xFF, 0x00, 0x00),
-				"FILL_COLOUR" : pygame.Color(0x5F, 0x5F, 0x5F)
+				"FILL_COLOUR" : pygame.Color(0x5F, 0x5F, 0x5F),
+				"STATISTICS_COLOUR" : pygame.Color(0x00, 0xBF, 0xFF)
 			},
 		}
 
@@ -120,6 +133,9 @@ class Gadgit(Visual.Visual):
 		self.ValueHigh = 80
 		self.ValueMax = 100
 		self.Value = 0
+		# Statistics of the values read of the PID, None until there are some.
+		self.Summary = None
+		self.Histogram = None
 
 		# Appy the initial default style to the gague.
 		self.SetStyle(self.Style)
@@ -183,6 +199,8 @@ class Gadgit(Visual.Visual):
 	def SetPID(self, PID, PidDescription):
 		self.PID = PID
 		self.PidDescription = PidDescription
+		self.Summary = None
+		self.Histogram = None
 		ValueDefinition = self.PidDescription.split("|")
 		if len(ValueDefinition) > ELM327.FIELD_PID_MIN_1:
 			self.ValueMin = float(ValueDefinition[ELM327.FIELD_PID_MIN_1])
@@ -207,6 +225,17 @@ class Gadgit(Visual.Visual):
 
 
 
+#/**************************************************************/
+#/* Set the statistics of the values read of the PID of this   */
+#/* gague, a PidStatistics summary and time at value histogram */
+#/* or None.                                                   */
+#/**************************************************************/
+	def SetStatistics(self, Summary, Histogram):
+		self.Summary = Summary
+		self.Histogram = Histogram
+
+
+
 #/*******************************************************/
 #/* Set the min, max and high data range of this gague. */
 #/*******************************************************/
@@ -234,6 +263,7 @@ class Gadgit(Visual.Visual):
 		self.BarColour = self.StyleAttrib[self.Style]["BAR_COLOUR"]
 		self.BarHighColour = self.StyleAttrib[self.Style]["BAR_HIGH_COLOUR"]
 		self.FillColour = self.StyleAttrib[self.Style]["FILL_COLOUR"]
+		self.StatisticsColour = self.StyleAttrib[self.Style]["STATISTICS_COLOUR"]
 
 		# Arrange buttons so they don't clash in any gadgit type.
 		self.Buttons["DRAG"].SetPos((self.xLen - Visual.BUTTON_HEIGHT) / 2, (self.yLen - Visual.BUTTON_HEIGHT) / 2)
@@ -439,7 +469,97 @@ class Gadgit(Visual.Visual):
 		RenderText = Visual.Fonts["SmallFont"].render(ThisText, self.ColourBlack)
 		ThisSurface.blit(RenderText[0], (TextXPos, TextYPos))
 
+		# Overlay the statistics of the values read.
+		if STATISTICS_OVERLAY == True and self.Summary != None:
+			self.DisplayStatistics(ThisSurface, TextYPos + TextHeight + Visual.Y_MARGIN)
+
 		# Display all buttons on the gadgit.
 		for ThisButton in self.Buttons:
 			self.Buttons[ThisButton].Display(self.ThisSurface, self.xPos, self.yPos)
 
+
+
+#/**************************************************************/
+#/* Get the fraction of the range of this gague a value is at. */
+#/**************************************************************/
+	def GetRatio(self, Value):
+		return (0.000001 + Value - self.ValueMin) / (self.ValueMax - self.ValueMin)
+
+
+
+#/**************************************************************/
+#/* Format a statistic of this gague as its value is shown, or */
+#/* as a number when the value is not shown as one.            */
+#/**************************************************************/
+	def FormatStatistic(self, Value):
+		TextLabels = self.PidDescription.split("|")
+		if len(TextLabels) > ELM327.FIELD_PID_FORMAT_1 and TextLabels[ELM327.FIELD_PID_FORMAT_1].find("f}") > -1:
+			ThisFormat = TextLabels[ELM327.FIELD_PID_FORMAT_1]
+			if ThisFormat.find('[') > -1:
+				ThisFormat = ThisFormat[:ThisFormat.find('[')] + ThisFormat[ThisFormat.find(']')+1:]
+			Result = ThisFormat.format(Value).strip()
+		else:
+			Result = "{:.4g}".format(Value)
+		return Result
+
+
+
+#/***************************************************************/
+#/* Overlay the statistics of the values read on this gadgit.   */
+#/* The lowest, mean and highest are marked on the meter or     */
+#/* bar, and the time at each band of values is drawn along     */
+#/* the side of a bar, the band with the most time the deepest. */
+#/* The statistics are written from the position given down,    */
+#/* on a meter or text.                                         */
+#/***************************************************************/
+	def DisplayStatistics(self, ThisSurface, TextYPos):
+		Marks = [ self.Summary[PidStatistics.SUMMARY_MINIMUM], self.Summary[PidStatistics.SUMMARY_MEAN], self.Summary[PidStatistics.SUMMARY_MAXIMUM] ]
+		Seconds = []
+		if self.Histogram != None:
+			Bounds = self.Histogram[PidStatistics.HISTOGRAM_BOUNDS]
+			Seconds = self.Histogram[PidStatistics.HISTOGRAM_SECONDS]
+		MaxSeconds = max(Seconds, default = 0)
+
+		if self.Style == STYLE_GAGUE:
+			OriginX = int(Visual.X_MARGIN + self.xPos + (self.xLen - 2*Visual.X_MARGIN) / 2)
+			OriginY = int(Visual.Y_MARGIN + self.yPos + (self.xLen - 2*Visual.X_MARGIN) / 2)
+			Radius = int(self.xLen / 2 - 2 * Visual.X_MARGIN)
+			for Mark in Marks:
+				Angle = (math.pi / 180) * (-360 * self.GetRatio(Mark))
+				pygame.draw.line(ThisSurface, self.StatisticsColour, (OriginX + (Radius - 10) * math.sin(Angle), OriginY + (Radius - 10) * math.cos(Angle)), (OriginX + (Radius - 30) * math.sin(Angle), OriginY + (Radius - 30) * math.cos(Angle)), self.PointerWidth)
+		elif self.Style == STYLE_VERTICAL_BAR:
+			BarHeight = self.yLen - 2 * Visual.Y_MARGIN
+			BarBase = self.yPos + self.yLen - Visual.Y_MARGIN
+			for Band in range(len(Seconds)):
+				if Seconds[Band] > 0:
+					BandTop = int(BarBase - BarHeight * min(max(self.GetRatio(Bounds[Band + 1]), 0), 1))
+					BandBottom = int(BarBase - BarHeight * min(max(self.GetRatio(Bounds[Band]), 0), 1))
+					BandWidth = int((self.xLen - 2 * Visual.X_MARGIN) * HISTOGRAM_DEPTH * Seconds[Band] / MaxSeconds)
+					pygame.draw.rect(ThisSurface, self.StatisticsColour, (Visual.X_MARGIN + self.xPos, BandTop, BandWidth, BandBottom - BandTop), 0)
+			for Mark in Marks:
+				MarkYPos = int(BarBase - BarHeight * min(max(self.GetRatio(Mark), 0), 1))
+				pygame.draw.line(ThisSurface, self.StatisticsColour, (Visual.X_MARGIN + self.xPos, MarkYPos), (self.xPos + self.xLen - Visual.X_MARGIN, MarkYPos), 1)
+		elif self.Style == STYLE_HORIZONTAL_BAR:
+			BarWidth = self.xLen - 2 * Visual.X_MARGIN
+			BarBase = self.yPos + self.yLen - Visual.Y_MARGIN
+			for Band in range(len(Seconds)):
+				if Seconds[Band] > 0:
+					BandLeft = int(Visual.X_MARGIN + self.xPos + BarWidth * min(max(self.GetRatio(Bounds[Band]), 0), 1))
+					BandRight = int(Visual.X_MARGIN + self.xPos + BarWidth * min(max(self.GetRatio(Bounds[Band + 1]), 0), 1))
+					BandHeight = int((self.yLen - 2 * Visual.Y_MARGIN) * HISTOGRAM_DEPTH * Seconds[Band] / MaxSeconds)
+					pygame.draw.rect(ThisSurface, self.StatisticsColour, (BandLeft, BarBase - BandHeight, BandRight - BandLeft, BandHeight), 0)
+			for Mark in Marks:
+				MarkXPos = int(Visual.X_MARGIN + self.xPos + BarWidth * min(max(self.GetRatio(Mark), 0), 1))
+				pygame.draw.line(ThisSurface, self.StatisticsColour, (MarkXPos, self.yPos + Visual.Y_MARGIN), (MarkXPos, BarBase), 1)
+
+		# Write the statistics on a meter or text, the bars are too narrow.
+		if self.Style == STYLE_GAGUE or self.Style == STYLE_TEXT:
+			Lines = [
+				"MIN " + self.FormatStatistic(Marks[0]) + "  AVG " + self.FormatStatistic(Marks[1]) + "  MAX " + self.FormatStatistic(Marks[2]),
+				"  ".join("P" + "{:g}".format(100 * Fraction) + " " + self.FormatStatistic(Percentile) for Fraction, Percentile in zip(PidStatistics.PERCENTILES, self.Summary[PidStatistics.SUMMARY_PERCENTILES])),
+			]
+			for ThisText in Lines:
+				TextHeight = Visual.Fonts["SmallFont"].get_rect(ThisText)[3]
+				RenderText = Visual.Fonts["SmallFont"].render(ThisText, self.StatisticsColour)
+				ThisSurface.blit(RenderText[0], (self.xPos + Visual.X_MARGIN, TextYPos))
+				TextYPos += TextHeight + Visual.Y_MARGIN
@@ -0,0 +1,158 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#/***************************************************************************/
+#/* Raspberry Pi ELM327 OBBII CAN BUS Diagnostic Software.                  */
+#/*                                                                         */
+#/* (C) Jason Birch 2018-05-15 V1.04                                        */
+#/*                                                                         */
+#/* Class: J1939                                                            */
+#/* Decode SAE J1939 suspect parameters (SPNs) from the parameter groups    */
+#/* (PGNs) heavy duty vehicles broadcast on the CAN BUS, as received by the */
+#/* CAN monitor. The position and scaling of each SPN is read from a table. */
+#/***************************************************************************/
+
+
+
+import CanMonitor
+
+
+
+# SPN definition fields.
+SPN_PGN = 0
+SPN_START_BIT = 1
+SPN_BIT_LENGTH = 2
+SPN_SCALE = 3
+SPN_OFFSET = 4
+
+# PDU formats below this value are addressed to a destination, the PDU specific byte is not part of the PGN.
+PDU2_FORMAT_START = 0xF0
+
+
+
+class J1939:
+	def __init__(self, SpnFile = "DATA/J1939Spns.txt"):
+		self.InitResult = ""
+		# Position and scaling of each SPN.
+		self.Spns = {}
+		# SPNs carried in each PGN.
+		self.PgnSpns = {}
+		# PGN of each CAN ID seen, so it is only worked out once.
+		self.CanIdPgns = {}
+
+		try:
+			with open(SpnFile) as ThisFile:
+				for ThisLine in ThisFile:
+					Spn, Definition = ThisLine.strip().partition(" ")[::2]
+					Fields = Definition.split('|')
+					if Spn != "" and len(Fields) > SPN_OFFSET:
+						self.Spns[Spn] = [ Fields[SPN_PGN].upper(), int(Fields[SPN_START_BIT]), int(Fields[SPN_BIT_LENGTH]), float(Fields[SPN_SCALE]), float(Fields[SPN_OFFSET]) ]
+						self.PgnSpns.setdefault(Fields[SPN_PGN].upper(), []).append(Spn)
+		except Exception as Catch:
+			print(SpnFile + " : " + str(Catch))
+			self.InitResult += "FAILED TO READ FILE: " + SpnFile + "\n"
+
+
+
+#/*************************************************/
+#/* Get any errors or warnings which occured      */
+#/* during creation of an instance of this class. */
+#/*************************************************/
+	def GetInitResult(self):
+		return self.InitResult
+
+
+
+#/***************************************************************/
+#/* Get the PGN of a 29 bit CAN ID, as hex. Priority and source */
+#/* address are dropped, and for addressed (PDU1) messages the  */
+#/* destination address is dropped too.                         */
+#/***************************************************************/
+	def GetPgn(self, CanId):
+		if CanId not in self.CanIdPgns:
+			CanIdValue = int(CanId, 16)
+			PduFormat = (CanIdValue >> 16) & 0xFF
+			if PduFormat < PDU2_FORMAT_START:
+				Pgn = (CanIdValue >> 8) & 0x3FF00
+			else:
+				Pgn = (CanIdValue >> 8) & 0x3FFFF
+			self.CanIdPgns[CanId] = "{:04X}".format(Pgn)
+		return self.CanIdPgns[CanId]
+
+
+
+#/*************************************************************/
+#/* Get the latest frame data received for each PGN, from the */
+#/* frames of each CAN ID the CAN monitor has seen.           */
+#/*************************************************************/
+	def GetPgnData(self, ThisMonitor):
+		PgnData = {}
+		PgnTime = {}
+		for CanId in ThisMonitor.Ids:
+			if len(CanId) == 8:
+				Pgn = self.GetPgn(CanId)
+				if Pgn in self.PgnSpns:
+					IdStatistics = ThisMonitor.Ids[CanId]
+					if Pgn not in PgnTime or IdStatistics[CanMonitor.ID_LAST_TIME] > PgnTime[Pgn]:
+						PgnTime[Pgn] = IdStatistics[CanMonitor.ID_LAST_TIME]
+						PgnData[Pgn] = IdStatistics[CanMonitor.ID_LAST_DATA]
+		return PgnData
+
+
+
+#/**************************************************************/
+#/* Get the list of SPNs in the PGNs the CAN monitor has seen. */
+#/**************************************************************/
+	def GetSeenSpns(self, ThisMonitor):
+		Result = []
+		for Pgn in self.GetPgnData(ThisMonitor):
+			Result += self.PgnSpns[Pgn]
+		return Result
+
+
+
+#/**************************************************************/
+#/* Extract an SPN value from the data bytes of its PGN. J1939 */
+#/* data is little endian. Raw values in the top range are     */
+#/* reserved for error and not available indicators, return    */
+#/* None for these.                                            */
+#/**************************************************************/
+	def DecodeSpn(self, Spn, Data):
+		Result = None
+		ThisSpn = self.Spns[Spn]
+		if len(Data) * 4 >= ThisSpn[SPN_START_BIT] + ThisSpn[SPN_BIT_LENGTH]:
+			RawValue = int.from_bytes(bytes.fromhex(Data), "little")
+			RawValue = (RawValue >> ThisSpn[SPN_START_BIT]) & ((1 << ThisSpn[SPN_BIT_LENGTH]) - 1)
+			if ThisSpn[SPN_BIT_LENGTH] >= 8:
+				ValidMax = (0xFB << (ThisSpn[SPN_BIT_LENGTH] - 8)) - 1
+			else:
+				ValidMax = (1 << ThisSpn[SPN_BIT_LENGTH]) - 3
+			if RawValue <= ValidMax:
+				Result = RawValue * ThisSpn[SPN_SCALE] + ThisSpn[SPN_OFFSET]
+		return Result
+
+
+
+#/*************************************************************/
+#/* Get the value of an SPN from the latest frame of its PGN. */
+#/* Return None when the PGN has not been seen or the value   */
+#/* is not available.                                         */
+#/*************************************************************/
+	def GetValue(self, Spn, ThisMonitor):
+		Result = None
+		if Spn in self.Spns:
+			PgnData = self.GetPgnData(ThisMonitor)
+			Pgn = self.Spns[Spn][SPN_PGN]
+			if Pgn in PgnData:
+				Result = self.DecodeSpn(Spn, PgnData[Pgn])
+		return Result
@@ -0,0 +1,140 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#/***************************************************************************/
+#/* Raspberry Pi ELM327 OBBII CAN BUS Diagnostic Software.                  */
+#/*                                                                         */
+#/* (C) Jason Birch 2018-05-15 V1.04                                        */
+#/*                                                                         */
+#/* Class: MinMaxPyramid                                                    */
+#/* The lowest and highest value of a series in each period of time, kept   */
+#/* at several resolutions, each period twice as long as the level below.   */
+#/* Each level is updated as values are added, so a long history can be     */
+#/* drawn from the level with about one period per pixel, at a cost set by  */
+#/* the plot width rather than the number of values, and without losing     */
+#/* short spikes as drawing every Nth value would.                          */
+#/***************************************************************************/
+
+
+
+import RingBuffer
+
+
+
+# Seconds covered by each period of the lowest level.
+PYRAMID_PERIOD = 0.5
+# Number of levels, each with periods twice as long as the level below.
+PYRAMID_LEVELS = 8
+
+
+
+class MinMaxPyramid:
+	def __init__(self, Window):
+		# The lowest and highest value of each period, with the time each was read.
+		self.Mins = []
+		self.Maxs = []
+		# The period number, lowest and highest value of the newest period of each level.
+		self.LastPeriods = [ None ] * PYRAMID_LEVELS
+		self.LastMins = [ 0 ] * PYRAMID_LEVELS
+		self.LastMaxs = [ 0 ] * PYRAMID_LEVELS
+		for Level in range(PYRAMID_LEVELS):
+			Capacity = int(Window / self.GetPeriod(Level)) + 2
+			self.Mins.append(RingBuffer.RingBuffer(Capacity))
+			self.Maxs.append(RingBuffer.RingBuffer(Capacity))
+
+
+
+#/***************************************/
+#/* Remove all values from every level. */
+#/***************************************/
+	def Clear(self):
+		for Level in range(PYRAMID_LEVELS):
+			self.Mins[Level].Clear()
+			self.Maxs[Level].Clear()
+		self.LastPeriods = [ None ] * PYRAMID_LEVELS
+
+
+
+#/**********************************************/
+#/* Get the seconds of each period of a level. */
+#/**********************************************/
+	def GetPeriod(self, Level):
+		return PYRAMID_PERIOD * 2**Level
+
+
+
+#/****************************************************************/
+#/* Get the lowest level with periods at least as long as given, */
+#/* or the highest level when none are.                          */
+#/****************************************************************/
+	def GetLevel(self, Period):
+		Level = 0
+		while Level < PYRAMID_LEVELS - 1 and self.GetPeriod(Level) < Period:
+			Level += 1
+		return Level
+
+
+
+#/************************************************************/
+#/* Add a value to the period of each level it was read in,  */
+#/* starting a new period of a level when the value is after */
+#/* the last. Times are expected to be added in order.       */
+#/************************************************************/
+	def Append(self, ThisTime, Value):
+		for Level in range(PYRAMID_LEVELS):
+			ThisPeriod = int(ThisTime / self.GetPeriod(Level))
+			if ThisPeriod != self.LastPeriods[Level]:
+				self.LastPeriods[Level] = ThisPeriod
+				self.LastMins[Level] = Value
+				self.LastMaxs[Level] = Value
+				self.Mins[Level].Append(ThisTime, Value)
+				self.Maxs[Level].Append(ThisTime, Value)
+			elif Value < self.LastMins[Level]:
+				self.LastMins[Level] = Value
+				self.Mins[Level].Set(-1, ThisTime, Value)
+			elif Value > self.LastMaxs[Level]:
+				self.LastMaxs[Level] = Value
+				self.Maxs[Level].Set(-1, ThisTime, Value)
+			else:
+				# The periods of the levels above hold this one, so already cover the value.
+				break
+
+
+
+#/**************************************************************/
+#/* Get the points to draw of a level from a time to another,  */
+#/* or to the newest, the lowest and highest value of each     */
+#/* period, in the order they were read, as two lists of times */
+#/* and values.                                                */
+#/**************************************************************/
+	def GetData(self, Level, StartTime, EndTime = None):
+		Mins = self.Mins[Level]
+		Maxs = self.Maxs[Level]
+		# Periods start at whole multiples of the period, so the period holding the start time starts before it.
+		Index = Mins.FindTime(StartTime - StartTime % self.GetPeriod(Level))
+		EndIndex = None
+		if EndTime != None:
+			# Include the period holding the end time, the lowest value of which may be after it.
+			EndIndex = min(Mins.FindTime(EndTime) + 1, Mins.GetCount())
+		MinTimes, MinValues = Mins.GetData(Index, EndIndex)
+		MaxTimes, MaxValues = Maxs.GetData(Index, EndIndex)
+		Times = []
+		Values = []
+		for Period in range(len(MinTimes)):
+			if MinTimes[Period] <= MaxTimes[Period]:
+				Times += (MinTimes[Period], MaxTimes[Period])
+				Values += (MinValues[Period], MaxValues[Period])
+			else:
+				Times += (MaxTimes[Period], MinTimes[Period])
+				Values += (MaxValues[Period], MinValues[Period])
+		return (Times, Values)
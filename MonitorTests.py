@@ -0,0 +1,163 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#/***************************************************************************/
+#/* Raspberry Pi ELM327 OBBII CAN BUS Diagnostic Software.                  */
+#/*                                                                         */
+#/* (C) Jason Birch 2018-05-15 V1.04                                        */
+#/*                                                                         */
+#/* Class: MonitorTests                                                     */
+#/* Decode OBDII Mode 06 on-board monitor test results, as sent on CAN.     */
+#/* Each result holds the monitor (MID), test (TID), unit and scaling ID,   */
+#/* and the test value with its minimum and maximum limits. Values are      */
+#/* scaled into units using the unit and scaling table of SAE J1979.        */
+#/***************************************************************************/
+
+
+
+# Length of a test result record in a Mode 06 CAN response, as hex: MID, TID, unit and scaling ID, value, min, max.
+RECORD_LENGTH = 18
+
+# Unit and scaling IDs from this value hold signed values.
+SIGNED_SCALING_START = 0x80
+
+# Unit and scaling definition fields.
+SCALING_SCALE = 0
+SCALING_OFFSET = 1
+SCALING_UNITS = 2
+
+# Test result fields.
+RESULT_MID = 0
+RESULT_TID = 1
+RESULT_VALUE = 2
+RESULT_MIN = 3
+RESULT_MAX = 4
+RESULT_UNITS = 5
+
+
+
+class MonitorTests:
+	def __init__(self):
+		self.InitResult = ""
+
+#  /***************************************************/
+# /* Read Mode 06 MID description lookup table data. */
+#/***************************************************/
+		self.MidDescriptions = {}
+		try:
+			with open("DATA/PidDescriptionsMode06.txt") as ThisFile:
+				for ThisLine in ThisFile:
+					Digit, Code = ThisLine.partition(" ")[::2]
+					self.MidDescriptions[Digit] = Code.strip()
+		except:
+			self.InitResult += "FAILED TO READ FILE: DATA/PidDescriptionsMode06.txt\n"
+
+#  /***************************************************/
+# /* Read Mode 06 TID description lookup table data. */
+#/***************************************************/
+		self.TidDescriptions = {}
+		try:
+			with open("DATA/Mode06TestIds.txt") as ThisFile:
+				for ThisLine in ThisFile:
+					Digit, Code = ThisLine.partition(" ")[::2]
+					self.TidDescriptions[Digit] = Code.strip()
+		except:
+			self.InitResult += "FAILED TO READ FILE: DATA/Mode06TestIds.txt\n"
+
+#  /****************************************************/
+# /* Read Mode 06 unit and scaling lookup table data. */
+#/****************************************************/
+		self.UnitScaling = {}
+		try:
+			with open("DATA/Mode06UnitScaling.txt") as ThisFile:
+				for ThisLine in ThisFile:
+					Digit, Code = ThisLine.partition(" ")[::2]
+					Fields = Code.strip('\n').split('|')
+					self.UnitScaling[Digit] = (float(Fields[SCALING_SCALE]), float(Fields[SCALING_OFFSET]), Fields[SCALING_UNITS].strip())
+		except:
+			self.InitResult += "FAILED TO READ FILE: DATA/Mode06UnitScaling.txt\n"
+
+
+
+#/*************************************************/
+#/* Get any errors or warnings which occured      */
+#/* during creation of an instance of this class. */
+#/*************************************************/
+	def GetInitResult(self):
+		return self.InitResult
+
+
+
+#/*************************************************/
+#/* Get the descriptions of each Mode 06 MID, for */
+#/* resolving the supported MID bitmaps.          */
+#/*************************************************/
+	def GetMidDescriptions(self):
+		return self.MidDescriptions
+
+
+
+#/***********************************************************/
+#/* Scale a raw test value into units, using its unit and   */
+#/* scaling ID. Unknown IDs leave the raw value unscaled.   */
+#/***********************************************************/
+	def ScaleValue(self, UnitScaling, RawValue):
+		if int(UnitScaling, 16) >= SIGNED_SCALING_START and RawValue >= 0x8000:
+			RawValue -= 0x10000
+		if UnitScaling in self.UnitScaling:
+			ThisScaling = self.UnitScaling[UnitScaling]
+			Result = RawValue * ThisScaling[SCALING_SCALE] + ThisScaling[SCALING_OFFSET]
+		else:
+			Result = RawValue
+		return Result
+
+
+
+#/**************************************************************/
+#/* Decode the test results of a Mode 06 CAN response message, */
+#/* after the mode byte. Return a list of tuples of MID, TID,  */
+#/* value, minimum, maximum and units.                         */
+#/**************************************************************/
+	def Decode(self, Data):
+		Result = []
+		for Index in range(0, len(Data) - RECORD_LENGTH + 1, RECORD_LENGTH):
+			Record = Data[Index:Index + RECORD_LENGTH]
+			UnitScaling = Record[4:6]
+			Units = ""
+			if UnitScaling in self.UnitScaling:
+				Units = self.UnitScaling[UnitScaling][SCALING_UNITS]
+			Value = self.ScaleValue(UnitScaling, int(Record[6:10], 16))
+			Minimum = self.ScaleValue(UnitScaling, int(Record[10:14], 16))
+			Maximum = self.ScaleValue(UnitScaling, int(Record[14:18], 16))
+			Result.append((Record[0:2], Record[2:4], Value, Minimum, Maximum, Units))
+		return Result
+
+
+
+#/****************************************************************/
+#/* Get test results as text lines, each monitor followed by     */
+#/* its tests, in the same "Label|Value" form as ELM327.GetInfo. */
+#/****************************************************************/
+	def GetText(self, Results):
+		Text = ""
+		LastMid = ""
+		for Mid, Tid, Value, Minimum, Maximum, Units in Results:
+			if Mid != LastMid:
+				Text += "[" + Mid + "] " + self.MidDescriptions.get(Mid, "").lstrip("! ") + "\n"
+				LastMid = Mid
+			Status = "PASS"
+			if Value < Minimum or Value > Maximum:
+				Status = "FAIL"
+			Text += "TID " + Tid + " " + self.TidDescriptions.get(Tid, "Manufacturer test") + "|"
+			Text += "{:g} {:s} [{:g} - {:g}] {:s}".format(Value, Units, Minimum, Maximum, Status).replace("  ", " ") + "\n"
+		return Text
@@ -43,8 +43,12 @@
 #/***************************************************************************/
 
 
+import os
+import glob
+import argparse
 import subprocess
 import datetime
+import time
 import _thread
 import pygame
 import ELM327
@@ -57,6 +61,12 @@ import Select
 import Confirm
 import Display
 import PDF
+import TroubleCodeSweep
+import SessionLog
+import SessionLogReader
+import SessionCatalogue
+import SessionExport
+import Replay
 
 
 
@@ -64,6 +74,12 @@ DISPLAY_PERIOD = 100
 TIMER_PERIOD = 500
 READ_ELM_COUNT = 8
 PLOT_ELM_COUNT = 4
+# Seconds to monitor the CAN BUS for when the monitor button is pressed.
+MONITOR_PERIOD = 5
+# Dialogs shown on a tab, while one is open no heartbeat is sent, so the taps on it are not dropped.
+DIALOGS = [ "CONFIGURE", "CONFIRM", "SELECT" ]
+# Path session logs are written to, a new log for each connection.
+LOG_PATH = "LOG/"
 
 
 # Start value for pygame user events.
@@ -75,12 +91,29 @@ LockELM327 = _thread.allocate_lock()
 # List of visual class instances to be flashed.
 FlashVisuals = {}
 
+# Frame snapshot the frame tab shows changes from, when the diff button is down.
+FrameBaseline = None
+
+#  /******************************/
+# /* Read command line options. */
+#/******************************/
+Parser = argparse.ArgumentParser(description = "Raspberry Pi ELM327 OBBII CAN BUS Diagnostic Software.")
+Parser.add_argument("--replay", default = None, help = "Session log to replay in place of the ECU.")
+Parser.add_argument("--speed", type = Replay.ParseSpeed, default = Replay.REPLAY_SPEED_NORMAL, help = "Replay speed, a multiple of real time, or MAX for as fast as possible.")
+Arguments = Parser.parse_args()
+
 #  /***************************************/
 # /* Create application class instances. */
 #/***************************************/
 ThisELM327 = ELM327.ELM327()
 ThisDisplay = Display.Display()
 ThisPDF = PDF.PDF()
+ThisSessionLog = SessionLog.SessionLog()
+ThisSessionCatalogue = SessionCatalogue.SessionCatalogue()
+ThisReplay = None
+if Arguments.replay != None:
+	ThisReplay = Replay.Replay(Arguments.replay, Arguments.speed)
+	ThisELM327.SetReplay(ThisReplay)
 
 
 
@@ -103,6 +136,10 @@ def ApplyConfig():
 	Visual.VisualZOrder[0].SetFont(Config.ConfigValues["FontName"])
 	ELM327.SERIAL_PORT_NAME = Config.ConfigValues["SerialPort"]
 	ThisELM327.LoadVehicle(Config.ConfigValues["Vehicle"])
+	ThisSessionLog.SetCompression(Config.ConfigValues["LogCompression"])
+	ThisSessionLog.SetFlush(Config.ConfigValues["LogFlushPeriod"], Config.ConfigValues["LogWriteBatch"])
+	Gadgit.STATISTICS_OVERLAY = Config.ConfigValues["StatisticsOverlay"] == "ON"
+	Plot.STATISTICS_OVERLAY = Config.ConfigValues["StatisticsOverlay"] == "ON"
 
 
 
@@ -150,7 +187,8 @@ def SavePdfReport(FileName):
 			["OBDII TROUBLE INFORMATION", ThisDisplay.TroubleInfo["INFO"].GetText()],
 			["OBDII DATA FREEZE FRAMES", ThisDisplay.FreezeFrameData["INFO"].GetText()],
 			["OBDII DATA FRAME", ThisDisplay.FrameData["INFO"].GetText()],
-			["ELM327 INFORMATION", ThisELM327.GetInfo()],
+			["ELM327 INFORMATION", ThisELM327.GetInfo() + ThisELM327.GetStatisticsInfo()],
+			["PID STATISTICS", ThisELM327.GetPidStatisticsInfo()],
 		]
 		ThisPDF.CreateReport(FileName, "FreeMono", PdfData)
 	except Exception as Catch:
@@ -162,6 +200,65 @@ def SavePdfReport(FileName):
 
 
 
+#/*****************************************/
+#/* Export the session log as a CSV file. */
+#/*****************************************/
+def ExportSessionLog(FileName):
+	ThisDisplay.Buttons["BUSY"].SetVisible(True)
+	ThisDisplay.Buttons["BUSY"].SetDown(True)
+	ThisDisplay.Display()
+	try:
+		if ThisSessionLog.IsOpen() == False:
+			raise ValueError("NO SESSION LOG, CONNECT TO THE ECU FIRST")
+		# Write everything logged so far, so it is exported too.
+		ThisSessionLog.Flush()
+		ThisExport = SessionExport.SessionExport(ThisSessionLog.GetFileName())
+		if ThisExport.GetInitResult() != "":
+			raise ValueError(ThisExport.GetInitResult())
+		ThisExport.ExportCsv(FileName)
+		ThisExport.Close()
+	except Exception as Catch:
+		FileName = str(Catch)
+	ThisDisplay.Buttons["BUSY"].SetDown(False)
+	ThisDisplay.Buttons["BUSY"].SetVisible(False)
+
+	return FileName
+
+
+
+#/***********************************************************/
+#/* End the session being logged, if any, and add it to the */
+#/* session catalogue, with the VIN and trouble codes read. */
+#/***********************************************************/
+def EndSession():
+	if ThisSessionLog.IsOpen() == True:
+		FileName = ThisSessionLog.GetFileName()
+		ThisSessionLog.Close()
+		ThisSessionCatalogue.AddSession(FileName, ThisELM327.GetVin(), ThisELM327.GetSessionTroubleCodes(), ThisELM327.GetPidStatistics(), ThisELM327.GetFreezeSnapshots())
+
+
+
+#/*************************************************************/
+#/* Recover the session logs which were never ended, such as  */
+#/* when the power was cut with the engine, cutting each back */
+#/* to its last whole block, and add them to the catalogue.   */
+#/* The VIN of such a session is taken from the log file      */
+#/* name, logs named without one are added with an empty VIN. */
+#/*************************************************************/
+def RecoverSessions():
+	LogFiles = set(ThisSession[SessionCatalogue.SESSION_LOG_FILE] for ThisSession in ThisSessionCatalogue.FindSessions())
+	for FileName in sorted(glob.glob(LOG_PATH + "*.LOG")):
+		if FileName not in LogFiles and FileName != ThisSessionLog.GetFileName():
+			SessionLogReader.Recover(FileName)
+			# The log file name is the start time, then the VIN when it was read on connecting.
+			Fields = os.path.splitext(os.path.basename(FileName))[0].split("_", 2)
+			Vin = ""
+			if len(Fields) > 2:
+				Vin = Fields[2]
+			ThisSessionCatalogue.AddSession(FileName, Vin)
+
+
+
 #/***************************************************/
 #/* Perform a connection to the CAN BUS of the ECU. */
 #/***************************************************/
@@ -174,6 +271,8 @@ def ConnectELM327(ThisDisplay):
 	try:
 		# Notify the user a connection attempt is taking place.
 		ThisDisplay.SetVisualText(ThisDisplay.ELM327Info, "INFO", "CONNECTING TO CAN BUS FOR OBDII COMMUNICATION...\n", False)
+		# A new connection starts a new session, catalogue the last one before what was read in it is reset.
+		EndSession()
 		# Connect to the CAN BUS of the ECU.
 		Result = ThisELM327.Connect()
 		# Display issues initializing the ELM327 device.
@@ -186,6 +285,20 @@ def ConnectELM327(ThisDisplay):
 		else:
 			# Display ELM327 information.
 			ThisDisplay.SetVisualText(ThisDisplay.ELM327Info, "INFO", ThisELM327.GetInfo(), True)
+			# Log every value read in this session, a replayed session is already logged.
+			if ThisReplay == None:
+				# Read the VIN now, the session is catalogued by it, and it is named in the log file in case the session
+				# is never ended and has to be recovered.
+				FileName = LOG_PATH + datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+				Vin = "".join(Char for Char in ThisELM327.ReadVin() if Char.isalnum())
+				if Vin != "":
+					FileName += "_" + Vin
+				if ThisSessionLog.Open(FileName + ".LOG") == True:
+					ThisELM327.SetSessionLog(ThisSessionLog)
+					# Plot history older than is kept in memory is read back from the session log.
+					ThisDisplay.Plots["PLOT"].SetHistoryFile(ThisSessionLog.GetFileName())
+				else:
+					ThisDisplay.SetVisualText(ThisDisplay.ELM327Info, "INFO", "FAILED TO CREATE SESSION LOG.\n", True)
 	except Exception as Catch:
 		print(str(Catch))
 	# Stop flashing connect button after connection attempt.
@@ -205,21 +318,69 @@ def ConnectELM327(ThisDisplay):
 
 
 
+#/******************************************************/
+#/* Get the ELM327 information and request statistics. */
+#/******************************************************/
+def ELM327InfoData(ThisDisplay):
+	try:
+		ThisDisplay.SetVisualText(ThisDisplay.ELM327Info, "INFO", ThisELM327.GetInfo(), False)
+		ThisDisplay.SetVisualText(ThisDisplay.ELM327Info, "INFO", "\nREQUEST STATISTICS:\n" + ThisELM327.GetStatisticsInfo(), True)
+	except Exception as Catch:
+		print(str(Catch))
+	# Allow another ELM327 communication now this one is complete.
+	LockELM327.release()
+
+
+
+#/******************************************************************/
+#/* Monitor the frames broadcast on the CAN BUS for a period, then */
+#/* show the frame rate of each CAN ID and the decoded signals.    */
+#/******************************************************************/
+def ELM327MonitorData(ThisDisplay):
+	# Flash monitor button while monitoring.
+	FlashVisuals["MONITOR"] = ThisDisplay.ELM327Info["MONITOR"]
+	try:
+		ThisDisplay.SetVisualText(ThisDisplay.ELM327Info, "INFO", "MONITORING CAN BUS...\n", False)
+		if ThisELM327.IsCanBus() == False:
+			# Frames on a K-line bus are not CAN frames, and would be shown as made up CAN IDs.
+			ThisDisplay.SetVisualText(ThisDisplay.ELM327Info, "INFO", "CAN BUS MONITOR NEEDS A CAN PROTOCOL, CONNECTED WITH PROTOCOL " + ThisELM327.GetProtocol() + ".\n", True)
+		elif ThisELM327.StartMonitor() == True:
+			StartTime = time.time()
+			while time.time() - StartTime < MONITOR_PERIOD:
+				ThisELM327.ReadMonitor()
+			ThisELM327.StopMonitor()
+			ThisDisplay.SetVisualText(ThisDisplay.ELM327Info, "INFO", ThisELM327.GetMonitorInfo(), False)
+		else:
+			ThisDisplay.SetVisualText(ThisDisplay.ELM327Info, "INFO", "FAILED TO START CAN BUS MONITOR.\n", True)
+	except Exception as Catch:
+		print(str(Catch))
+	# Stop flashing monitor button after monitoring.
+	FlashVisuals.pop("MONITOR", None)
+	ThisDisplay.ELM327Info["MONITOR"].SetDown(False)
+	# Allow another ELM327 communication now this one is complete.
+	LockELM327.release()
+
+
+
 #/**********************************************/
 #/* Get a frame of all valid PIDs for Mode 01. */
 #/**********************************************/
 def FrameData(ThisDisplay):
+	global FrameBaseline
 	try:
-		# Get a list of all valid PIDs the connected ECU supports.
-		ValidPIDs = ThisELM327.GetValidPIDs()
-		# Get the information available for each of the supported PIDs.
-		ThisDisplay.SetVisualText(ThisDisplay.FrameData, "INFO", "", False)
-		for PID in sorted(ValidPIDs):
-			if ValidPIDs[PID][ELM327.FIELD_PID_DESCRIPTION] != '!':
-				# Display the information returned for the current PID.
-				if PID[1] == '1':
-					PidData = ThisELM327.DoPID(PID)
-					ThisDisplay.SetVisualText(ThisDisplay.FrameData, "INFO", "[" + PID + "] " + ValidPIDs[PID] + "\n", True, PidData)
+		# Get a snapshot of all the Mode 01 PIDs and J1939 broadcasts, read together.
+		ThisSnapshot = ThisELM327.GetFrame()
+		ThisDisplay.SetVisualText(ThisDisplay.FrameData, "INFO", "FRAME READ IN {:0.2f}s\n".format(ThisSnapshot.GetWindow()), False)
+		Values = ThisSnapshot.GetValues()
+		if ThisDisplay.FrameData["DIFF"].GetDown() == True:
+			# Only show the values which have changed since the baseline frame.
+			if FrameBaseline == None:
+				FrameBaseline = ThisSnapshot
+			else:
+				Values = ThisSnapshot.Diff(FrameBaseline)
+				ThisDisplay.SetVisualText(ThisDisplay.FrameData, "INFO", "{:d} CHANGED SINCE FRAME {:0.0f}s AGO\n".format(len(Values), ThisSnapshot.GetTime() - FrameBaseline.GetTime()), True)
+		for PID, Description, PidData in Values:
+			ThisDisplay.SetVisualText(ThisDisplay.FrameData, "INFO", "[" + PID + "] " + Description + "\n", True, PidData)
 	except Exception as Catch:
 		print(str(Catch))
 	# Allow another ELM327 communication now this one is complete.
@@ -230,16 +391,15 @@ def FrameData(ThisDisplay):
 #/*****************************************************/
 #/* Get a freeze frame of all valid PIDs for Mode 02. */
 #/*****************************************************/
-def FreezeFrameData(ThisDisplay):
+def FreezeFrameData(ThisDisplay, Refresh = False):
 	try:
+		ThisDisplay.SetVisualText(ThisDisplay.FreezeFrameData, "INFO", "", False)
 		for FreezeIndex in range(ThisELM327.GetFreezeFrameCount()):
-			# Get a list of all valid PIDs the connected ECU supports.
-			ValidPIDs = ThisELM327.GetValidPIDs(FreezeIndex)
-			# Get the information available for each of the supported PIDs.
-			ThisDisplay.SetVisualText(ThisDisplay.FreezeFrameData, "INFO", "", False)
-			for PID in sorted(ValidPIDs):
-				PidData = ThisELM327.DoPID(PID[:4], FreezeIndex)
-				ThisDisplay.SetVisualText(ThisDisplay.FreezeFrameData, "INFO", "[" + PID + "] " + ValidPIDs[PID] + "\n", True, PidData)
+			# Get a snapshot of the supported PIDs, the same snapshot is used by the PDF report.
+			ThisSnapshot = ThisELM327.GetFreezeFrame(FreezeIndex, Refresh)
+			ThisDisplay.SetVisualText(ThisDisplay.FreezeFrameData, "INFO", ThisSnapshot.GetName() + "\n", True)
+			for PID, Description, PidData in ThisSnapshot.GetValues():
+				ThisDisplay.SetVisualText(ThisDisplay.FreezeFrameData, "INFO", "[" + PID + "] " + Description + "\n", True, PidData)
 	except Exception as Catch:
 		print(str(Catch))
 	# Allow another ELM327 communication now this one is complete.
@@ -247,20 +407,22 @@ def FreezeFrameData(ThisDisplay):
 
 
 
-#/**********************************************/
-#/* Get a frame of all valid PIDs for Mode 09. */
-#/**********************************************/
+#/*************************************************************/
+#/* Get a frame of all valid PIDs for Mode 09. The vehicle    */
+#/* information is kept by VIN, so is usually not read again. */
+#/*************************************************************/
 def VehicleData(ThisDisplay):
 	try:
 		# Get a list of all valid PIDs the connected ECU supports.
 		ValidPIDs = ThisELM327.GetValidPIDs()
+		VehicleInfo = ThisELM327.GetVehicleInfo()
 		# Get the information available for each of the supported PIDs.
 		ThisDisplay.SetVisualText(ThisDisplay.VehicleInfo, "INFO", "", False)
 		for PID in sorted(ValidPIDs):
 			if ValidPIDs[PID][ELM327.FIELD_PID_DESCRIPTION] != '!':
 				# Display the information returned for the current PID.
-				if PID[1] == '9':
-					PidData = ThisELM327.DoPID(PID)
+				if PID[:2] == '09':
+					PidData = VehicleInfo.get(PID, ELM327.STRING_NO_DATA)
 					ThisDisplay.SetVisualText(ThisDisplay.VehicleInfo, "INFO", "[" + PID + "] " + ValidPIDs[PID] + "\n", True, PidData)
 	except Exception as Catch:
 		print(str(Catch))
@@ -269,30 +431,40 @@ def VehicleData(ThisDisplay):
 
 
 
-#/****************************************/
-#/* Get all trouble related information. */
-#/****************************************/
-def TroubleInfo(ThisDisplay):
+#/**************************************************************/
+#/* Get all trouble related information. The trouble codes are */
+#/* read from every ECU in one sweep, which is kept and shown  */
+#/* again without asking the ECUs, unless refreshed.           */
+#/**************************************************************/
+def TroubleInfo(ThisDisplay, Refresh = False):
 	try:
 		# Get a list of all valid PIDs the connected ECU supports.
 		ValidPIDs = ThisELM327.GetValidPIDs()
+		if ThisELM327.GetIsJ1939() == True:
+			raise Exception("OBDII TROUBLE CODES NOT AVAILABLE FROM SAE J1939 BROADCASTS")
 		# Display test information and MIL light status.
 		PidData = sorted(ThisELM327.DoPID("0101"))
 		ThisDisplay.SetVisualText(ThisDisplay.TroubleInfo, "INFO", "[0101] " + ValidPIDs["0101"] + "\n", False, PidData)
 
-		# Display all stored trouble codes and descriptions.
-		TroubleCodes = ThisELM327.DoPID("03")
-		ThisDisplay.SetVisualText(ThisDisplay.TroubleInfo, "INFO", "\nSTORED TROUBLE CODES: [" + str(len(TroubleCodes)) + "]\n", True)
-		if TroubleCodes != ELM327.STRING_ERROR:
-			for TroubleCode in sorted(TroubleCodes):
-				ThisDisplay.SetVisualText(ThisDisplay.TroubleInfo, "INFO", str(TroubleCode) + " " + str(TroubleCodes[TroubleCode]) + "\n", True)
-
-		# Display all pending trouble codes and descriptions.
-		TroubleCodes = ThisELM327.DoPID("07")
-		ThisDisplay.SetVisualText(ThisDisplay.TroubleInfo, "INFO", "\nPENDING TROUBLE CODES [" + str(len(TroubleCodes)) + "]:\n", True)
-		if TroubleCodes != ELM327.STRING_ERROR:
-			for TroubleCode in sorted(TroubleCodes):
-				ThisDisplay.SetVisualText(ThisDisplay.TroubleInfo, "INFO", str(TroubleCode) + " " + str(TroubleCodes[TroubleCode]) + "\n", True)
+		# Display all stored, pending and permanent trouble codes and descriptions, of every ECU.
+		TroubleCodes = ThisELM327.GetTroubleCodeSweep(Refresh)
+		for Kind in TroubleCodeSweep.KINDS:
+			ThisDisplay.SetVisualText(ThisDisplay.TroubleInfo, "INFO", "\n" + Kind + " TROUBLE CODES [" + str(len(TroubleCodes.GetCodes(Kind))) + "]:\n", True)
+			ThisDisplay.SetVisualText(ThisDisplay.TroubleInfo, "INFO", TroubleCodes.GetText(Kind), True)
+
+		# Display the on-board monitor test results, such as misfire counts and catalyst efficiency.
+		TestResults = ThisELM327.DoPID("06")
+		if TestResults == ELM327.STRING_ERROR:
+			TestResults = []
+		ThisDisplay.SetVisualText(ThisDisplay.TroubleInfo, "INFO", "\nMONITOR TEST RESULTS [" + str(len(TestResults)) + "]:\n", True)
+		ThisDisplay.SetVisualText(ThisDisplay.TroubleInfo, "INFO", ThisELM327.GetMonitorTestsText(TestResults), True)
+
+		# Display the oxygen sensor test results, non CAN vehicles report these in Mode 05 rather than Mode 06.
+		OxygenSensorPIDs = [ PID for PID in sorted(ValidPIDs) if PID[:2] == '05' and PID[4:6] != '00' ]
+		ThisDisplay.SetVisualText(ThisDisplay.TroubleInfo, "INFO", "\nOXYGEN SENSOR TEST RESULTS [" + str(len(OxygenSensorPIDs)) + "]:\n", True)
+		for PID in OxygenSensorPIDs:
+			PidData = ThisELM327.DoPID(PID)
+			ThisDisplay.SetVisualText(ThisDisplay.TroubleInfo, "INFO", "[" + PID + "] " + ValidPIDs[PID] + "\n", True, PidData)
 	except Exception as Catch:
 		print(str(Catch))
 	# Allow another ELM327 communication now this one is complete.
@@ -323,13 +495,15 @@ def MeterData(ThisDisplay):
 	FlashVisuals["BUSY"] = ThisDisplay.Buttons["BUSY"]
 	try:
 		# Get the information available for each of the meter related PIDs.
-		for ThisGadgit in ThisDisplay.Meters:
-			if type(ThisDisplay.Meters[ThisGadgit]) is Gadgit.Gadgit:
-				PID = ThisDisplay.Meters[ThisGadgit].GetPID()
-				if PID != "":
-					# Store the information returned for the current PID on the related meter.
-					PidData = ThisELM327.DoPID(PID)
-					ThisDisplay.Meters[ThisGadgit].SetData(PidData)
+		Gadgits = [ ThisDisplay.Meters[ThisGadgit] for ThisGadgit in ThisDisplay.Meters if type(ThisDisplay.Meters[ThisGadgit]) is Gadgit.Gadgit ]
+		# Read real PIDs before virtual PIDs, so virtual PIDs are calculated from them without reading them again.
+		for ThisGadgit in sorted(Gadgits, key = lambda ThisGadgit: ThisGadgit.GetPID()[:1] == 'V'):
+			PID = ThisGadgit.GetPID()
+			if PID != "":
+				# Store the information returned for the current PID on the related meter.
+				PidData = ThisELM327.DoPID(PID)
+				ThisGadgit.SetData(PidData)
+				ThisGadgit.SetStatistics(ThisELM327.GetPidStatistics().GetSummary(PID), ThisELM327.GetPidStatistics().GetHistogram(PID))
 	except Exception as Catch:
 		print(str(Catch))
 	# Allow another ELM327 communication now this one is complete.
@@ -346,14 +520,14 @@ def PlotData(ThisDisplay):
 	ThisDisplay.Buttons["BUSY"].SetVisible(True)
 	FlashVisuals["BUSY"] = ThisDisplay.Buttons["BUSY"]
 	try:
-		# Get the information available for each of the plot related PIDs.
-		for Index in range(Plot.PLOT_COUNT):
-			if ThisDisplay.Plots["PLOT"].IsDataEnd(Index) == False:
-				PID = ThisDisplay.Plots["PLOT"].GetPID(Index)
-				if PID != "":
-					# Plot the information returned for the current PID.
-					PidData = ThisELM327.DoPID(PID)
-					ThisDisplay.Plots["PLOT"].SetData(Index, PidData)
+		# Get the information available for each of the plot related PIDs, virtual PIDs last.
+		for Index in sorted(range(Plot.PLOT_COUNT), key = lambda Index: ThisDisplay.Plots["PLOT"].GetPID(Index)[:1] == 'V'):
+			PID = ThisDisplay.Plots["PLOT"].GetPID(Index)
+			if PID != "":
+				# Plot the information returned for the current PID.
+				PidData = ThisELM327.DoPID(PID)
+				ThisDisplay.Plots["PLOT"].SetData(Index, PidData, ThisELM327.GetTime())
+				ThisDisplay.Plots["PLOT"].SetStatistics(Index, ThisELM327.GetPidStatistics().GetSummary(PID), ThisELM327.GetPidStatistics().GetHistogram(PID))
 	except Exception as Catch:
 		print(str(Catch))
 	# Allow another ELM327 communication now this one is complete.
@@ -363,8 +537,24 @@ def PlotData(ThisDisplay):
 
 
 
+#/************************************************************/
+#/* Send a heartbeat to keep the ECU session alive while the */
+#/* ELM327 device is otherwise idle.                         */
+#/************************************************************/
+def KeepAliveELM327(ThisDisplay):
+	try:
+		ThisELM327.KeepAlive()
+	except Exception as Catch:
+		print(str(Catch))
+	# Allow another ELM327 communication now this one is complete.
+	LockELM327.release()
+
+
+
 # Set the configuration before start.
 ApplyConfig()
+# Catalogue the sessions left open when the application last ended.
+RecoverSessions()
 
 # Create a timer for updating the displayed time/date and updating gadgit data from the ECU.
 pygame.time.set_timer(EVENT_TIMER, TIMER_PERIOD)
@@ -378,7 +568,8 @@ ExitFlag = False
 ReadElmCount = READ_ELM_COUNT
 PlotElmCount = PLOT_ELM_COUNT
 while ExitFlag == False:
-	pygame.time.wait(DISPLAY_PERIOD)
+	if ThisReplay == None or ThisReplay.GetSpeed() != Replay.REPLAY_SPEED_MAX:
+		pygame.time.wait(DISPLAY_PERIOD)
 
 	# Process pygame events.
 	for ThisEvent in pygame.event.get():
@@ -428,6 +619,15 @@ while ExitFlag == False:
 						pygame.time.set_timer(EVENT_TIMER, TIMER_PERIOD)
 						_thread.start_new_thread(PlotData, (ThisDisplay, ))
 						pygame.time.set_timer(EVENT_TIMER, TIMER_PERIOD)
+
+				# Keep a slow initialisation ECU session alive while the ELM327 device is otherwise idle.
+				if ThisELM327.IsKeepAliveDue() == True and not any(Dialog in ThisDisplay.CurrentTab for Dialog in DIALOGS):
+					if LockELM327.acquire(0):
+						_thread.start_new_thread(KeepAliveELM327, (ThisDisplay, ))
+
+				# Let the user know when the ECU session dropped and had to be initialised again.
+				if ThisELM327.GetSessionDropped() == True:
+					ThisDisplay.SetVisualText(ThisDisplay.ELM327Info, "INFO", "ECU SESSION DROPPED AND REINITIALISED [" + str(ThisELM327.GetSessionDropCount()) + "]\n", True)
 			except Exception as Catch:
 				print(str(Catch))
 		# Only process the following events if the ELM327 device is not currently communicating.
@@ -486,11 +686,20 @@ while ExitFlag == False:
 						FileName = "SAVE/"
 						FileName += Now.strftime("%Y-%m-%d_%H-%M-%S_")
 						# Get Vehicle VIN for report filename.
-						FileName += ThisELM327.DoPID("0902").replace(' ', '') + ".pdf"
+						FileName += str(ThisELM327.GetVehicleInfo().get("0902", ELM327.STRING_NO_DATA)).replace(' ', '') + ".pdf"
 						# Save PDF Report.
 						Result = SavePdfReport(FileName)
 						# Display PDF saved message.
 						ThisDisplay.CurrentTab["CONFIRM"] = Confirm.Confirm(ThisDisplay.ThisSurface, "CONFIRM_PDF", "OBDII Report Saved:\n" + Result, ThisDisplay.GetDisplayWidth()/1.5, True)
+					# If export button is pressed.
+					elif ButtonGadgit["BUTTON"] == "EXPORT":
+						# Get the date and time, and vehicle VIN, for the export filename.
+						Now = datetime.datetime.now()
+						FileName = "SAVE/" + Now.strftime("%Y-%m-%d_%H-%M-%S_") + ThisELM327.GetVin() + ".csv"
+						# Export the session log.
+						Result = ExportSessionLog(FileName)
+						# Display exported message.
+						ThisDisplay.CurrentTab["CONFIRM"] = Confirm.Confirm(ThisDisplay.ThisSurface, "CONFIRM_EXPORT", "Session Log Exported:\n" + Result, ThisDisplay.GetDisplayWidth()/1.5, True)
 					# If reset plot button is pressed.
 					elif ButtonGadgit["BUTTON"] == "RESET":
 						ThisDisplay.Plots["PLOT"].ClearData()
@@ -523,6 +732,14 @@ while ExitFlag == False:
 						SelectText = ThisDisplay.CurrentTab["CONFIGURE"].GetSerialPortNameList()
 						# Display a font name selection dialog.
 						ThisDisplay.CurrentTab["SELECT"] = Select.Select(ThisDisplay.ThisSurface, "SELECT_SERIAL_PORT_NAME", SelectText)
+					# If statistics button is pressed, show the ELM327 information and request statistics.
+					elif ButtonGadgit["BUTTON"] == "STATISTICS":
+						if LockELM327.acquire(0):
+							_thread.start_new_thread(ELM327InfoData, (ThisDisplay, ))
+					# If monitor button is pressed, monitor the frames broadcast on the CAN BUS.
+					elif ButtonGadgit["BUTTON"] == "MONITOR":
+						if LockELM327.acquire(0):
+							_thread.start_new_thread(ELM327MonitorData, (ThisDisplay, ))
 					# If connect button is pressed, connect to the CAN BUS.
 					elif ButtonGadgit["BUTTON"] == "CONNECT":
 						if LockELM327.acquire(0):
@@ -557,7 +774,8 @@ while ExitFlag == False:
 					# If trouble or refresh button is pressed, get the trobule related data from the ECU.
 					elif ButtonGadgit["BUTTON"] == "TROUBLE" or ButtonGadgit["BUTTON"] == "MIL" or ButtonGadgit["BUTTON"] == "REFRESH":
 						if LockELM327.acquire(0):
-							_thread.start_new_thread(TroubleInfo, (ThisDisplay, ))
+							# The trouble tab shows the last trouble codes read, refresh and MIL read them again.
+							_thread.start_new_thread(TroubleInfo, (ThisDisplay, ButtonGadgit["BUTTON"] != "TROUBLE"))
 							# Check for MIL status after reading trouble data.
 							FlashVisuals.pop("MIL", None)
 							ThisDisplay.Buttons["MIL"].SetDown(False)
@@ -570,11 +788,18 @@ while ExitFlag == False:
 					# If freeze button is pressed.
 					elif ButtonGadgit["BUTTON"] == "FREEZE" or ButtonGadgit["BUTTON"] == "RELOAD_FREEZE":
 						if LockELM327.acquire(0):
-							_thread.start_new_thread(FreezeFrameData, (ThisDisplay, ))
+							_thread.start_new_thread(FreezeFrameData, (ThisDisplay, ButtonGadgit["BUTTON"] == "RELOAD_FREEZE"))
 					# If frame button is pressed, get a frame of data from the ECU.
 					elif ButtonGadgit["BUTTON"] == "FRAME" or ButtonGadgit["BUTTON"] == "RELOAD":
 						if LockELM327.acquire(0):
 							_thread.start_new_thread(FrameData, (ThisDisplay, ))
+					# If diff button is pressed, compare following frames with the last frame read.
+					elif ButtonGadgit["BUTTON"] == "DIFF":
+						FrameBaseline = None
+						if ThisDisplay.FrameData["DIFF"].GetDown() == True:
+							FrameBaseline = ThisELM327.GetLastFrame()
+						if LockELM327.acquire(0):
+							_thread.start_new_thread(FrameData, (ThisDisplay, ))
 			elif ThisEvent.type == pygame.MOUSEBUTTONUP:
 				# Pass button up events to all buttons and gadgits.
 				ButtonGadgit = ThisDisplay.IsEvent(Visual.EVENT_MOUSE_UP, ThisEvent.pos[0], ThisEvent.pos[1], ThisEvent.button)
@@ -585,6 +810,13 @@ while ExitFlag == False:
 				else:
 					ButtonGadgit = ThisDisplay.IsEvent(Visual.EVENT_MOUSE_HOVER, ThisEvent.pos[0], ThisEvent.pos[1], ThisEvent.buttons[0])
 
+	# When replaying as fast as possible, read the next values as soon as the last are read, rather than on the timer.
+	if ThisReplay != None and ThisReplay.GetSpeed() == Replay.REPLAY_SPEED_MAX:
+		if ThisDisplay.CurrentTab == ThisDisplay.Plots and LockELM327.acquire(0):
+			_thread.start_new_thread(PlotData, (ThisDisplay, ))
+		elif ThisDisplay.CurrentTab == ThisDisplay.Meters and ThisDisplay.Buttons["LOCK"].GetDown() == True and LockELM327.acquire(0):
+			_thread.start_new_thread(MeterData, (ThisDisplay, ))
+
 	# Update the display.
 	ThisDisplay.Display()
 
@@ -597,6 +829,7 @@ ThisDisplay.Plots["PLOT"].SaveSeriesConfig()
 
 # Terminate application.
 pygame.time.set_timer(EVENT_TIMER, 0)
+EndSession()
 ThisDisplay.Close()
 quit()
 
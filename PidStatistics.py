@@ -0,0 +1,256 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#/***************************************************************************/
+#/* Raspberry Pi ELM327 OBBII CAN BUS Diagnostic Software.                  */
+#/*                                                                         */
+#/* (C) Jason Birch 2018-05-15 V1.04                                        */
+#/*                                                                         */
+#/* Class: PidStatistics                                                    */
+#/* Keep streaming statistics of the values read of each PID, updated as    */
+#/* each value is read: the count, lowest, highest, mean and variance, and  */
+#/* percentiles estimated with the P-square algorithm, which keeps five     */
+#/* markers for each percentile rather than the values. A histogram of the  */
+#/* time spent at each band of values, such as the time at each RPM band,   */
+#/* is kept across the display range of each PID. Summaries and reports     */
+#/* are made from these, without reading the values again.                  */
+#/***************************************************************************/
+
+
+
+import math
+import time
+import bisect
+import _thread
+
+
+
+# Percentiles estimated of each PID.
+PERCENTILES = [ 0.05, 0.5, 0.95 ]
+# Bands the display range of a PID is split into, for the time at value histogram.
+HISTOGRAM_BANDS = 10
+# Longest seconds a value is taken to hold until the next is read. Longer gaps, such as while the PID is not
+# being read, are not counted in the time at value.
+HOLD_PERIOD = 5.0
+
+# Summary fields, as returned by GetSummary.
+SUMMARY_COUNT = 0
+SUMMARY_MINIMUM = 1
+SUMMARY_MAXIMUM = 2
+SUMMARY_MEAN = 3
+SUMMARY_DEVIATION = 4
+SUMMARY_PERCENTILES = 5
+
+# Histogram fields, as returned by GetHistogram.
+HISTOGRAM_BOUNDS = 0
+HISTOGRAM_SECONDS = 1
+
+# Markers of a P-square estimator.
+ESTIMATOR_MARKERS = 5
+
+
+
+#/*************************************************************/
+#/* Create a P-square estimator of a percentile, the heights  */
+#/* and positions of five markers, the positions they should  */
+#/* be at, and how far those move for each value added. Until */
+#/* there are five values, the values themselves are kept.    */
+#/*************************************************************/
+def NewEstimator(Fraction):
+	return {
+		"Fraction" : Fraction,
+		"Heights" : [],
+		"Positions" : [ 0, 1, 2, 3, 4 ],
+		"Desired" : [ 0, 2 * Fraction, 4 * Fraction, 2 + 2 * Fraction, 4 ],
+		"Increments" : [ 0, Fraction / 2, Fraction, (1 + Fraction) / 2, 1 ],
+	}
+
+
+
+#/**************************************************************/
+#/* Add a value to a P-square estimator. The marker the value  */
+#/* falls above is found, the markers above it moved on, and   */
+#/* each middle marker more than a place from where it should  */
+#/* be is moved a place, its height adjusted on a parabola     */
+#/* through the markers either side, or a line when that would */
+#/* take it past them.                                         */
+#/**************************************************************/
+def AddEstimate(Estimator, Value):
+	Heights = Estimator["Heights"]
+	if len(Heights) < ESTIMATOR_MARKERS:
+		bisect.insort(Heights, Value)
+	else:
+		Positions = Estimator["Positions"]
+		Desired = Estimator["Desired"]
+		if Value < Heights[0]:
+			Heights[0] = Value
+			Marker = 0
+		elif Value >= Heights[4]:
+			Heights[4] = Value
+			Marker = 3
+		else:
+			Marker = bisect.bisect_right(Heights, Value, 1, 4) - 1
+		for Index in range(Marker + 1, ESTIMATOR_MARKERS):
+			Positions[Index] += 1
+		for Index in range(ESTIMATOR_MARKERS):
+			Desired[Index] += Estimator["Increments"][Index]
+		for Index in range(1, ESTIMATOR_MARKERS - 1):
+			Offset = Desired[Index] - Positions[Index]
+			if (Offset >= 1 and Positions[Index + 1] - Positions[Index] > 1) or (Offset <= -1 and Positions[Index - 1] - Positions[Index] < -1):
+				Step = int(math.copysign(1, Offset))
+				Height = Heights[Index] + Step / (Positions[Index + 1] - Positions[Index - 1]) * ((Positions[Index] - Positions[Index - 1] + Step) * (Heights[Index + 1] - Heights[Index]) / (Positions[Index + 1] - Positions[Index]) + (Positions[Index + 1] - Positions[Index] - Step) * (Heights[Index] - Heights[Index - 1]) / (Positions[Index] - Positions[Index - 1]))
+				if Height <= Heights[Index - 1] or Height >= Heights[Index + 1]:
+					Height = Heights[Index] + Step * (Heights[Index + Step] - Heights[Index]) / (Positions[Index + Step] - Positions[Index])
+				Heights[Index] = Height
+				Positions[Index] += Step
+
+
+
+#/*************************************************************/
+#/* Get the estimate of a P-square estimator, the middle      */
+#/* marker, or from the values kept when there are fewer than */
+#/* five. None when there are no values.                      */
+#/*************************************************************/
+def GetEstimate(Estimator):
+	Result = None
+	Heights = Estimator["Heights"]
+	if len(Heights) >= ESTIMATOR_MARKERS:
+		Result = Heights[2]
+	elif len(Heights) > 0:
+		Result = Heights[round(Estimator["Fraction"] * (len(Heights) - 1))]
+	return Result
+
+
+
+class PidStatistics:
+	def __init__(self):
+		self.Lock = _thread.allocate_lock()
+		self.Reset()
+
+
+
+#/*******************************************/
+#/* Discard all statistics gathered so far. */
+#/*******************************************/
+	def Reset(self):
+		with self.Lock:
+			# Statistics of each PID.
+			self.Pids = {}
+
+
+
+#/************************************************************/
+#/* Add a value read of a PID, at the time it was read, with */
+#/* the display range of the PID to keep the time at value   */
+#/* histogram across, or None for no histogram. The range is */
+#/* taken from the first value of the PID.                   */
+#/************************************************************/
+	def Add(self, PID, Value, ThisTime = None, ValueRange = None):
+		if ThisTime == None:
+			ThisTime = time.time()
+		with self.Lock:
+			if PID not in self.Pids:
+				Bounds = None
+				Seconds = None
+				if ValueRange != None and ValueRange[1] > ValueRange[0]:
+					Bounds = [ ValueRange[0] + (ValueRange[1] - ValueRange[0]) * Band / HISTOGRAM_BANDS for Band in range(HISTOGRAM_BANDS + 1) ]
+					Seconds = [ 0.0 ] * HISTOGRAM_BANDS
+				self.Pids[PID] = { "Count" : 0, "Minimum" : Value, "Maximum" : Value, "Mean" : 0.0, "SquaredDeviations" : 0.0, "Estimators" : [ NewEstimator(Fraction) for Fraction in PERCENTILES ], "Bounds" : Bounds, "Seconds" : Seconds, "LastTime" : None, "LastBand" : 0 }
+			Statistics = self.Pids[PID]
+
+			# Running mean and sum of squared deviations from it, updated as Welford's method.
+			Statistics["Count"] += 1
+			Deviation = Value - Statistics["Mean"]
+			Statistics["Mean"] += Deviation / Statistics["Count"]
+			Statistics["SquaredDeviations"] += Deviation * (Value - Statistics["Mean"])
+			Statistics["Minimum"] = min(Statistics["Minimum"], Value)
+			Statistics["Maximum"] = max(Statistics["Maximum"], Value)
+			for Estimator in Statistics["Estimators"]:
+				AddEstimate(Estimator, Value)
+
+			# The last value read is taken to have held until this one.
+			if Statistics["Bounds"] != None:
+				if Statistics["LastTime"] != None and 0 < ThisTime - Statistics["LastTime"] <= HOLD_PERIOD:
+					Statistics["Seconds"][Statistics["LastBand"]] += ThisTime - Statistics["LastTime"]
+				Statistics["LastTime"] = ThisTime
+				Statistics["LastBand"] = min(max(bisect.bisect_right(Statistics["Bounds"], Value) - 1, 0), HISTOGRAM_BANDS - 1)
+
+
+
+#/*******************************************/
+#/* Get the PIDs with statistics, in order. */
+#/*******************************************/
+	def GetPids(self):
+		with self.Lock:
+			Result = sorted(self.Pids)
+		return Result
+
+
+
+#/***************************************************************/
+#/* Get a summary of the values read of a PID, a tuple of the   */
+#/* SUMMARY_ fields, the percentiles a tuple in the order of    */
+#/* PERCENTILES. None when no values of the PID have been read. */
+#/***************************************************************/
+	def GetSummary(self, PID):
+		Result = None
+		with self.Lock:
+			if PID in self.Pids:
+				Statistics = self.Pids[PID]
+				Deviation = 0.0
+				if Statistics["Count"] > 1:
+					Deviation = math.sqrt(Statistics["SquaredDeviations"] / (Statistics["Count"] - 1))
+				Percentiles = tuple(GetEstimate(Estimator) for Estimator in Statistics["Estimators"])
+				Result = (Statistics["Count"], Statistics["Minimum"], Statistics["Maximum"], Statistics["Mean"], Deviation, Percentiles)
+		return Result
+
+
+
+#/***************************************************************/
+#/* Get the time at value histogram of a PID, a tuple of the    */
+#/* HISTOGRAM_ fields, the bounds of the bands, and the seconds */
+#/* at each band. None when the PID has no histogram.           */
+#/***************************************************************/
+	def GetHistogram(self, PID):
+		Result = None
+		with self.Lock:
+			if PID in self.Pids and self.Pids[PID]["Bounds"] != None:
+				Result = (list(self.Pids[PID]["Bounds"]), list(self.Pids[PID]["Seconds"]))
+		return Result
+
+
+
+#/***************************************************************/
+#/* Get the statistics as text lines, in the same "Label|Value" */
+#/* form as ELM327.GetInfo, for display and the PDF report. The */
+#/* PIDs are named from the descriptions given, where known.    */
+#/***************************************************************/
+	def GetInfo(self, Names = {}):
+		Result = ""
+		Result += "PID  Count|Min / Mean / Max  SD  p" + " p".join("{:g}".format(100 * Fraction) for Fraction in PERCENTILES) + "\n"
+		for PID in self.GetPids():
+			Summary = self.GetSummary(PID)
+			Result += "[" + PID + "] " + Names.get(PID, "") + " " + str(Summary[SUMMARY_COUNT]) + "|"
+			Result += "{:.4g}".format(Summary[SUMMARY_MINIMUM]) + " / " + "{:.4g}".format(Summary[SUMMARY_MEAN]) + " / " + "{:.4g}".format(Summary[SUMMARY_MAXIMUM])
+			Result += "  " + "{:.4g}".format(Summary[SUMMARY_DEVIATION])
+			Result += "  " + " ".join("{:.4g}".format(Percentile) for Percentile in Summary[SUMMARY_PERCENTILES]) + "\n"
+			Histogram = self.GetHistogram(PID)
+			if Histogram != None:
+				Bounds = Histogram[HISTOGRAM_BOUNDS]
+				Seconds = Histogram[HISTOGRAM_SECONDS]
+				Total = sum(Seconds)
+				for Band in range(HISTOGRAM_BANDS):
+					if Seconds[Band] > 0:
+						Result += "  Time at " + "{:.4g}".format(Bounds[Band]) + " - " + "{:.4g}".format(Bounds[Band + 1]) + "|"
+						Result += "{:.1f}".format(Seconds[Band]) + " s " + "{:0.1f}".format(100 * Seconds[Band] / Total) + "%\n"
+		return Result
@@ -17,23 +17,55 @@
 #/* (C) Jason Birch 2018-05-15 V1.04                                        */
 #/*                                                                         */
 #/* Class: Plot                                                             */
-#/* Plot a history of selected value data over time.                        */
+#/* Plot a history of selected value data over time. The history of each    */
+#/* series is kept in a ring buffer sized for the time shown, so the plot   */
+#/* scrolls on as data arrives, rather than stopping when full. A min/max   */
+#/* pyramid of each series is kept alongside, so no more than two points    */
+#/* per pixel are drawn however many values are shown. Drag across the plot */
+#/* to pan back in time, drag up or down to zoom in or out, and double tap  */
+#/* to return to the newest values. History older than is kept in memory    */
+#/* is read from the session log as it comes into view. The statistics of   */
+#/* the values read of each series are overlaid, with the time at each band */
+#/* of values drawn from the left hand side at the height of the band.      */
 #/***************************************************************************/
 
 
 
 import os
+import time
+import bisect
 import datetime
 import pygame
 import Visual
 import Button
 import ELM327
+import RingBuffer
+import MinMaxPyramid
+import PlotHistory
+import PidStatistics
 
 
 
 PLOT_COUNT = 3
-PLOT_POINTS = 512
 PLOT_WIDTH = 2
+# Seconds of history shown across the plot.
+PLOT_WINDOW = 1200
+# Shortest seconds between values of a series the history is sized for.
+PLOT_MIN_PERIOD = 0.25
+# Values held for each series, enough to fill the plot at the fastest rate.
+PLOT_POINTS = int(PLOT_WINDOW / PLOT_MIN_PERIOD)
+# Shortest and longest seconds shown across the plot when zoomed.
+PLOT_MIN_WINDOW = 10
+PLOT_MAX_WINDOW = 6 * 3600
+# Seconds between X axis labels to choose from, the shortest giving no more than PLOT_AXIS_LABELS labels.
+PLOT_AXIS_PERIODS = [ 10, 30, 60, 120, 300, 600, 1800, 3600, 7200 ]
+PLOT_AXIS_LABELS = 10
+# Most seconds between two taps for a double tap.
+PLOT_DOUBLE_TAP = 0.5
+# Overlay the statistics of the values read of each series, set from the configuration.
+STATISTICS_OVERLAY = True
+# Fraction of the plot width the time at value histogram of a series is drawn across.
+HISTOGRAM_DEPTH = 0.1
 
 
 
@@ -41,6 +73,8 @@ class Plot(Visual.Visual):
 	def __init__(self, ThisSurface, Name, PressType, xPos, yPos, xLen, yLen, Text):
 		Visual.Visual.__init__(self, ThisSurface, Name, PressType, xPos, yPos, xLen, yLen, Text)
 
+		# Plot history older than is kept in memory, read from the session log.
+		self.History = PlotHistory.PlotHistory()
 		self.ClearConfig()
 
 
@@ -58,6 +92,7 @@ class Plot(Visual.Visual):
 #/*******************************************/
 	def SetPID(self, PlotIndex, PID, PidDescription):
 		self.PID[PlotIndex] = PID
+		self.SetStatistics(PlotIndex, None, None)
 		ValueDefinition = PidDescription.split("|")
 		self.PidDescription[PlotIndex] = PidDescription
 		if len(ValueDefinition) > ELM327.FIELD_PID_MIN_1:
@@ -75,30 +110,31 @@ class Plot(Visual.Visual):
 
 
 
-#/***********************************/
-#/* Set the data value of a series. */
-#/***********************************/
-	def SetData(self, Index, PidData):
-		# Check for X axis label conditions and create X axis label when met.
-		ThisAxisTime = datetime.datetime.now()
-		if int(self.LastAxisTime.minute/2) != int(ThisAxisTime.minute/2):
-			self.LastAxisTime = ThisAxisTime
-			self.xAxisLabels[self.PlotIndex[Index]] = ThisAxisTime.strftime("%H:%M")
+#/************************************************************/
+#/* Set the data value of a series, at the time it was read. */
+#/* Once the history is full, the oldest value is replaced.  */
+#/************************************************************/
+	def SetData(self, Index, PidData, ThisTime = None):
+		if ThisTime == None:
+			ThisTime = time.time()
 		# Store provided data.
+		Value = 0
 		if type(PidData) is not str and type(PidData) is not tuple:
-			self.PlotPoints[Index][self.PlotIndex[Index]] = PidData
-		else:
-			self.PlotPoints[Index][self.PlotIndex[Index]] = 0
-		if self.PlotIndex[Index] < PLOT_POINTS:
-			self.PlotIndex[Index] += 1
+			Value = PidData
+		self.Series[Index].Append(ThisTime, Value)
+		self.Pyramids[Index].Append(ThisTime, Value)
+		if self.EndTime == None or ThisTime > self.EndTime:
+			self.EndTime = ThisTime
 
 
 
-#/********************************/
-#/* Is the data aquisition full? */
-#/********************************/
-	def IsDataEnd(self, Index):
-		return (self.PlotIndex[Index] == PLOT_POINTS - 1)
+#/**************************************************************/
+#/* Set the statistics of the values read of a series, a       */
+#/* PidStatistics summary and time at value histogram or None. */
+#/**************************************************************/
+	def SetStatistics(self, Index, Summary, Histogram):
+		self.Summaries[Index] = Summary
+		self.Histograms[Index] = Histogram
 
 
 
@@ -127,10 +163,80 @@ class Plot(Visual.Visual):
 #/* Clear all plot data to start a new data log. */
 #/************************************************/
 	def ClearData(self):
-		self.LastAxisTime = datetime.datetime.now()
-		self.xAxisLabels = {}
-		self.PlotIndex = [ 0, 0, 0 ]
-		self.PlotPoints = [ [0] * PLOT_POINTS, [0] * PLOT_POINTS, [0] * PLOT_POINTS ]
+		# Time of the newest value, the right hand end of the plot.
+		self.EndTime = None
+		self.Series = [ RingBuffer.RingBuffer(PLOT_POINTS) for Index in range(PLOT_COUNT) ]
+		self.Pyramids = [ MinMaxPyramid.MinMaxPyramid(PLOT_WINDOW) for Index in range(PLOT_COUNT) ]
+		# Statistics of the values read of each series.
+		self.Summaries = [ None ] * PLOT_COUNT
+		self.Histograms = [ None ] * PLOT_COUNT
+		# Session log history is not shown from before the plot was cleared.
+		self.HistoryStart = time.time()
+		# Seconds shown across the plot, and the time at the right hand end, None to follow the newest value.
+		self.ViewWindow = PLOT_WINDOW
+		self.ViewEndTime = None
+		# Position touched and the view when a drag started.
+		self.DragStart = None
+		self.LastTapTime = 0
+
+
+
+#/**********************************************************/
+#/* Read plot history older than is kept in memory from a  */
+#/* session log, or from none when the file name is empty. */
+#/**********************************************************/
+	def SetHistoryFile(self, FileName):
+		self.History.SetFileName(FileName)
+
+
+
+#/**************************************************************/
+#/* Get the times at the left and right hand ends of the plot. */
+#/**************************************************************/
+	def GetViewTimes(self):
+		EndTime = self.ViewEndTime
+		if EndTime == None:
+			EndTime = self.EndTime
+		if EndTime == None:
+			EndTime = time.time()
+		return (EndTime - self.ViewWindow, EndTime)
+
+
+
+#/***************************************************************/
+#/* Get the points of a series to draw between two times, at    */
+#/* most two for each pixel across. All the values are used     */
+#/* when there are few enough, otherwise the lowest and highest */
+#/* value of each period about a pixel wide. Times older than   */
+#/* the values kept in memory are read from the session log.    */
+#/***************************************************************/
+	def GetPlotData(self, Index, StartTime, EndTime, Pixels):
+		PixelPeriod = (EndTime - StartTime) / Pixels
+		Series = self.Series[Index]
+		Times = []
+		Values = []
+		MemoryStartTime = EndTime
+		if Series.GetCount() > 0:
+			MemoryStartTime = min(EndTime, Series.Get(0)[0])
+		HistoryStartTime = max(StartTime, self.HistoryStart)
+		if HistoryStartTime < MemoryStartTime and self.PID[Index] != "":
+			Times, Values = self.History.GetData(self.PID[Index], HistoryStartTime, MemoryStartTime, PixelPeriod)
+		if MemoryStartTime < EndTime:
+			First = Series.FindTime(StartTime)
+			# Include the value after the end time, so the line reaches the right hand end.
+			Last = min(Series.FindTime(EndTime) + 1, Series.GetCount())
+			if Last - First <= 2 * Pixels:
+				MemoryTimes, MemoryValues = Series.GetData(First, Last)
+			else:
+				Pyramid = self.Pyramids[Index]
+				MemoryTimes, MemoryValues = Pyramid.GetData(Pyramid.GetLevel(PixelPeriod), max(StartTime, MemoryStartTime), EndTime)
+				# The pyramid may hold periods older than the values kept, which were read from the session log.
+				First = bisect.bisect_left(MemoryTimes, MemoryStartTime)
+				MemoryTimes = MemoryTimes[First:]
+				MemoryValues = MemoryValues[First:]
+			Times += MemoryTimes
+			Values += MemoryValues
+		return (Times, Values)
 
 
 
@@ -142,10 +248,50 @@ class Plot(Visual.Visual):
 		Result = Visual.Visual.IsEvent(self, EventType, xPos, yPos, PointerButton, xOffset, yOffset)
 		if Result != False:
 			Result["BUTTON"] = self.Name
+			if EventType == Visual.EVENT_MOUSE_DOWN:
+				ThisTime = time.time()
+				if ThisTime - self.LastTapTime <= PLOT_DOUBLE_TAP:
+					# Double tap returns to following the newest values.
+					self.ViewWindow = PLOT_WINDOW
+					self.ViewEndTime = None
+					self.DragStart = None
+					ThisTime = 0
+				else:
+					self.DragStart = (xPos - xOffset, yPos - yOffset, self.GetViewTimes()[1], self.ViewWindow)
+				self.LastTapTime = ThisTime
+			elif EventType == Visual.EVENT_MOUSE_MOVE and self.DragStart != None:
+				self.Drag(xPos - xOffset, yPos - yOffset)
+			elif EventType == Visual.EVENT_MOUSE_UP:
+				self.DragStart = None
 		return Result
 
 
 
+#/************************************************************/
+#/* Pan or zoom the plot as it is dragged. Dragging across   */
+#/* pans, dragging up zooms in and down zooms out, about the */
+#/* time first touched. Reaching the newest value returns to */
+#/* following the newest values.                             */
+#/************************************************************/
+	def Drag(self, xPos, yPos):
+		xStart, yStart, EndTime, Window = self.DragStart
+		Width = self.xLen - 2*Visual.X_MARGIN
+		if abs(xPos - xStart) >= abs(yPos - yStart):
+			NewWindow = Window
+			NewEndTime = EndTime - (xPos - xStart) * Window / Width
+		else:
+			NewWindow = min(max(Window * 2**((yPos - yStart) / (self.yLen / 4)), PLOT_MIN_WINDOW), PLOT_MAX_WINDOW)
+			# Keep the time first touched under the touch.
+			RightFraction = (self.xPos + Visual.X_MARGIN + Width - xStart) / Width
+			NewEndTime = EndTime - Window * RightFraction + NewWindow * RightFraction
+		self.ViewWindow = NewWindow
+		if self.EndTime == None or NewEndTime >= self.EndTime:
+			self.ViewEndTime = None
+		else:
+			self.ViewEndTime = NewEndTime
+
+
+
 #/*******************************************/
 #/* Load gadgits onto meters tab from disk. */
 #/*******************************************/
@@ -199,12 +345,23 @@ class Plot(Visual.Visual):
 		yAxisStep = int(yAxisScale / 10)
 		for yOffset in range(0, yAxisScale, yAxisStep):
 			pygame.draw.line(ThisSurface, self.ColourGrey, (self.xPos + Visual.X_MARGIN, self.yPos + self.yLen - yOffset), (self.xPos + self.xLen - 2*Visual.X_MARGIN, self.yPos + self.yLen - yOffset), 1)
-		# Display data scale.
-		xStep = (self.xLen - 2*Visual.X_MARGIN) / PLOT_POINTS
-		for Index in self.xAxisLabels:
-			ThisText = self.xAxisLabels[Index]
+		# Display data scale, the newest data at the right hand end unless panned back.
+		StartTime, EndTime = self.GetViewTimes()
+		xScale = (self.xLen - 2*Visual.X_MARGIN) / (EndTime - StartTime)
+		AxisPeriod = PLOT_AXIS_PERIODS[-1]
+		for ThisPeriod in PLOT_AXIS_PERIODS:
+			if (EndTime - StartTime) / ThisPeriod <= PLOT_AXIS_LABELS:
+				AxisPeriod = ThisPeriod
+				break
+		AxisFormat = "%H:%M"
+		if AxisPeriod < 60:
+			AxisFormat = "%H:%M:%S"
+		AxisTime = EndTime - EndTime % AxisPeriod
+		while AxisTime > StartTime:
+			ThisText = datetime.datetime.fromtimestamp(AxisTime).strftime(AxisFormat)
 			TextHeight = Visual.Fonts["NormalFont"].get_rect(ThisText)[3]
-			TextXPos = self.xPos + Index * xStep
+			TextXPos = self.xPos + (AxisTime - StartTime) * xScale
+			AxisTime -= AxisPeriod
 			TextYPos = self.yPos + self.yLen - TextHeight - Visual.Y_MARGIN
 			RenderText = Visual.Fonts["NormalFont"].render(ThisText, self.ColourBlack)
 			ThisSurface.blit(RenderText[0], (Visual.X_MARGIN + TextXPos, TextYPos))
@@ -217,7 +374,16 @@ class Plot(Visual.Visual):
 			TextLabels = self.PidDescription[Index].split("|")
 			ThisText = "[" + str(Index+1) + "] " + self.PID[Index] + " " + TextLabels[ELM327.FIELD_PID_DESCRIPTION]
 			if len(TextLabels) > ELM327.FIELD_PID_FORMAT_1 and TextLabels[ELM327.FIELD_PID_FORMAT_1].find("f}") > -1:
-				ThisText += " " + TextLabels[ELM327.FIELD_PID_FORMAT_1].format(self.PlotPoints[Index][self.PlotIndex[Index] - 1])
+				LastValue = 0
+				if self.Series[Index].GetCount() > 0:
+					LastValue = self.Series[Index].Get(-1)[1]
+				ThisText += " " + TextLabels[ELM327.FIELD_PID_FORMAT_1].format(LastValue)
+				Summary = self.Summaries[Index]
+				if STATISTICS_OVERLAY == True and Summary != None:
+					ThisText += "  MIN " + TextLabels[ELM327.FIELD_PID_FORMAT_1].format(Summary[PidStatistics.SUMMARY_MINIMUM]).strip()
+					ThisText += " AVG " + TextLabels[ELM327.FIELD_PID_FORMAT_1].format(Summary[PidStatistics.SUMMARY_MEAN]).strip()
+					ThisText += " MAX " + TextLabels[ELM327.FIELD_PID_FORMAT_1].format(Summary[PidStatistics.SUMMARY_MAXIMUM]).strip()
+					ThisText += " P95 " + TextLabels[ELM327.FIELD_PID_FORMAT_1].format(Summary[PidStatistics.SUMMARY_PERCENTILES][-1]).strip()
 				TextHeight = Visual.Fonts["LargeFont"].get_rect(ThisText)[3]
 				TextXPos = Visual.X_MARGIN
 				TextYPos = DisplayTextOffset + Visual.Y_MARGIN + self.yPos
@@ -227,7 +393,6 @@ class Plot(Visual.Visual):
 
 				# Plot series scale.
 				yScale = (self.yLen - 2*Visual.Y_MARGIN) / (self.PlotAttrib[Index]["ValueMax"] - self.PlotAttrib[Index]["ValueMin"])
-				xStep = (self.xLen - 2*Visual.X_MARGIN) / PLOT_POINTS
 				# Display Y axis scale values.
 				for yOffset in range(0, yAxisScale - yAxisStep, yAxisStep):
 					ThisText = TextLabels[ELM327.FIELD_PID_FORMAT_1].format(yOffset / yScale + self.PlotAttrib[Index]["ValueMin"])
@@ -237,13 +402,26 @@ class Plot(Visual.Visual):
 					TextYPos = self.yPos + self.yLen - yOffset - (3 - Index) * (TextHeight + 2)
 					RenderText = Visual.Fonts["NormalFont"].render(ThisText, self.PlotAttrib[Index]["Colour"])
 					ThisSurface.blit(RenderText[0], (TextXPos, TextYPos))
-				# Plot series.
-				xOffset = 0
-				for PlotIndex in range(self.PlotIndex[Index] - 1):
-					PlotX1 = Visual.X_MARGIN + xOffset
-					PlotY1 = self.yPos + self.yLen - Visual.Y_MARGIN - yScale * (self.PlotPoints[Index][PlotIndex] - self.PlotAttrib[Index]["ValueMin"])
-					PlotX2 = Visual.X_MARGIN + xOffset + xStep
-					PlotY2 = self.yPos + self.yLen - Visual.Y_MARGIN - yScale * (self.PlotPoints[Index][PlotIndex+1] - self.PlotAttrib[Index]["ValueMin"])
-					pygame.draw.line(ThisSurface, self.PlotAttrib[Index]["Colour"], (PlotX1, PlotY1), (PlotX2, PlotY2), PLOT_WIDTH)
-					xOffset += xStep
+				# Plot series, the values within the time shown, by the time of each.
+				Times, Values = self.GetPlotData(Index, StartTime, EndTime, int(self.xLen - 2*Visual.X_MARGIN))
+				yBase = self.yPos + self.yLen - Visual.Y_MARGIN
+				# Draw the time at each band of values, as deep as the time at the band, outlined so the series show through.
+				Histogram = self.Histograms[Index]
+				if STATISTICS_OVERLAY == True and Histogram != None and max(Histogram[PidStatistics.HISTOGRAM_SECONDS]) > 0:
+					Bounds = Histogram[PidStatistics.HISTOGRAM_BOUNDS]
+					Seconds = Histogram[PidStatistics.HISTOGRAM_SECONDS]
+					ThisSurface.set_clip((self.xPos, self.yPos, self.xLen, self.yLen))
+					for Band in range(len(Seconds)):
+						if Seconds[Band] > 0:
+							BandTop = yBase - yScale * (Bounds[Band + 1] - self.PlotAttrib[Index]["ValueMin"])
+							BandHeight = yScale * (Bounds[Band + 1] - Bounds[Band])
+							BandWidth = max(1, (self.xLen - 2*Visual.X_MARGIN) * HISTOGRAM_DEPTH * Seconds[Band] / max(Seconds))
+							pygame.draw.rect(ThisSurface, self.PlotAttrib[Index]["Colour"], (self.xPos + Visual.X_MARGIN, BandTop, BandWidth, BandHeight), 1)
+					ThisSurface.set_clip(None)
+				PlotPoints = [ (self.xPos + Visual.X_MARGIN + (Times[PlotIndex] - StartTime) * xScale, yBase - yScale * (Values[PlotIndex] - self.PlotAttrib[Index]["ValueMin"])) for PlotIndex in range(len(Times)) ]
+				if len(PlotPoints) > 1:
+					# Points either side of the time shown are drawn only within the plot area.
+					ThisSurface.set_clip((self.xPos, self.yPos, self.xLen, self.yLen))
+					pygame.draw.lines(ThisSurface, self.PlotAttrib[Index]["Colour"], False, PlotPoints, PLOT_WIDTH)
+					ThisSurface.set_clip(None)
 
@@ -0,0 +1,202 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#/***************************************************************************/
+#/* Raspberry Pi ELM327 OBBII CAN BUS Diagnostic Software.                  */
+#/*                                                                         */
+#/* (C) Jason Birch 2018-05-15 V1.04                                        */
+#/*                                                                         */
+#/* Class: PlotHistory                                                      */
+#/* Plot data of the session log, for plot history older than is kept in    */
+#/* memory. The time shown is read from the log only when it is drawn,      */
+#/* using the chunk index of the log to find the chunks of that time. The   */
+#/* data is read in tiles, each a fixed run of periods of a min/max level,  */
+#/* the lowest and highest value of each period, so a long drive is drawn   */
+#/* from few values. The tiles last drawn are kept in a small cache, least  */
+#/* recently used dropped first, so panning across a drive reads the log    */
+#/* only for the tiles coming into view, and memory use does not grow.      */
+#/***************************************************************************/
+
+
+
+import os
+import math
+import bisect
+import collections
+import SessionLogReader
+import MinMaxPyramid
+
+
+
+# Periods of a level in each tile.
+TILE_PERIODS = 256
+# Tiles kept in the cache.
+TILE_CACHE_SIZE = 64
+# Level of tiles holding every value, for when each pixel is shorter than a period of the lowest level.
+LEVEL_RAW = -1
+
+
+
+class PlotHistory:
+	def __init__(self):
+		self.FileName = ""
+		self.Reader = None
+		# Tiles of points by PID, level and tile number, least recently used first.
+		self.Tiles = collections.OrderedDict()
+
+
+
+#/***********************************************************/
+#/* Read plot history from a session log, or from none when */
+#/* the file name is empty.                                 */
+#/***********************************************************/
+	def SetFileName(self, FileName):
+		if FileName != self.FileName:
+			self.Close()
+			self.FileName = FileName
+
+
+
+#/***************************************************/
+#/* Close the session log, and forget cached tiles. */
+#/***************************************************/
+	def Close(self):
+		if self.Reader != None:
+			self.Reader.Close()
+			self.Reader = None
+		self.Tiles.clear()
+		self.FileName = ""
+
+
+
+#/************************************************************/
+#/* Open the session log when first needed, and index any    */
+#/* chunks written since it was last read. Return False when */
+#/* there is no session log to read.                         */
+#/************************************************************/
+	def Refresh(self):
+		if self.Reader == None and self.FileName != "" and os.path.isfile(self.FileName):
+			Reader = SessionLogReader.SessionLogReader(self.FileName)
+			if Reader.GetInitResult() == "":
+				self.Reader = Reader
+		elif self.Reader != None:
+			self.Reader.Refresh()
+		return self.Reader != None
+
+
+
+#/*************************************************************/
+#/* Get the seconds of each period of a level, the periods of */
+#/* raw tiles being those of the lowest min/max level.        */
+#/*************************************************************/
+	def GetPeriod(self, Level):
+		return MinMaxPyramid.PYRAMID_PERIOD * 2**max(Level, 0)
+
+
+
+#/**************************************************************/
+#/* Get the points of a PID to draw between two times, with    */
+#/* the given seconds across each pixel, as two lists of times */
+#/* and values. Every value is used when a pixel is shorter    */
+#/* than a period of the lowest level, otherwise the lowest    */
+#/* and highest of each period of the level nearest one pixel. */
+#/**************************************************************/
+	def GetData(self, PID, StartTime, EndTime, PixelPeriod):
+		Times = []
+		Values = []
+		if StartTime < EndTime and self.Refresh() == True:
+			if PixelPeriod < MinMaxPyramid.PYRAMID_PERIOD:
+				Level = LEVEL_RAW
+			else:
+				Level = int(math.ceil(math.log2(PixelPeriod / MinMaxPyramid.PYRAMID_PERIOD)))
+			TileTime = TILE_PERIODS * self.GetPeriod(Level)
+			for Tile in range(int(StartTime // TileTime), int(EndTime // TileTime) + 1):
+				TileTimes, TileValues = self.GetTile(PID, Level, Tile)
+				First = bisect.bisect_left(TileTimes, StartTime)
+				Last = bisect.bisect_left(TileTimes, EndTime)
+				Times += TileTimes[First:Last]
+				Values += TileValues[First:Last]
+		return (Times, Values)
+
+
+
+#/*************************************************************/
+#/* Get a tile from the cache, or read it from the log. Tiles */
+#/* reaching past the last chunk written of the PID are not   */
+#/* kept, as more of them is still to be written.             */
+#/*************************************************************/
+	def GetTile(self, PID, Level, Tile):
+		Key = (PID, Level, Tile)
+		if Key in self.Tiles:
+			self.Tiles.move_to_end(Key)
+			Result = self.Tiles[Key]
+		else:
+			TileTime = TILE_PERIODS * self.GetPeriod(Level)
+			Result = self.ReadTile(PID, Level, Tile * TileTime, (Tile + 1) * TileTime)
+			LastTime = self.Reader.GetLastTime(PID)
+			if LastTime != None and LastTime >= (Tile + 1) * TileTime:
+				self.Tiles[Key] = Result
+				if len(self.Tiles) > TILE_CACHE_SIZE:
+					self.Tiles.popitem(False)
+		return Result
+
+
+
+#/**************************************************************/
+#/* Read the points of a tile from the log. Each chunk is      */
+#/* split into periods by binary search over its times, and    */
+#/* the lowest and highest value of each period found over the */
+#/* whole period at once, rather than value by value.          */
+#/**************************************************************/
+	def ReadTile(self, PID, Level, StartTime, EndTime):
+		Times = []
+		Values = []
+		Period = self.GetPeriod(Level)
+		# Lowest and highest value of each period, with the times read, by period number.
+		Periods = collections.OrderedDict()
+		for ChunkTimes, ChunkValues in self.Reader.GetData(PID, StartTime, EndTime):
+			ChunkTimes = ChunkTimes.tolist()
+			ChunkValues = ChunkValues.tolist()
+			Index = bisect.bisect_left(ChunkTimes, StartTime)
+			End = bisect.bisect_left(ChunkTimes, EndTime)
+			if Level == LEVEL_RAW:
+				Times += ChunkTimes[Index:End]
+				Values += ChunkValues[Index:End]
+				continue
+			while Index < End:
+				ThisPeriod = int(ChunkTimes[Index] / Period)
+				Stop = bisect.bisect_left(ChunkTimes, (ThisPeriod + 1) * Period, Index, End)
+				if Stop <= Index:
+					Stop = Index + 1
+				PeriodValues = ChunkValues[Index:Stop]
+				Low = min(PeriodValues)
+				High = max(PeriodValues)
+				LowTime = ChunkTimes[Index + PeriodValues.index(Low)]
+				HighTime = ChunkTimes[Index + PeriodValues.index(High)]
+				if ThisPeriod in Periods:
+					# The period was started in the chunk before.
+					LastLowTime, LastLow, LastHighTime, LastHigh = Periods[ThisPeriod]
+					if LastLow <= Low:
+						LowTime, Low = LastLowTime, LastLow
+					if LastHigh >= High:
+						HighTime, High = LastHighTime, LastHigh
+				Periods[ThisPeriod] = (LowTime, Low, HighTime, High)
+				Index = Stop
+		for LowTime, Low, HighTime, High in Periods.values():
+			if LowTime <= HighTime:
+				Times += (LowTime, HighTime)
+				Values += (Low, High)
+			else:
+				Times += (HighTime, LowTime)
+				Values += (High, Low)
+		return (Times, Values)
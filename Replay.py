@@ -0,0 +1,246 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#/***************************************************************************/
+#/* Raspberry Pi ELM327 OBBII CAN BUS Diagnostic Software.                  */
+#/*                                                                         */
+#/* (C) Jason Birch 2018-05-15 V1.04                                        */
+#/*                                                                         */
+#/* Class: Replay                                                           */
+#/* Replay a recorded session log in place of the ECU. The ELM327 class     */
+#/* reads the value of each PID from the log as it was at the replay time,  */
+#/* so the meters and plots are updated in the same way as when live. The   */
+#/* replay time runs at a multiple of real time, or as fast as the values   */
+#/* are read, stepping on to the next value logged each time the PIDs are   */
+#/* read again. The log is read a chunk at a time for each PID, as the      */
+#/* replay reaches it.                                                      */
+#/***************************************************************************/
+
+
+
+import time
+import bisect
+import datetime
+import SessionLogReader
+
+
+
+# Replay in real time.
+REPLAY_SPEED_NORMAL = 1.0
+# Replay as fast as the values are read, rather than to the clock.
+REPLAY_SPEED_MAX = 0
+# Text given for the speed to replay as fast as the values are read.
+REPLAY_SPEED_MAX_TEXT = "MAX"
+
+
+
+#/*************************************************************/
+#/* Get a replay speed from text, a multiple of real time, or */
+#/* MAX to replay as fast as the values are read.             */
+#/*************************************************************/
+def ParseSpeed(Text):
+	if Text.upper() == REPLAY_SPEED_MAX_TEXT:
+		Result = REPLAY_SPEED_MAX
+	else:
+		Result = float(Text)
+		if Result <= 0:
+			raise ValueError("REPLAY SPEED MUST BE ABOVE ZERO: " + Text)
+	return Result
+
+
+
+class Replay:
+	def __init__(self, FileName, Speed = REPLAY_SPEED_NORMAL):
+		self.InitResult = ""
+		self.FileName = FileName
+		self.Speed = Speed
+		self.Reader = SessionLogReader.SessionLogReader(FileName)
+		self.InitResult += self.Reader.GetInitResult()
+		self.Pids = set(self.Reader.GetPids())
+		# First and last sample times of the log.
+		self.TimeRange = self.Reader.GetTimeRange()
+		if self.TimeRange == None:
+			self.TimeRange = (self.Reader.GetStartTime(), self.Reader.GetStartTime())
+		self.Start()
+
+
+
+#/*************************************************/
+#/* Get any errors or warnings which occured      */
+#/* during creation of an instance of this class. */
+#/*************************************************/
+	def GetInitResult(self):
+		return self.InitResult
+
+
+
+#/*********************************/
+#/* Release the session log file. */
+#/*********************************/
+	def Close(self):
+		self.Cursors = {}
+		self.Reader.Close()
+
+
+
+#/***********************************************************/
+#/* Start the replay again from the first value in the log. */
+#/***********************************************************/
+	def Start(self):
+		# A cursor reading through the values of each PID read so far.
+		self.Cursors = {}
+		# PIDs read since the replay time last stepped on, when replaying as fast as the values are read.
+		self.ReadPids = set()
+		self.ReplayTime = self.TimeRange[0]
+		self.StartClock = time.perf_counter()
+
+
+
+#/*******************************************/
+#/* Get the name of the log being replayed. */
+#/*******************************************/
+	def GetFileName(self):
+		return self.FileName
+
+
+
+#/*****************************************************/
+#/* Get the replay speed, a multiple of real time, or */
+#/* REPLAY_SPEED_MAX.                                 */
+#/*****************************************************/
+	def GetSpeed(self):
+		return self.Speed
+
+
+
+#/**************************************/
+#/* Get the PIDs in the log, in order. */
+#/**************************************/
+	def GetPids(self):
+		return sorted(self.Pids)
+
+
+
+#/*****************************************/
+#/* Check if a PID has values in the log. */
+#/*****************************************/
+	def HasPid(self, PID):
+		return PID in self.Pids
+
+
+
+#/************************************************************/
+#/* Get the replay time, the time in the log being replayed, */
+#/* which stops at the last value in the log.                */
+#/************************************************************/
+	def GetTime(self):
+		if self.Speed != REPLAY_SPEED_MAX:
+			self.ReplayTime = min(self.TimeRange[0] + (time.perf_counter() - self.StartClock) * self.Speed, self.TimeRange[1])
+		return self.ReplayTime
+
+
+
+#/***************************************************/
+#/* Check if the replay has reached the end of log. */
+#/***************************************************/
+	def IsEnded(self):
+		return self.GetTime() >= self.TimeRange[1]
+
+
+
+#/**************************************************************/
+#/* Get the value of a PID at the replay time, the last logged */
+#/* at or before it, or None before the first. When replaying  */
+#/* as fast as the values are read, reading a PID again steps  */
+#/* the replay time on first.                                  */
+#/**************************************************************/
+	def GetValue(self, PID):
+		Result = None
+		if PID in self.Pids:
+			if self.Speed == REPLAY_SPEED_MAX:
+				if PID in self.ReadPids:
+					self.Step()
+				self.ReadPids.add(PID)
+			if PID not in self.Cursors:
+				self.Cursors[PID] = { "Chunks" : self.Reader.GetData(PID), "Times" : [], "Values" : [], "Index" : 0, "Value" : None }
+			Result = self.MoveCursor(self.Cursors[PID], self.GetTime())
+		return Result
+
+
+
+#/**************************************************************/
+#/* Step the replay time on to the next value logged of any of */
+#/* the PIDs read, so none of their values are passed over.    */
+#/**************************************************************/
+	def Step(self):
+		NextTimes = [ self.GetNextTime(Cursor) for Cursor in self.Cursors.values() ]
+		NextTimes = [ NextTime for NextTime in NextTimes if NextTime != None ]
+		if len(NextTimes) > 0:
+			self.ReplayTime = min(NextTimes)
+		else:
+			self.ReplayTime = self.TimeRange[1]
+		self.ReadPids = set()
+
+
+
+#/**************************************************************/
+#/* Get the time of the next value of a cursor, reading chunks */
+#/* as needed, or None when there are no more values.          */
+#/**************************************************************/
+	def GetNextTime(self, Cursor):
+		Result = None
+		while Cursor["Index"] >= len(Cursor["Times"]):
+			NextChunk = next(Cursor["Chunks"], None)
+			if NextChunk == None:
+				break
+			Cursor["Times"] = NextChunk[0].tolist()
+			Cursor["Values"] = NextChunk[1].tolist()
+			Cursor["Index"] = 0
+		if Cursor["Index"] < len(Cursor["Times"]):
+			Result = Cursor["Times"][Cursor["Index"]]
+		return Result
+
+
+
+#/************************************************************/
+#/* Move a cursor on to a time, and get the last value at or */
+#/* before it.                                               */
+#/************************************************************/
+	def MoveCursor(self, Cursor, ThisTime):
+		NextTime = self.GetNextTime(Cursor)
+		while NextTime != None and NextTime <= ThisTime:
+			Cursor["Index"] = bisect.bisect_right(Cursor["Times"], ThisTime, Cursor["Index"])
+			Cursor["Value"] = Cursor["Values"][Cursor["Index"] - 1]
+			NextTime = self.GetNextTime(Cursor)
+		return Cursor["Value"]
+
+
+
+#/**********************************************************/
+#/* Get information about the replay, as lines of name and */
+#/* value separated by '|'.                                */
+#/**********************************************************/
+	def GetInfo(self):
+		Result = ""
+		ThisTime = self.GetTime()
+		Result += "Replay File|" + self.FileName + "\n"
+		if self.Speed == REPLAY_SPEED_MAX:
+			Result += "Replay Speed|" + REPLAY_SPEED_MAX_TEXT + "\n"
+		else:
+			Result += "Replay Speed|" + "{:g}".format(self.Speed) + "x\n"
+		Result += "Replay Time|" + datetime.datetime.fromtimestamp(ThisTime).strftime("%Y-%m-%d %H:%M:%S") + "\n"
+		Result += "Replay Position|" + "{:.0f}".format(ThisTime - self.TimeRange[0]) + " / " + "{:.0f}".format(self.TimeRange[1] - self.TimeRange[0]) + " s"
+		if self.IsEnded() == True:
+			Result += " ENDED"
+		Result += "\n"
+		return Result
@@ -0,0 +1,143 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#/***************************************************************************/
+#/* Raspberry Pi ELM327 OBBII CAN BUS Diagnostic Software.                  */
+#/*                                                                         */
+#/* (C) Jason Birch 2018-05-15 V1.04                                        */
+#/*                                                                         */
+#/* Class: RingBuffer                                                       */
+#/* A fixed size circular buffer of timestamped values, held in typed       */
+#/* arrays. Adding a value takes the same time however full the buffer is,  */
+#/* and once full each value added replaces the oldest.                     */
+#/***************************************************************************/
+
+
+
+import array
+
+
+
+class RingBuffer:
+	def __init__(self, Capacity):
+		self.Capacity = Capacity
+		self.Times = array.array('d', bytes(8 * Capacity))
+		self.Values = array.array('d', bytes(8 * Capacity))
+		self.Clear()
+
+
+
+#/**************************************/
+#/* Remove all values from the buffer. */
+#/**************************************/
+	def Clear(self):
+		# Position of the oldest value, and the count of values held.
+		self.Start = 0
+		self.Count = 0
+
+
+
+#/********************************************/
+#/* Get the most values the buffer can hold. */
+#/********************************************/
+	def GetCapacity(self):
+		return self.Capacity
+
+
+
+#/******************************************/
+#/* Get the count of values in the buffer. */
+#/******************************************/
+	def GetCount(self):
+		return self.Count
+
+
+
+#/*************************************************************/
+#/* Add a value and its time, replacing the oldest when full. */
+#/* Times are expected to be added in order.                  */
+#/*************************************************************/
+	def Append(self, ThisTime, Value):
+		Position = (self.Start + self.Count) % self.Capacity
+		self.Times[Position] = ThisTime
+		self.Values[Position] = Value
+		if self.Count < self.Capacity:
+			self.Count += 1
+		else:
+			self.Start = (self.Start + 1) % self.Capacity
+
+
+
+#/************************************************************/
+#/* Get the time and value at a position, 0 being the oldest */
+#/* and -1 the newest.                                       */
+#/************************************************************/
+	def Get(self, Index):
+		if Index < 0:
+			Index += self.Count
+		if Index < 0 or Index >= self.Count:
+			raise IndexError("RING BUFFER INDEX OUT OF RANGE")
+		Position = (self.Start + Index) % self.Capacity
+		return (self.Times[Position], self.Values[Position])
+
+
+
+#/*********************************************************/
+#/* Replace the time and value at a position, 0 being the */
+#/* oldest and -1 the newest.                             */
+#/*********************************************************/
+	def Set(self, Index, ThisTime, Value):
+		if Index < 0:
+			Index += self.Count
+		if Index < 0 or Index >= self.Count:
+			raise IndexError("RING BUFFER INDEX OUT OF RANGE")
+		Position = (self.Start + Index) % self.Capacity
+		self.Times[Position] = ThisTime
+		self.Values[Position] = Value
+
+
+
+#/***********************************************************/
+#/* Get the position of the first value at or after a time, */
+#/* found by binary search, as the times are in order.      */
+#/***********************************************************/
+	def FindTime(self, ThisTime):
+		Low = 0
+		High = self.Count
+		while Low < High:
+			Middle = (Low + High) // 2
+			if self.Times[(self.Start + Middle) % self.Capacity] < ThisTime:
+				Low = Middle + 1
+			else:
+				High = Middle
+		return Low
+
+
+
+#/**************************************************************/
+#/* Get the times and values from a position up to another, or */
+#/* to the newest, as two arrays, oldest first.                */
+#/**************************************************************/
+	def GetData(self, Index = 0, EndIndex = None):
+		if EndIndex == None:
+			EndIndex = self.Count
+		Times = array.array('d')
+		Values = array.array('d')
+		First = self.Start + Index
+		End = self.Start + EndIndex
+		# The values held may wrap around the end of the arrays.
+		for Start, Stop in ((First, min(End, self.Capacity)), (max(First, self.Capacity) - self.Capacity, End - self.Capacity)):
+			if Stop > Start:
+				Times += self.Times[Start:Stop]
+				Values += self.Values[Start:Stop]
+		return (Times, Values)
@@ -0,0 +1,301 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#/***************************************************************************/
+#/* Raspberry Pi ELM327 OBBII CAN BUS Diagnostic Software.                  */
+#/*                                                                         */
+#/* (C) Jason Birch 2018-05-15 V1.04                                        */
+#/*                                                                         */
+#/* Class: SessionCatalogue                                                 */
+#/* A catalogue of every session, kept in an SQLite database. Each session  */
+#/* is added when it ends, with the VIN, start and end times, session log   */
+#/* file, the PIDs logged with the count, lowest, highest and mean of their */
+#/* values, and the trouble codes and freeze frames read during it. The     */
+#/* database is indexed by VIN, time, PID and trouble code, so finding the  */
+#/* sessions of a vehicle, or the vehicles which had a trouble code, does   */
+#/* not need any session log or report to be opened. The PID statistics     */
+#/* are taken from those kept as the values were read, when given, so the   */
+#/* log is not read again for them. A session recovered from a log which    */
+#/* was never ended, and is named without a VIN, has an empty VIN.          */
+#/***************************************************************************/
+
+
+
+import os
+import sqlite3
+import contextlib
+import SessionLogReader
+import TroubleCodeSweep
+import Snapshot
+import PidStatistics
+
+
+
+# Tables and indexes of the catalogue, created when not already in the database.
+SCHEMA = [
+	"CREATE TABLE IF NOT EXISTS SESSIONS (SESSION_ID INTEGER PRIMARY KEY, VIN TEXT NOT NULL, START_TIME REAL NOT NULL, END_TIME REAL NOT NULL, LOG_FILE TEXT NOT NULL UNIQUE, SAMPLE_COUNT INTEGER NOT NULL)",
+	"CREATE TABLE IF NOT EXISTS SESSION_PIDS (SESSION_ID INTEGER NOT NULL, PID TEXT NOT NULL, SAMPLE_COUNT INTEGER NOT NULL, MINIMUM REAL, MAXIMUM REAL, MEAN REAL, PRIMARY KEY (SESSION_ID, PID))",
+	"CREATE TABLE IF NOT EXISTS SESSION_CODES (SESSION_ID INTEGER NOT NULL, KIND TEXT NOT NULL, CODE TEXT NOT NULL, ECU TEXT NOT NULL, PRIMARY KEY (SESSION_ID, KIND, CODE, ECU))",
+	"CREATE TABLE IF NOT EXISTS SESSION_FREEZE_FRAMES (SESSION_ID INTEGER NOT NULL, FREEZE_INDEX INTEGER NOT NULL, TIME REAL NOT NULL, PID TEXT NOT NULL, DESCRIPTION TEXT NOT NULL, VALUE TEXT NOT NULL, PRIMARY KEY (SESSION_ID, FREEZE_INDEX, PID))",
+	"CREATE INDEX IF NOT EXISTS SESSIONS_VIN ON SESSIONS (VIN, START_TIME)",
+	"CREATE INDEX IF NOT EXISTS SESSIONS_START_TIME ON SESSIONS (START_TIME)",
+	"CREATE INDEX IF NOT EXISTS SESSION_PIDS_PID ON SESSION_PIDS (PID, SESSION_ID)",
+	"CREATE INDEX IF NOT EXISTS SESSION_CODES_CODE ON SESSION_CODES (CODE, SESSION_ID)",
+]
+
+# Session fields, as returned by FindSessions.
+SESSION_ID = 0
+SESSION_VIN = 1
+SESSION_START_TIME = 2
+SESSION_END_TIME = 3
+SESSION_LOG_FILE = 4
+SESSION_SAMPLE_COUNT = 5
+
+# PID fields, as returned by GetPids.
+PID_PID = 0
+PID_SAMPLE_COUNT = 1
+PID_MINIMUM = 2
+PID_MAXIMUM = 3
+PID_MEAN = 4
+
+# Trouble code fields, as returned by GetCodes.
+CODE_KIND = 0
+CODE_CODE = 1
+CODE_ECU = 2
+
+# Freeze frame value fields, as returned by GetFreezeFrames.
+FREEZE_INDEX = 0
+FREEZE_TIME = 1
+FREEZE_PID = 2
+FREEZE_DESCRIPTION = 3
+FREEZE_VALUE = 4
+
+
+
+class SessionCatalogue:
+	def __init__(self, DatabaseFile = "LOG/SESSIONS.DB"):
+		self.InitResult = ""
+		self.DatabaseFile = DatabaseFile
+
+		try:
+			if os.path.dirname(self.DatabaseFile) != "":
+				os.makedirs(os.path.dirname(self.DatabaseFile), exist_ok = True)
+			with contextlib.closing(self.Connect()) as Connection:
+				# A write ahead journal keeps the catalogue whole if power is lost while a session is added.
+				Connection.execute("PRAGMA journal_mode=WAL")
+				with Connection:
+					for Statement in SCHEMA:
+						Connection.execute(Statement)
+		except Exception as Catch:
+			print(self.DatabaseFile + " : " + str(Catch))
+			self.InitResult += "FAILED TO OPEN DATABASE: " + self.DatabaseFile + "\n"
+
+
+
+#/*************************************************/
+#/* Get any errors or warnings which occured      */
+#/* during creation of an instance of this class. */
+#/*************************************************/
+	def GetInitResult(self):
+		return self.InitResult
+
+
+
+#/**************************************************************/
+#/* Open a connection to the database. A connection is opened  */
+#/* for each use, as sessions end on the thread talking to the */
+#/* ELM327 and the application thread.                         */
+#/**************************************************************/
+	def Connect(self):
+		return sqlite3.connect(self.DatabaseFile, timeout = 10)
+
+
+
+#/*************************************************************/
+#/* Add a session which has ended, from its session log and   */
+#/* the trouble code sweeps and freeze frame snapshots taken  */
+#/* during it. The statistics of each PID are taken from the  */
+#/* PidStatistics kept during the session when given, and are */
+#/* otherwise worked out from the log. A session already in   */
+#/* the catalogue with the same log file is replaced. Return  */
+#/* the session ID, or None when it can't be added.           */
+#/*************************************************************/
+	def AddSession(self, LogFile, Vin, Sweeps = [], Statistics = None, Snapshots = []):
+		Result = None
+		try:
+			Reader = SessionLogReader.SessionLogReader(LogFile)
+			if Reader.GetInitResult() != "":
+				raise ValueError("FAILED TO READ SESSION LOG: " + LogFile)
+			StartTime = Reader.GetStartTime()
+			EndTime = StartTime
+			if Reader.GetTimeRange() != None:
+				EndTime = max(StartTime, Reader.GetTimeRange()[1])
+			Pids = []
+			if Statistics != None:
+				# Summary statistics of each PID, kept as the values were read.
+				for PID in Statistics.GetPids():
+					Summary = Statistics.GetSummary(PID)
+					Pids.append((PID, Summary[PidStatistics.SUMMARY_COUNT], Summary[PidStatistics.SUMMARY_MINIMUM], Summary[PidStatistics.SUMMARY_MAXIMUM], Summary[PidStatistics.SUMMARY_MEAN]))
+			else:
+				# Summary statistics of each PID, worked out a chunk at a time.
+				for PID in Reader.GetPids():
+					Count = 0
+					Minimum = None
+					Maximum = None
+					Total = 0.0
+					for Times, Values in Reader.GetData(PID):
+						Count += len(Values)
+						Total += sum(Values)
+						if Minimum == None:
+							Minimum = min(Values)
+							Maximum = max(Values)
+						else:
+							Minimum = min(Minimum, min(Values))
+							Maximum = max(Maximum, max(Values))
+					if Count > 0:
+						Pids.append((PID, Count, Minimum, Maximum, Total / Count))
+			Reader.Close()
+			Codes = set()
+			for ThisSweep in Sweeps:
+				for ThisCode in ThisSweep.GetCodes():
+					Codes.add((ThisCode[TroubleCodeSweep.CODE_KIND], ThisCode[TroubleCodeSweep.CODE_CODE], ThisCode[TroubleCodeSweep.CODE_ECU]))
+
+			with contextlib.closing(self.Connect()) as Connection:
+				with Connection:
+					for Row in Connection.execute("SELECT SESSION_ID FROM SESSIONS WHERE LOG_FILE = ?", (LogFile, )).fetchall():
+						self.DeleteSession(Connection, Row[0])
+					Cursor = Connection.execute("INSERT INTO SESSIONS (VIN, START_TIME, END_TIME, LOG_FILE, SAMPLE_COUNT) VALUES (?, ?, ?, ?, ?)", (Vin, StartTime, EndTime, LogFile, sum(ThisPid[1] for ThisPid in Pids)))
+					Result = Cursor.lastrowid
+					Connection.executemany("INSERT INTO SESSION_PIDS (SESSION_ID, PID, SAMPLE_COUNT, MINIMUM, MAXIMUM, MEAN) VALUES (?, ?, ?, ?, ?, ?)", [ (Result, ) + ThisPid for ThisPid in Pids ])
+					Connection.executemany("INSERT INTO SESSION_CODES (SESSION_ID, KIND, CODE, ECU) VALUES (?, ?, ?, ?)", [ (Result, ) + ThisCode for ThisCode in sorted(Codes) ])
+					Connection.executemany("INSERT INTO SESSION_FREEZE_FRAMES (SESSION_ID, FREEZE_INDEX, TIME, PID, DESCRIPTION, VALUE) VALUES (?, ?, ?, ?, ?, ?)", [ (Result, ThisSnapshot.GetFreezeIndex(), ThisSnapshot.GetTime(), ThisValue[Snapshot.VALUE_PID], ThisValue[Snapshot.VALUE_DESCRIPTION], str(ThisValue[Snapshot.VALUE_DATA])) for ThisSnapshot in Snapshots for ThisValue in ThisSnapshot.GetValues() ])
+		except Exception as Catch:
+			print(self.DatabaseFile + " : " + str(Catch))
+			Result = None
+		return Result
+
+
+
+#/*********************************************************/
+#/* Remove a session, with its PIDs and trouble codes, as */
+#/* part of a transaction on the connection given.        */
+#/*********************************************************/
+	def DeleteSession(self, Connection, SessionId):
+		Connection.execute("DELETE FROM SESSION_PIDS WHERE SESSION_ID = ?", (SessionId, ))
+		Connection.execute("DELETE FROM SESSION_CODES WHERE SESSION_ID = ?", (SessionId, ))
+		Connection.execute("DELETE FROM SESSION_FREEZE_FRAMES WHERE SESSION_ID = ?", (SessionId, ))
+		Connection.execute("DELETE FROM SESSIONS WHERE SESSION_ID = ?", (SessionId, ))
+
+
+
+#/************************************************************/
+#/* Find sessions, newest first, optionally only those of a  */
+#/* VIN, which had a trouble code, which logged a PID, or    */
+#/* which started between two times. Each session is a tuple */
+#/* of the SESSION_ fields.                                  */
+#/************************************************************/
+	def FindSessions(self, Vin = None, Code = None, PID = None, StartTime = None, EndTime = None):
+		Query = "SELECT SESSION_ID, VIN, START_TIME, END_TIME, LOG_FILE, SAMPLE_COUNT FROM SESSIONS"
+		Conditions = []
+		Parameters = []
+		if Vin != None:
+			Conditions.append("VIN = ?")
+			Parameters.append(Vin)
+		if Code != None:
+			Conditions.append("SESSION_ID IN (SELECT SESSION_ID FROM SESSION_CODES WHERE CODE = ?)")
+			Parameters.append(Code)
+		if PID != None:
+			Conditions.append("SESSION_ID IN (SELECT SESSION_ID FROM SESSION_PIDS WHERE PID = ?)")
+			Parameters.append(PID)
+		if StartTime != None:
+			Conditions.append("START_TIME >= ?")
+			Parameters.append(StartTime)
+		if EndTime != None:
+			Conditions.append("START_TIME < ?")
+			Parameters.append(EndTime)
+		if len(Conditions) > 0:
+			Query += " WHERE " + " AND ".join(Conditions)
+		Query += " ORDER BY START_TIME DESC"
+		Result = []
+		try:
+			with contextlib.closing(self.Connect()) as Connection:
+				Result = Connection.execute(Query, Parameters).fetchall()
+		except Exception as Catch:
+			print(self.DatabaseFile + " : " + str(Catch))
+		return Result
+
+
+
+#/*************************************************************/
+#/* Get the VINs of the vehicles which had a trouble code, or */
+#/* of every vehicle, sorted.                                 */
+#/*************************************************************/
+	def FindVins(self, Code = None):
+		Query = "SELECT DISTINCT VIN FROM SESSIONS"
+		Parameters = []
+		if Code != None:
+			Query += " WHERE SESSION_ID IN (SELECT SESSION_ID FROM SESSION_CODES WHERE CODE = ?)"
+			Parameters.append(Code)
+		Query += " ORDER BY VIN"
+		Result = []
+		try:
+			with contextlib.closing(self.Connect()) as Connection:
+				Result = [ Row[0] for Row in Connection.execute(Query, Parameters) ]
+		except Exception as Catch:
+			print(self.DatabaseFile + " : " + str(Catch))
+		return Result
+
+
+
+#/*************************************************************/
+#/* Get the PIDs logged in a session, sorted, each a tuple of */
+#/* the PID_ fields.                                          */
+#/*************************************************************/
+	def GetPids(self, SessionId):
+		Result = []
+		try:
+			with contextlib.closing(self.Connect()) as Connection:
+				Result = Connection.execute("SELECT PID, SAMPLE_COUNT, MINIMUM, MAXIMUM, MEAN FROM SESSION_PIDS WHERE SESSION_ID = ? ORDER BY PID", (SessionId, )).fetchall()
+		except Exception as Catch:
+			print(self.DatabaseFile + " : " + str(Catch))
+		return Result
+
+
+
+#/***********************************************************/
+#/* Get the trouble codes read in a session, sorted, each a */
+#/* tuple of the CODE_ fields.                              */
+#/***********************************************************/
+	def GetCodes(self, SessionId):
+		Result = []
+		try:
+			with contextlib.closing(self.Connect()) as Connection:
+				Result = Connection.execute("SELECT KIND, CODE, ECU FROM SESSION_CODES WHERE SESSION_ID = ? ORDER BY KIND, CODE, ECU", (SessionId, )).fetchall()
+		except Exception as Catch:
+			print(self.DatabaseFile + " : " + str(Catch))
+		return Result
+
+
+
+#/**************************************************************/
+#/* Get the freeze frame values read in a session, in order of */
+#/* freeze frame and PID, each a tuple of the FREEZE_ fields.  */
+#/**************************************************************/
+	def GetFreezeFrames(self, SessionId):
+		Result = []
+		try:
+			with contextlib.closing(self.Connect()) as Connection:
+				Result = Connection.execute("SELECT FREEZE_INDEX, TIME, PID, DESCRIPTION, VALUE FROM SESSION_FREEZE_FRAMES WHERE SESSION_ID = ? ORDER BY FREEZE_INDEX, PID", (SessionId, )).fetchall()
+		except Exception as Catch:
+			print(self.DatabaseFile + " : " + str(Catch))
+		return Result
@@ -0,0 +1,238 @@
+#!/usr/bin/python3
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#/***************************************************************************/
+#/* Raspberry Pi ELM327 OBBII CAN BUS Diagnostic Software.                  */
+#/*                                                                         */
+#/* (C) Jason Birch 2018-05-15 V1.04                                        */
+#/*                                                                         */
+#/* Class: SessionExport                                                    */
+#/* Export a session log as CSV or as NumPy .npz arrays. The CSV has a row  */
+#/* for each step of a chosen timebase, and a column for each PID holding   */
+#/* its last value read by then. The .npz holds the times and values of     */
+#/* each PID as read, and is written without needing NumPy. Both are        */
+#/* written a chunk of the log at a time, so the memory used does not grow  */
+#/* with the length of the log, and a long log can be exported on the Pi.   */
+#/*                                                                         */
+#/* Usage: ./SessionExport.py LOG_FILE [--format csv|npz]                   */
+#/*                           [--timebase SECONDS] [--pid PID]...           */
+#/*                           [--output FILE]                               */
+#/***************************************************************************/
+
+
+
+import os
+import sys
+import csv
+import array
+import bisect
+import zipfile
+import argparse
+import SessionLogReader
+
+
+
+# Seconds between rows of a CSV export.
+EXPORT_TIMEBASE = 1.0
+# Export formats.
+FORMAT_CSV = "csv"
+FORMAT_NPZ = "npz"
+FORMATS = [ FORMAT_CSV, FORMAT_NPZ ]
+
+# NumPy .npy array file magic and version 1.0, and the type of the times and values arrays.
+NPY_MAGIC = b'\x93NUMPY\x01\x00'
+NPY_TIME_TYPE = "<f8"
+NPY_VALUE_TYPE = "<f4"
+# An .npy header is padded to a multiple of this many bytes.
+NPY_ALIGNMENT = 64
+
+
+
+#/***************************************************/
+#/* Get a CSV timebase from text, in seconds, which */
+#/* must be above zero.                             */
+#/***************************************************/
+def ParseTimebase(Text):
+	Result = float(Text)
+	if Result <= 0:
+		raise ValueError("EXPORT TIMEBASE MUST BE ABOVE ZERO: " + Text)
+	return Result
+
+
+
+class SessionExport:
+	def __init__(self, FileName):
+		self.InitResult = ""
+		self.Reader = SessionLogReader.SessionLogReader(FileName)
+		self.InitResult += self.Reader.GetInitResult()
+
+
+
+#/*************************************************/
+#/* Get any errors or warnings which occured      */
+#/* during creation of an instance of this class. */
+#/*************************************************/
+	def GetInitResult(self):
+		return self.InitResult
+
+
+
+#/*********************************/
+#/* Release the session log file. */
+#/*********************************/
+	def Close(self):
+		self.Reader.Close()
+
+
+
+#/************************************************************/
+#/* Export the log as CSV, a row for each timebase step from */
+#/* the first value to the last, and a column for each PID,  */
+#/* or those given. Each column holds the last value of the  */
+#/* PID read at or before the time of the row, empty before  */
+#/* the first. Return the number of rows written. The        */
+#/* timebase must be above zero.                             */
+#/************************************************************/
+	def ExportCsv(self, OutputFile, Timebase = EXPORT_TIMEBASE, Pids = None):
+		if Timebase <= 0:
+			raise ValueError("EXPORT TIMEBASE MUST BE ABOVE ZERO: " + str(Timebase))
+		RowCount = 0
+		if Pids == None:
+			Pids = self.Reader.GetPids()
+		TimeRange = self.Reader.GetTimeRange()
+		with open(OutputFile, "w", newline = "") as ThisFile:
+			Writer = csv.writer(ThisFile)
+			Writer.writerow([ "TIME", "ELAPSED" ] + Pids)
+			if TimeRange != None:
+				StartTime = self.Reader.GetStartTime()
+				# Each PID is read a chunk at a time, as the rows reach it.
+				Cursors = [ self.GetCursor(PID) for PID in Pids ]
+				Row = 0
+				ThisTime = TimeRange[0]
+				while ThisTime <= TimeRange[1]:
+					Writer.writerow([ "{:.3f}".format(ThisTime), "{:.3f}".format(ThisTime - StartTime) ] + [ self.GetCursorValue(Cursor, ThisTime) for Cursor in Cursors ])
+					Row += 1
+					# Work out each row time from the first, so rounding errors don't add up.
+					ThisTime = TimeRange[0] + Row * Timebase
+				RowCount = Row
+		return RowCount
+
+
+
+#/**************************************************************/
+#/* Get a cursor reading through the values of a PID in time   */
+#/* order, a chunk at a time: the chunks still to read, the    */
+#/* times and values of the current chunk, the position in it, */
+#/* and the last value passed.                                 */
+#/**************************************************************/
+	def GetCursor(self, PID):
+		return { "Chunks" : self.Reader.GetData(PID), "Times" : [], "Values" : [], "Index" : 0, "Value" : "" }
+
+
+
+#/**************************************************************/
+#/* Move a cursor on to a time, reading more chunks as needed, */
+#/* and get the last value at or before it as CSV text.        */
+#/**************************************************************/
+	def GetCursorValue(self, Cursor, ThisTime):
+		while True:
+			Times = Cursor["Times"]
+			if Cursor["Index"] < len(Times) and Times[Cursor["Index"]] <= ThisTime:
+				Cursor["Index"] = bisect.bisect_right(Times, ThisTime, Cursor["Index"])
+				Cursor["Value"] = "{:.7g}".format(Cursor["Values"][Cursor["Index"] - 1])
+			if Cursor["Index"] < len(Times):
+				break
+			# The current chunk is used up, move on to the next.
+			NextChunk = next(Cursor["Chunks"], None)
+			if NextChunk == None:
+				break
+			Cursor["Times"] = NextChunk[0].tolist()
+			Cursor["Values"] = NextChunk[1].tolist()
+			Cursor["Index"] = 0
+		return Cursor["Value"]
+
+
+
+#/***********************************************************/
+#/* Export the log as a NumPy .npz file, with a times array */
+#/* and a values array for each PID, or those given, named  */
+#/* PID_time and PID_value. Each array is streamed into the */
+#/* file a chunk at a time. Return the number of arrays.    */
+#/***********************************************************/
+	def ExportNpz(self, OutputFile, Pids = None):
+		ArrayCount = 0
+		if Pids == None:
+			Pids = self.Reader.GetPids()
+		with zipfile.ZipFile(OutputFile, "w", zipfile.ZIP_STORED, allowZip64 = True) as ThisFile:
+			for PID in Pids:
+				Count = sum(Chunk[SessionLogReader.CHUNK_COUNT] for Chunk in self.Reader.GetChunks(PID))
+				for Name, Type, Field in ((PID + "_time.npy", NPY_TIME_TYPE, 0), (PID + "_value.npy", NPY_VALUE_TYPE, 1)):
+					with ThisFile.open(Name, "w", force_zip64 = True) as ThisArray:
+						ThisArray.write(self.GetNpyHeader(Type, Count))
+						for ChunkData in self.Reader.GetData(PID):
+							Data = ChunkData[Field]
+							# .npy arrays are written little endian, as the log is.
+							if sys.byteorder != "little":
+								Data = array.array(Data.typecode, Data)
+								Data.byteswap()
+							ThisArray.write(Data)
+					ArrayCount += 1
+		return ArrayCount
+
+
+
+#/************************************************************/
+#/* Get the header of an .npy file holding a one dimensional */
+#/* array of the given type and length.                      */
+#/************************************************************/
+	def GetNpyHeader(self, Type, Count):
+		Header = "{'descr': '" + Type + "', 'fortran_order': False, 'shape': (" + str(Count) + ",), }"
+		# The magic, header length, header and new line end on an alignment boundary.
+		Length = len(NPY_MAGIC) + 2 + len(Header) + 1
+		Header += " " * (-Length % NPY_ALIGNMENT) + "\n"
+		return NPY_MAGIC + len(Header).to_bytes(2, "little") + Header.encode("latin1")
+
+
+
+#/***********************************************/
+#/* Export a session log from the command line. */
+#/***********************************************/
+def Main():
+	Parser = argparse.ArgumentParser(description = "Export a session log as CSV or NumPy .npz arrays.")
+	Parser.add_argument("log", help = "Session log file to export.")
+	Parser.add_argument("--format", choices = FORMATS, default = FORMAT_CSV, help = "Export format.")
+	Parser.add_argument("--timebase", type = ParseTimebase, default = EXPORT_TIMEBASE, help = "Seconds between CSV rows.")
+	Parser.add_argument("--pid", action = "append", default = None, help = "PID to export, repeat for more, all when not given.")
+	Parser.add_argument("--output", default = None, help = "File to export to, the log file name with the format extension when not given.")
+	Arguments = Parser.parse_args()
+
+	Output = Arguments.output
+	if Output == None:
+		Output = os.path.splitext(Arguments.log)[0] + "." + Arguments.format
+	ThisExport = SessionExport(Arguments.log)
+	if ThisExport.GetInitResult() != "":
+		print(ThisExport.GetInitResult(), end = "")
+		return 1
+	if Arguments.format == FORMAT_CSV:
+		print(str(ThisExport.ExportCsv(Output, Arguments.timebase, Arguments.pid)) + " rows exported to " + Output)
+	else:
+		print(str(ThisExport.ExportNpz(Output, Arguments.pid)) + " arrays exported to " + Output)
+	ThisExport.Close()
+	return 0
+
+
+
+if __name__ == "__main__":
+	sys.exit(Main())
@@ -0,0 +1,580 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#/***************************************************************************/
+#/* Raspberry Pi ELM327 OBBII CAN BUS Diagnostic Software.                  */
+#/*                                                                         */
+#/* (C) Jason Birch 2018-05-15 V1.04                                        */
+#/*                                                                         */
+#/* Class: SessionLog                                                       */
+#/* Log every PID value read during a session to a binary file, which is    */
+#/* only ever appended to. Values are collected for each PID and written    */
+#/* as chunks, each holding an array of timestamps and an array of values   */
+#/* of one PID. Chunks are batched into large writes, so logging at the     */
+#/* full polling rate does not hold up reading the ECU. Read the file with  */
+#/* the SessionLogReader class.                                             */
+#/*                                                                         */
+#/* Each write is a block with a CRC32 of the chunks in it, made by its own */
+#/* thread, which syncs the file to the SD card after each write, so a slow */
+#/* card never holds up the polling. When the power is cut with the engine, */
+#/* at most the last flush period of samples is lost, and a block cut short */
+#/* is found by its CRC, so the log is read up to the last whole block.     */
+#/*                                                                         */
+#/* Chunks are delta encoded, each timestamp and value stored as a varint   */
+#/* of the difference from the one before, which is lossless and takes a    */
+#/* byte or two for PIDs which change slowly. Optionally, samples within    */
+#/* the display resolution of a PID of those kept can be dropped, using a   */
+#/* deadband or swinging door, so a PID which barely changes, such as the   */
+#/* coolant temperature, is logged with a few samples a minute.             */
+#/***************************************************************************/
+
+
+
+import os
+import sys
+import math
+import time
+import array
+import zlib
+import struct
+import _thread
+import itertools
+
+
+
+# Identifies a session log file, and its format version. Version 2 files hold the chunks in blocks.
+LOG_MAGIC = b'PIOBDLG2'
+# Version 1 files hold the chunks alone, and are still read.
+LOG_MAGIC_CHUNKS = b'PIOBDLG1'
+# File header: magic and session start time.
+LOG_HEADER = struct.Struct("<8sd")
+# Identifies the start of each chunk.
+CHUNK_MAGIC = b'CK'
+# Chunk header: magic, encoding, PID, sample count, first and last sample times, and payload byte count.
+# The header is a multiple of eight bytes, so the arrays following it are aligned.
+CHUNK_HEADER = struct.Struct("<2sBx8sIddI4x")
+# Chunks, and the arrays in them, start on eight byte boundaries.
+CHUNK_ALIGNMENT = 8
+# Identifies the start of each block.
+BLOCK_MAGIC = b'BLCK'
+# Block header: magic, payload byte count, and CRC32 of the payload, the chunks written together.
+# The header is a multiple of eight bytes, so the chunks following it are aligned.
+BLOCK_HEADER = struct.Struct("<4sII4x")
+
+# Chunk encodings. Raw chunks are an array of float64 timestamps followed by an array of float32 values.
+ENCODING_RAW = 0
+# Delta chunks are the timestamps in whole microseconds, followed by the bit patterns of the float32 values,
+# each as a zig zag varint of the difference from the one before.
+ENCODING_DELTA = 1
+# Encoding of the chunks written.
+LOG_ENCODING = ENCODING_DELTA
+
+# Compression of the samples of each PID. Lossless keeps every sample, deadband drops samples within the
+# deviation of the last kept, and swinging door drops samples within the deviation of a line between those kept.
+COMPRESSION_LOSSLESS = "LOSSLESS"
+COMPRESSION_DEADBAND = "DEADBAND"
+COMPRESSION_SWINGING_DOOR = "SWINGING_DOOR"
+COMPRESSIONS = [ COMPRESSION_LOSSLESS, COMPRESSION_DEADBAND, COMPRESSION_SWINGING_DOOR ]
+# Deviation allowed from the samples kept, as a fraction of the resolution of the PID, so the value displayed is not changed.
+COMPRESSION_DEVIATION = 0.5
+# Longest seconds between samples kept of a PID, so a PID which doesn't change is still seen to be logged.
+COMPRESSION_MAX_PERIOD = 60.0
+
+# Samples collected for a PID before they are made into a chunk.
+CHUNK_SAMPLES = 256
+# Default bytes of chunks collected before they are written to the file as a block.
+WRITE_BATCH = 65536
+# Default seconds between writes, chunks are made of the samples collected so far when due.
+FLUSH_PERIOD = 5.0
+# Seconds between checks the blocks have been written, when waiting for them.
+FLUSH_WAIT = 0.01
+
+
+
+#/**************************************************************/
+#/* Add numbers to a byte array as zig zag varints, seven bits */
+#/* a byte, low bits first, with the top bit set on all but    */
+#/* the last byte. Zig zag keeps small negative numbers short. */
+#/**************************************************************/
+def EncodeVarints(Numbers, Data):
+	for Number in Numbers:
+		if Number >= 0:
+			Number = Number << 1
+		else:
+			Number = (~Number << 1) | 1
+		while Number > 0x7F:
+			Data.append((Number & 0x7F) | 0x80)
+			Number >>= 7
+		Data.append(Number)
+
+
+
+#/**********************************************/
+#/* Read every zig zag varint in a byte array. */
+#/**********************************************/
+def DecodeVarints(Data):
+	Numbers = []
+	Number = 0
+	Shift = 0
+	for Byte in Data:
+		if Byte < 0x80:
+			Number |= Byte << Shift
+			Numbers.append((Number >> 1) ^ -(Number & 1))
+			Number = 0
+			Shift = 0
+		else:
+			Number |= (Byte & 0x7F) << Shift
+			Shift += 7
+	return Numbers
+
+
+
+#/************************************************************/
+#/* Delta encode the payload of a chunk, from the timestamps */
+#/* in whole microseconds and the values as float32 arrays.  */
+#/* The float32 bit patterns are used as integers, so values */
+#/* are kept exactly.                                        */
+#/************************************************************/
+def EncodeDelta(Micros, Values):
+	Bits = array.array('i', Values.tobytes())
+	Data = bytearray()
+	EncodeVarints([ Micro - Last for Micro, Last in zip(Micros, [ 0 ] + Micros) ], Data)
+	EncodeVarints([ Bit - Last for Bit, Last in zip(Bits, [ 0 ] + Bits.tolist()) ], Data)
+	return Data
+
+
+
+#/***********************************************************/
+#/* Decode the payload of a delta chunk, into float64 and   */
+#/* float32 arrays of the timestamps and values. Padding at */
+#/* the end of the payload decodes as zeros after them.     */
+#/***********************************************************/
+def DecodeDelta(Data, Count):
+	Numbers = DecodeVarints(Data)
+	Micros = Numbers[:Count]
+	Bits = Numbers[Count:2 * Count]
+	Times = array.array('d', [ Micro / 1000000 for Micro in itertools.accumulate(Micros) ])
+	Values = array.array('f', array.array('i', itertools.accumulate(Bits)).tobytes())
+	return (Times, Values)
+
+
+
+class SessionLog:
+	def __init__(self):
+		self.File = None
+		self.FileName = ""
+		self.Compression = COMPRESSION_LOSSLESS
+		self.FlushPeriod = FLUSH_PERIOD
+		self.WriteBatch = WRITE_BATCH
+		self.Lock = _thread.allocate_lock()
+		# Released to wake the writer thread when there are blocks to write, held while there are none.
+		self.WriteSignal = _thread.allocate_lock()
+		self.WriteSignal.acquire()
+		# Held while the writer thread is running.
+		self.WriterRunning = _thread.allocate_lock()
+		self.Clear()
+
+
+
+#/**************************************************/
+#/* Forget the samples and chunks not yet written. */
+#/**************************************************/
+	def Clear(self):
+		# Timestamps and values collected for each PID, not yet made into a chunk.
+		self.Samples = {}
+		# Compression state of each PID, the last sample kept, the last sample read, and the swinging door slopes.
+		self.Filters = {}
+		# Chunks not yet made into a block.
+		self.WriteBuffer = bytearray()
+		# Blocks waiting for the writer thread, and the counts queued and written.
+		self.Blocks = []
+		self.QueuedBlocks = 0
+		self.WrittenBlocks = 0
+		self.Closing = False
+		self.LastFlushTime = time.time()
+		self.SampleCount = 0
+
+
+
+#/*************************************************************/
+#/* Start logging to a new file, ending any log already open, */
+#/* and start the writer thread for it. Return False when the */
+#/* file can't be created.                                    */
+#/*************************************************************/
+	def Open(self, FileName, StartTime = None):
+		Result = True
+		self.Close()
+		if StartTime == None:
+			StartTime = time.time()
+		with self.Lock:
+			try:
+				if os.path.dirname(FileName) != "":
+					os.makedirs(os.path.dirname(FileName), exist_ok = True)
+				self.File = open(FileName, "wb")
+				self.File.write(LOG_HEADER.pack(LOG_MAGIC, StartTime))
+				self.FileName = FileName
+				self.Clear()
+				self.WriterRunning.acquire()
+				_thread.start_new_thread(self.Writer, (self.File, FileName))
+			except Exception as Catch:
+				print(FileName + " : " + str(Catch))
+				self.File = None
+				Result = False
+		return Result
+
+
+
+#/*************************************************************/
+#/* Write everything collected, wait for the writer thread to */
+#/* finish, and close the file.                               */
+#/*************************************************************/
+	def Close(self):
+		with self.Lock:
+			if self.File != None:
+				try:
+					self.KeepPending()
+					self.MakeChunks(True)
+					self.QueueBlock()
+				except Exception as Catch:
+					print(self.FileName + " : " + str(Catch))
+				self.Closing = True
+				self.SignalWriter()
+		# The writer thread ends once it has written the blocks queued.
+		with self.WriterRunning:
+			pass
+		with self.Lock:
+			if self.File != None:
+				try:
+					self.File.close()
+				except Exception as Catch:
+					print(self.FileName + " : " + str(Catch))
+				self.File = None
+				self.Clear()
+
+
+
+#/***********************************************/
+#/* Check if a log file is open for logging to. */
+#/***********************************************/
+	def IsOpen(self):
+		return self.File != None
+
+
+
+#/*********************************/
+#/* Get the name of the log file. */
+#/*********************************/
+	def GetFileName(self):
+		return self.FileName
+
+
+
+#/*************************************************/
+#/* Get the count of samples logged since opened. */
+#/*************************************************/
+	def GetSampleCount(self):
+		return self.SampleCount
+
+
+
+#/**********************************************************/
+#/* Set the compression of the samples of each PID, one of */
+#/* the COMPRESSIONS. Return False when it is not known.   */
+#/**********************************************************/
+	def SetCompression(self, Compression):
+		Result = Compression in COMPRESSIONS
+		if Result == True:
+			with self.Lock:
+				self.KeepPending()
+				self.Compression = Compression
+		else:
+			print("UNKNOWN LOG COMPRESSION: " + str(Compression))
+		return Result
+
+
+
+#/***************************************/
+#/* Get the compression of PID samples. */
+#/***************************************/
+	def GetCompression(self):
+		return self.Compression
+
+
+
+#/*************************************************************/
+#/* Set the longest seconds samples are held before they are  */
+#/* written, and the bytes of chunks written together, as one */
+#/* block. Return False when either is not above zero.        */
+#/*************************************************************/
+	def SetFlush(self, FlushPeriod, WriteBatch):
+		Result = True
+		try:
+			FlushPeriod = float(FlushPeriod)
+			WriteBatch = int(WriteBatch)
+			if FlushPeriod <= 0 or WriteBatch <= 0:
+				raise ValueError(str(FlushPeriod) + ", " + str(WriteBatch))
+			with self.Lock:
+				self.FlushPeriod = FlushPeriod
+				self.WriteBatch = WriteBatch
+		except Exception as Catch:
+			print("INVALID LOG FLUSH PERIOD OR WRITE BATCH: " + str(Catch))
+			Result = False
+		return Result
+
+
+
+#/************************************************************/
+#/* Get the longest seconds samples are held before written. */
+#/************************************************************/
+	def GetFlushPeriod(self):
+		return self.FlushPeriod
+
+
+
+#/*********************************************/
+#/* Get the bytes of chunks written together. */
+#/*********************************************/
+	def GetWriteBatch(self):
+		return self.WriteBatch
+
+
+
+#/************************************************************/
+#/* Log a value of a PID, with the resolution the PID is     */
+#/* displayed at, for compression. Every value of a PID with */
+#/* no resolution is kept. A PID with enough samples kept is */
+#/* made into a chunk, and the chunks are passed to the      */
+#/* writer thread when enough are collected.                 */
+#/************************************************************/
+	def Add(self, PID, Value, ThisTime = None, Resolution = None):
+		if ThisTime == None:
+			ThisTime = time.time()
+		with self.Lock:
+			if self.File != None:
+				if self.Compression == COMPRESSION_LOSSLESS or Resolution == None or Resolution <= 0:
+					self.AddSample(PID, ThisTime, Value)
+				else:
+					self.Filter(PID, ThisTime, Value, Resolution * COMPRESSION_DEVIATION)
+				self.SampleCount += 1
+				if len(self.WriteBuffer) >= self.WriteBatch:
+					self.QueueBlock()
+
+
+
+#/**************************************************************/
+#/* Write everything collected to the file now, such as before */
+#/* the log is read, and wait for the writer thread to do so.  */
+#/**************************************************************/
+	def Flush(self):
+		with self.Lock:
+			QueuedBlocks = self.QueuedBlocks
+			if self.File != None:
+				self.KeepPending()
+				self.MakeChunks(True)
+				self.QueueBlock()
+				QueuedBlocks = self.QueuedBlocks
+		while self.WrittenBlocks < QueuedBlocks and self.WriterRunning.locked() == True:
+			time.sleep(FLUSH_WAIT)
+
+
+
+#/**************************************************************/
+#/* Collect a sample of a PID, making the samples into a chunk */
+#/* when there are enough.                                     */
+#/**************************************************************/
+	def AddSample(self, PID, ThisTime, Value):
+		if PID not in self.Samples:
+			self.Samples[PID] = (array.array('d'), array.array('f'))
+		Times, Values = self.Samples[PID]
+		Times.append(ThisTime)
+		Values.append(Value)
+		if len(Times) >= CHUNK_SAMPLES:
+			self.AddChunk(PID)
+
+
+
+#/***********************************************************/
+#/* Keep a sample of a PID, and start comparing the samples */
+#/* after it against it.                                    */
+#/***********************************************************/
+	def KeepSample(self, PID, ThisTime, Value):
+		self.AddSample(PID, ThisTime, Value)
+		self.Filters[PID] = { "KeptTime" : ThisTime, "KeptValue" : Value, "LastTime" : ThisTime, "LastValue" : Value, "Pending" : False, "Upper" : math.inf, "Lower" : -math.inf }
+
+
+
+#/*************************************************************/
+#/* Keep the last sample read of each PID, where it was not   */
+#/* kept, so the log ends with the latest value of every PID. */
+#/*************************************************************/
+	def KeepPending(self):
+		for PID, State in list(self.Filters.items()):
+			if State["Pending"] == True:
+				self.KeepSample(PID, State["LastTime"], State["LastValue"])
+
+
+
+#/*************************************************************/
+#/* Compress the samples of a PID, keeping a sample only when */
+#/* those read since the last kept can't be drawn from the    */
+#/* samples kept within the deviation. A deadband keeps a     */
+#/* sample further than the deviation from the last kept, and */
+#/* the last sample before it, so the value is seen to hold   */
+#/* until the change. A swinging door keeps the sample before */
+#/* one when the line from the last kept to it doesn't pass   */
+#/* within the deviation of every sample between. The slopes  */
+#/* of the lines passing within the deviation of the samples  */
+#/* read are kept, the doors, so each sample is checked once. */
+#/*************************************************************/
+	def Filter(self, PID, ThisTime, Value, Deviation):
+		State = self.Filters.get(PID)
+		if State == None or ThisTime <= State["LastTime"]:
+			Keep = True
+		elif self.Compression == COMPRESSION_DEADBAND:
+			Keep = abs(Value - State["KeptValue"]) > Deviation
+			if Keep == True and State["Pending"] == True:
+				self.KeepSample(PID, State["LastTime"], State["LastValue"])
+		else:
+			Keep = False
+			Period = ThisTime - State["KeptTime"]
+			Slope = (Value - State["KeptValue"]) / Period
+			if Slope < State["Lower"] or Slope > State["Upper"]:
+				# The line to this sample is outside the doors, keep the sample before this, and open them again from there.
+				self.KeepSample(PID, State["LastTime"], State["LastValue"])
+				State = self.Filters[PID]
+				Period = ThisTime - State["KeptTime"]
+			State["Upper"] = min(State["Upper"], (Value + Deviation - State["KeptValue"]) / Period)
+			State["Lower"] = max(State["Lower"], (Value - Deviation - State["KeptValue"]) / Period)
+		if Keep == True or ThisTime - State["KeptTime"] >= COMPRESSION_MAX_PERIOD:
+			self.KeepSample(PID, ThisTime, Value)
+		else:
+			State["Pending"] = True
+			State["LastTime"] = ThisTime
+			State["LastValue"] = Value
+
+
+
+#/***********************************************************/
+#/* Make the samples collected into chunks, only those PIDs */
+#/* with enough samples, or all of them.                    */
+#/***********************************************************/
+	def MakeChunks(self, All):
+		for PID in list(self.Samples):
+			if len(self.Samples[PID][0]) >= CHUNK_SAMPLES or (All == True and len(self.Samples[PID][0]) > 0):
+				self.AddChunk(PID)
+
+
+
+#/***************************************************************/
+#/* Make the samples collected for a PID into a chunk, ready to */
+#/* be written.                                                 */
+#/***************************************************************/
+	def AddChunk(self, PID):
+		Times, Values = self.Samples.pop(PID)
+		if LOG_ENCODING == ENCODING_DELTA:
+			Micros = [ round(ThisTime * 1000000) for ThisTime in Times ]
+			# The chunk times are those read back, to the microsecond.
+			FirstTime = Micros[0] / 1000000
+			LastTime = Micros[-1] / 1000000
+			Payload = EncodeDelta(Micros, Values)
+		else:
+			FirstTime = Times[0]
+			LastTime = Times[-1]
+			# Log files are little endian, as the Raspberry Pi is.
+			if sys.byteorder != "little":
+				Times.byteswap()
+				Values.byteswap()
+			Payload = Times.tobytes() + Values.tobytes()
+		Payload += bytes(-len(Payload) % CHUNK_ALIGNMENT)
+		self.WriteBuffer += CHUNK_HEADER.pack(CHUNK_MAGIC, LOG_ENCODING, PID.encode(), len(Times), FirstTime, LastTime, len(Payload))
+		self.WriteBuffer += Payload
+
+
+
+#/***************************************************************/
+#/* Pass the chunks collected to the writer thread, as a block. */
+#/***************************************************************/
+	def QueueBlock(self):
+		if len(self.WriteBuffer) > 0:
+			self.Blocks.append(self.WriteBuffer)
+			self.WriteBuffer = bytearray()
+			self.QueuedBlocks += 1
+			self.SignalWriter()
+
+
+
+#/*********************************************************/
+#/* Wake the writer thread, if it isn't already woken. It */
+#/* is only woken while the lock is held.                 */
+#/*********************************************************/
+	def SignalWriter(self):
+		if self.WriteSignal.locked() == True:
+			self.WriteSignal.release()
+
+
+
+#/*************************************************************/
+#/* The writer thread. Write the blocks queued, and make the  */
+#/* samples collected into a block when a flush is due, until */
+#/* the log is closed. The lock is only held to take blocks,  */
+#/* never while writing, so logging carries on while the file */
+#/* is synced to a slow SD card.                              */
+#/*************************************************************/
+	def Writer(self, File, FileName):
+		try:
+			Running = True
+			while Running == True:
+				self.WriteSignal.acquire(timeout = max(0, self.LastFlushTime + self.FlushPeriod - time.time()))
+				with self.Lock:
+					if time.time() - self.LastFlushTime >= self.FlushPeriod:
+						self.MakeChunks(True)
+						self.QueueBlock()
+						self.LastFlushTime = time.time()
+					Blocks = self.Blocks
+					self.Blocks = []
+					Running = self.Closing == False
+				if len(Blocks) > 0:
+					self.WriteBlocks(File, FileName, Blocks)
+					with self.Lock:
+						self.WrittenBlocks += len(Blocks)
+		except Exception as Catch:
+			print(FileName + " : " + str(Catch))
+		self.WriterRunning.release()
+
+
+
+#/**************************************************************/
+#/* Write blocks to the file, each with its CRC32, and sync    */
+#/* the file to the card. A block which fails to be written is */
+#/* cut from the file, so the blocks after it can still be     */
+#/* read.                                                      */
+#/**************************************************************/
+	def WriteBlocks(self, File, FileName, Blocks):
+		for Block in Blocks:
+			Offset = File.tell()
+			try:
+				File.write(BLOCK_HEADER.pack(BLOCK_MAGIC, len(Block), zlib.crc32(Block)))
+				File.write(Block)
+			except Exception as Catch:
+				print(FileName + " : " + str(Catch))
+				try:
+					File.seek(Offset)
+					File.truncate()
+				except Exception as Catch:
+					print(FileName + " : " + str(Catch))
+		try:
+			# Pass the blocks on to the file, so the log can be read while it is being written, and onto the card.
+			File.flush()
+			os.fsync(File.fileno())
+		except Exception as Catch:
+			print(FileName + " : " + str(Catch))
@@ -0,0 +1,311 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#/***************************************************************************/
+#/* Raspberry Pi ELM327 OBBII CAN BUS Diagnostic Software.                  */
+#/*                                                                         */
+#/* (C) Jason Birch 2018-05-15 V1.04                                        */
+#/*                                                                         */
+#/* Class: SessionLogReader                                                 */
+#/* Read a session log file written by the SessionLog class. The file is    */
+#/* memory mapped, and the chunk headers are read once to index the chunks  */
+#/* of each PID. The timestamps and values of a raw chunk are then used in  */
+#/* place, as arrays viewing the mapped file, without being copied, and     */
+#/* those of a delta chunk decoded only when the chunk is read. The         */
+#/* chunk index is kept in time order, so the chunks of a time window are   */
+#/* found by binary search, and a log still being written can be read       */
+#/* again to index only the chunks added since.                             */
+#/*                                                                         */
+#/* The chunks are indexed a block at a time, and only from blocks which    */
+#/* are whole and match their CRC32, so a log cut short by a power loss is  */
+#/* read up to the last block written, and can be cut back to it.           */
+#/***************************************************************************/
+
+
+
+import os
+import sys
+import zlib
+import mmap
+import array
+import bisect
+import SessionLog
+
+
+
+# Chunk index fields.
+CHUNK_FIRST_TIME = 0
+CHUNK_LAST_TIME = 1
+CHUNK_OFFSET = 2
+CHUNK_COUNT = 3
+CHUNK_ENCODING = 4
+CHUNK_LENGTH = 5
+
+
+
+class SessionLogReader:
+	def __init__(self, FileName):
+		self.InitResult = ""
+		self.FileName = FileName
+		self.Data = None
+		self.StartTime = 0
+		# Chunks of each PID, in the order written.
+		self.Chunks = {}
+		# Last sample time of each chunk of each PID, to find chunks by time.
+		self.LastTimes = {}
+		# File offset of the first block, or chunk of a version 1 log, not yet indexed.
+		self.IndexOffset = SessionLog.LOG_HEADER.size
+		# Version 1 logs hold chunks which are not in blocks.
+		self.Blocks = True
+
+		try:
+			with open(FileName, "rb") as ThisFile:
+				self.Data = mmap.mmap(ThisFile.fileno(), 0, access = mmap.ACCESS_READ)
+			Magic, self.StartTime = SessionLog.LOG_HEADER.unpack_from(self.Data, 0)
+			if Magic == SessionLog.LOG_MAGIC_CHUNKS:
+				self.Blocks = False
+			elif Magic != SessionLog.LOG_MAGIC:
+				raise ValueError("NOT A SESSION LOG FILE")
+			self.IndexChunks()
+		except Exception as Catch:
+			print(FileName + " : " + str(Catch))
+			self.InitResult += "FAILED TO READ FILE: " + FileName + "\n"
+			self.Close()
+
+
+
+#/*************************************************/
+#/* Get any errors or warnings which occured      */
+#/* during creation of an instance of this class. */
+#/*************************************************/
+	def GetInitResult(self):
+		return self.InitResult
+
+
+
+#/**************************************************************/
+#/* Index the chunks of each block, checking each block is     */
+#/* whole and matches its CRC32. Reading stops at a block      */
+#/* which is not, such as the end of a log still being written */
+#/* or cut short by a power loss.                              */
+#/**************************************************************/
+	def IndexChunks(self):
+		if self.Blocks == True:
+			Offset = self.IndexOffset
+			while Offset + SessionLog.BLOCK_HEADER.size <= len(self.Data):
+				Magic, PayloadLength, Crc = SessionLog.BLOCK_HEADER.unpack_from(self.Data, Offset)
+				Start = Offset + SessionLog.BLOCK_HEADER.size
+				if Magic != SessionLog.BLOCK_MAGIC or Start + PayloadLength > len(self.Data):
+					break
+				with memoryview(self.Data) as View:
+					if zlib.crc32(View[Start:Start + PayloadLength]) != Crc:
+						break
+				self.IndexBlockChunks(Start, Start + PayloadLength)
+				Offset = Start + PayloadLength
+			self.IndexOffset = Offset
+		else:
+			self.IndexOffset = self.IndexBlockChunks(self.IndexOffset, len(self.Data))
+
+
+
+#/**************************************************************/
+#/* Read the header of each chunk between two file offsets, to */
+#/* index the chunks of each PID. Reading stops at a chunk     */
+#/* which is not complete. Return the offset reading stopped.  */
+#/**************************************************************/
+	def IndexBlockChunks(self, Offset, End):
+		while Offset + SessionLog.CHUNK_HEADER.size <= End:
+			Magic, Encoding, PID, Count, FirstTime, LastTime, PayloadLength = SessionLog.CHUNK_HEADER.unpack_from(self.Data, Offset)
+			if Magic != SessionLog.CHUNK_MAGIC or Offset + SessionLog.CHUNK_HEADER.size + PayloadLength > End:
+				break
+			PID = str(PID.rstrip(b'\0'), 'utf-8')
+			self.Chunks.setdefault(PID, []).append((FirstTime, LastTime, Offset + SessionLog.CHUNK_HEADER.size, Count, Encoding, PayloadLength))
+			self.LastTimes.setdefault(PID, []).append(LastTime)
+			Offset += SessionLog.CHUNK_HEADER.size + PayloadLength
+		return Offset
+
+
+
+#/*************************************************************/
+#/* Map the file again when a log still being written has     */
+#/* grown, and index the chunks added since it was last read. */
+#/* Return True when there are new chunks.                    */
+#/*************************************************************/
+	def Refresh(self):
+		Result = False
+		if self.Data != None:
+			try:
+				if os.path.getsize(self.FileName) > len(self.Data):
+					with open(self.FileName, "rb") as ThisFile:
+						Data = mmap.mmap(ThisFile.fileno(), 0, access = mmap.ACCESS_READ)
+					self.Close()
+					self.Data = Data
+					IndexOffset = self.IndexOffset
+					self.IndexChunks()
+					Result = self.IndexOffset != IndexOffset
+			except Exception as Catch:
+				print(self.FileName + " : " + str(Catch))
+		return Result
+
+
+
+#/************************************************************/
+#/* Get the byte count of the log read, up to the end of the */
+#/* last whole block.                                        */
+#/************************************************************/
+	def GetLength(self):
+		return self.IndexOffset
+
+
+
+#/******************************************************/
+#/* Release the memory map of the file. Chunk data got */
+#/* from the file must not be used after this.         */
+#/******************************************************/
+	def Close(self):
+		if self.Data != None:
+			try:
+				self.Data.close()
+			except BufferError:
+				# Chunk data is still in use, the map is released when that is.
+				pass
+			self.Data = None
+
+
+
+#/******************************************************/
+#/* Get the time the session started, in seconds since */
+#/* the epoch.                                         */
+#/******************************************************/
+	def GetStartTime(self):
+		return self.StartTime
+
+
+
+#/**************************************/
+#/* Get the PIDs in the log, in order. */
+#/**************************************/
+	def GetPids(self):
+		return sorted(self.Chunks)
+
+
+
+#/***********************************************************/
+#/* Get the first and last sample times of the log, or None */
+#/* when it holds no samples.                               */
+#/***********************************************************/
+	def GetTimeRange(self):
+		Result = None
+		if len(self.Chunks) > 0:
+			FirstTime = min(Chunks[0][CHUNK_FIRST_TIME] for Chunks in self.Chunks.values())
+			LastTime = max(Chunks[-1][CHUNK_LAST_TIME] for Chunks in self.Chunks.values())
+			Result = (FirstTime, LastTime)
+		return Result
+
+
+
+#/************************************************************/
+#/* Get the index of each chunk of a PID, the first and last */
+#/* sample times, file offset, sample count, encoding and    */
+#/* payload byte count.                                      */
+#/************************************************************/
+	def GetChunks(self, PID):
+		return self.Chunks.get(PID, [])
+
+
+
+#/**************************************************************/
+#/* Get the index of the chunks of a PID holding samples       */
+#/* between two times, or all, found by binary search over the */
+#/* last sample time of each chunk.                            */
+#/**************************************************************/
+	def FindChunks(self, PID, StartTime = None, EndTime = None):
+		Chunks = self.GetChunks(PID)
+		First = 0
+		if StartTime != None:
+			First = bisect.bisect_left(self.LastTimes.get(PID, []), StartTime)
+		Last = First
+		while Last < len(Chunks) and (EndTime == None or Chunks[Last][CHUNK_FIRST_TIME] <= EndTime):
+			Last += 1
+		return Chunks[First:Last]
+
+
+
+#/**************************************************************/
+#/* Get the last sample time of a PID in the log, or None when */
+#/* there are no samples of the PID.                           */
+#/**************************************************************/
+	def GetLastTime(self, PID):
+		Result = None
+		if PID in self.LastTimes:
+			Result = self.LastTimes[PID][-1]
+		return Result
+
+
+
+#/*************************************************************/
+#/* Get the timestamps and values of a chunk, as arrays of    */
+#/* float64 and float32, viewing the mapped file in place for */
+#/* a raw chunk, or decoded from a delta chunk.               */
+#/*************************************************************/
+	def GetChunkData(self, Chunk):
+		Offset = Chunk[CHUNK_OFFSET]
+		Count = Chunk[CHUNK_COUNT]
+		if Chunk[CHUNK_ENCODING] == SessionLog.ENCODING_DELTA:
+			Times, Values = SessionLog.DecodeDelta(self.Data[Offset:Offset + Chunk[CHUNK_LENGTH]], Count)
+		elif Chunk[CHUNK_ENCODING] == SessionLog.ENCODING_RAW:
+			View = memoryview(self.Data)
+			Times = View[Offset:Offset + 8 * Count].cast('d')
+			Values = View[Offset + 8 * Count:Offset + 12 * Count].cast('f')
+			# Log files are little endian, copy and swap the data on a big endian machine.
+			if sys.byteorder != "little":
+				Times = array.array('d', Times.tobytes())
+				Values = array.array('f', Values.tobytes())
+				Times.byteswap()
+				Values.byteswap()
+		else:
+			raise ValueError("UNKNOWN CHUNK ENCODING: " + str(Chunk[CHUNK_ENCODING]))
+		return (Times, Values)
+
+
+
+#/**************************************************************/
+#/* Get the timestamps and values of a PID chunk by chunk, for */
+#/* the chunks holding samples between two times, or all.      */
+#/**************************************************************/
+	def GetData(self, PID, StartTime = None, EndTime = None):
+		for Chunk in self.FindChunks(PID, StartTime, EndTime):
+			yield self.GetChunkData(Chunk)
+
+
+
+#/*************************************************************/
+#/* Recover a session log cut short, such as by a power loss  */
+#/* while it was written, cutting the file back to the end of */
+#/* the last whole block. Return the byte count cut, or None  */
+#/* when the file can't be read.                              */
+#/*************************************************************/
+def Recover(FileName):
+	Result = None
+	ThisReader = SessionLogReader(FileName)
+	if ThisReader.GetInitResult() == "":
+		Length = ThisReader.GetLength()
+		ThisReader.Close()
+		try:
+			Result = os.path.getsize(FileName) - Length
+			if Result > 0:
+				os.truncate(FileName, Length)
+		except Exception as Catch:
+			print(FileName + " : " + str(Catch))
+			Result = None
+	return Result
@@ -0,0 +1,174 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#/***************************************************************************/
+#/* Raspberry Pi ELM327 OBBII CAN BUS Diagnostic Software.                  */
+#/*                                                                         */
+#/* (C) Jason Birch 2018-05-15 V1.04                                        */
+#/*                                                                         */
+#/* Class: Snapshot                                                         */
+#/* An unchangeable, timestamped set of PID values read from the ECU at one */
+#/* time, such as a freeze frame. One snapshot is shared by the display     */
+#/* tab, the PDF report and the logger, so all show the same values.        */
+#/***************************************************************************/
+
+
+
+import time
+
+
+
+# Value fields held for each PID.
+VALUE_PID = 0
+VALUE_DESCRIPTION = 1
+VALUE_DATA = 2
+
+
+
+class Snapshot:
+	def __init__(self, Name, FreezeIndex, Values, ThisTime = None, EndTime = None):
+		if ThisTime == None:
+			ThisTime = time.time()
+		if EndTime == None:
+			EndTime = ThisTime
+		# Values are held as tuples, so they can't be changed once taken.
+		ThisValues = ()
+		for PID, Description, Data in Values:
+			if type(Data) is list:
+				Data = tuple(Data)
+			ThisValues += ((PID, Description, Data),)
+		object.__setattr__(self, "Name", Name)
+		object.__setattr__(self, "FreezeIndex", FreezeIndex)
+		object.__setattr__(self, "Time", ThisTime)
+		object.__setattr__(self, "EndTime", EndTime)
+		object.__setattr__(self, "Values", ThisValues)
+		object.__setattr__(self, "Index", { Value[VALUE_PID] : Value for Value in ThisValues })
+
+
+
+#/******************************************/
+#/* Snapshots can't be changed once taken. */
+#/******************************************/
+	def __setattr__(self, Name, Value):
+		raise AttributeError("SNAPSHOT CAN NOT BE CHANGED")
+
+
+
+#/*******************************************/
+#/* Nor can any of their values be removed. */
+#/*******************************************/
+	def __delattr__(self, Name):
+		raise AttributeError("SNAPSHOT CAN NOT BE CHANGED")
+
+
+
+#/**********************************/
+#/* Get the name of this snapshot. */
+#/**********************************/
+	def GetName(self):
+		return self.Name
+
+
+
+#/***************************************************************/
+#/* Get the freeze frame this snapshot is of, -1 for live data. */
+#/***************************************************************/
+	def GetFreezeIndex(self):
+		return self.FreezeIndex
+
+
+
+#/**************************************************************/
+#/* Get the time this snapshot was taken, in seconds since the */
+#/* epoch.                                                     */
+#/**************************************************************/
+	def GetTime(self):
+		return self.Time
+
+
+
+#/*************************************************************/
+#/* Get the number of seconds taken to read all the values in */
+#/* this snapshot, the window the values were captured in.    */
+#/*************************************************************/
+	def GetWindow(self):
+		return self.EndTime - self.Time
+
+
+
+#/*********************************************************/
+#/* Get the PID, description and data of each PID, in the */
+#/* order they were read.                                 */
+#/*********************************************************/
+	def GetValues(self):
+		return self.Values
+
+
+
+#/********************************************/
+#/* Get the PIDs in this snapshot, in order. */
+#/********************************************/
+	def GetPids(self):
+		return tuple(Value[VALUE_PID] for Value in self.Values)
+
+
+
+#/*************************************************************/
+#/* Get the data of a PID in this snapshot, None if not held. */
+#/*************************************************************/
+	def GetData(self, PID):
+		Result = None
+		if PID in self.Index:
+			Result = self.Index[PID][VALUE_DATA]
+		return Result
+
+
+
+#/***************************************************/
+#/* Get the description of a PID, None if not held. */
+#/***************************************************/
+	def GetDescription(self, PID):
+		Result = None
+		if PID in self.Index:
+			Result = self.Index[PID][VALUE_DESCRIPTION]
+		return Result
+
+
+
+#/**************************************************************/
+#/* Get the snapshot as text lines, each description formatted */
+#/* with its data, as shown on a display tab.                  */
+#/**************************************************************/
+	def GetText(self):
+		Result = ""
+		for PID, Description, Data in self.Values:
+			ThisLine = "[" + PID + "] " + Description + "\n"
+			try:
+				Result += ThisLine.format(Data)
+			except:
+				Result += ThisLine
+		return Result.replace('\\n', '\n')
+
+
+
+#/***************************************************************/
+#/* Get the values in this snapshot which differ from another   */
+#/* snapshot, in order. PIDs not held in the other snapshot are */
+#/* included, as they have changed from nothing.                */
+#/***************************************************************/
+	def Diff(self, OtherSnapshot):
+		Result = ()
+		for Value in self.Values:
+			if OtherSnapshot.GetData(Value[VALUE_PID]) != Value[VALUE_DATA]:
+				Result += (Value,)
+		return Result
@@ -0,0 +1,250 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#/***************************************************************************/
+#/* Raspberry Pi ELM327 OBBII CAN BUS Diagnostic Software.                  */
+#/*                                                                         */
+#/* (C) Jason Birch 2018-05-15 V1.04                                        */
+#/*                                                                         */
+#/* Class: TroubleCodeIndex                                                 */
+#/* Trouble code descriptions, looked up in a compiled index of a trouble   */
+#/* code text file rather than a dictionary read from the text each start.  */
+#/* The index holds the sorted trouble codes, the offset of each            */
+#/* description, and the descriptions, and is memory mapped so only the     */
+#/* parts looked at are read. It is compiled again only when the text file  */
+#/* has changed. An index can lay over a base index, such as manufacturer   */
+#/* trouble codes over the ISO/SAE trouble codes, and codes not found fall  */
+#/* through to the base index.                                              */
+#/***************************************************************************/
+
+
+
+import os
+import mmap
+import struct
+
+
+
+# Identifies a compiled trouble code index file, and its format version.
+INDEX_MAGIC = b'PIOBDTC1'
+# Index file header: magic, text file modification time (ns) and size, trouble code count and trouble code width.
+INDEX_HEADER = struct.Struct("<8sQQII")
+# Description offsets, one more than the trouble code count, so each description ends where the next starts.
+INDEX_OFFSET = struct.Struct("<I")
+# File name extension of a compiled index, replacing that of the text file.
+INDEX_EXTENSION = ".idx"
+
+
+
+class TroubleCodeIndex:
+	def __init__(self, TextFile, Base = None):
+		self.InitResult = ""
+		self.TextFile = TextFile
+		self.IndexFile = os.path.splitext(TextFile)[0] + INDEX_EXTENSION
+		self.Base = Base
+		# Text file modification time and size the index was compiled from.
+		self.TextStamp = None
+		self.Data = b''
+		self.Count = 0
+		self.Width = 0
+		self.OffsetsStart = 0
+		self.DescriptionsStart = 0
+		self.Refresh()
+
+
+
+#/*************************************************/
+#/* Get any errors or warnings which occured      */
+#/* during creation of an instance of this class. */
+#/*************************************************/
+	def GetInitResult(self):
+		return self.InitResult
+
+
+
+#/**************************************************************/
+#/* Check the text file has not changed since the index was    */
+#/* opened, compiling the index again when it has, or when the */
+#/* compiled index is missing or from another text file.       */
+#/**************************************************************/
+	def Refresh(self):
+		self.InitResult = ""
+		try:
+			Stat = os.stat(self.TextFile)
+			TextStamp = (Stat.st_mtime_ns, Stat.st_size)
+		except Exception as Catch:
+			print(self.TextFile + " : " + str(Catch))
+			self.InitResult += "FAILED TO READ FILE: " + self.TextFile + "\n"
+			self.Close()
+			self.TextStamp = None
+			return
+
+		if TextStamp != self.TextStamp:
+			self.Close()
+			if self.Open(TextStamp) == False:
+				try:
+					Data = self.Compile(TextStamp)
+				except Exception as Catch:
+					print(self.TextFile + " : " + str(Catch))
+					self.InitResult += "FAILED TO READ FILE: " + self.TextFile + "\n"
+					return
+				try:
+					# Write to a temporary file first, so a part written index is never opened.
+					with open(self.IndexFile + ".tmp", "wb") as ThisFile:
+						ThisFile.write(Data)
+					os.replace(self.IndexFile + ".tmp", self.IndexFile)
+					if self.Open(TextStamp) == False:
+						self.SetData(Data)
+				except Exception as Catch:
+					# When the index can't be saved, such as a read only SD card, use it from memory.
+					print(self.IndexFile + " : " + str(Catch))
+					self.SetData(Data)
+			self.TextStamp = TextStamp
+
+
+
+#/************************************************************/
+#/* Memory map the compiled index, if it was compiled from   */
+#/* the text file as it is now. Return False when it wasn't. */
+#/************************************************************/
+	def Open(self, TextStamp):
+		Result = False
+		try:
+			with open(self.IndexFile, "rb") as ThisFile:
+				Data = mmap.mmap(ThisFile.fileno(), 0, access = mmap.ACCESS_READ)
+			Magic, MTime, Size, Count, Width = INDEX_HEADER.unpack_from(Data, 0)
+			if Magic == INDEX_MAGIC and (MTime, Size) == TextStamp:
+				self.SetData(Data)
+				Result = True
+			else:
+				Data.close()
+		except Exception:
+			pass
+		return Result
+
+
+
+#/****************************************/
+#/* Release the memory map of the index. */
+#/****************************************/
+	def Close(self):
+		if type(self.Data) is mmap.mmap:
+			self.Data.close()
+		self.Data = b''
+		self.Count = 0
+
+
+
+#/************************************************************/
+#/* Compile the text file into an index, each line being a   */
+#/* trouble code and its description. When a trouble code is */
+#/* repeated, the last description is used, as the text file */
+#/* was read before.                                         */
+#/************************************************************/
+	def Compile(self, TextStamp):
+		Descriptions = {}
+		with open(self.TextFile) as ThisFile:
+			for ThisLine in ThisFile:
+				Code, Description = ThisLine.partition(" ")[::2]
+				if Code.strip() != "":
+					Descriptions[Code] = Description.strip()
+		Codes = sorted(Descriptions)
+		Width = max([ len(Code.encode()) for Code in Codes ] + [ 1 ])
+		Blob = bytearray()
+		Offsets = bytearray()
+		for Code in Codes:
+			Offsets += INDEX_OFFSET.pack(len(Blob))
+			Blob += Descriptions[Code].encode()
+		Offsets += INDEX_OFFSET.pack(len(Blob))
+		CodeData = b''.join(Code.encode().ljust(Width, b'\0') for Code in Codes)
+		return INDEX_HEADER.pack(INDEX_MAGIC, TextStamp[0], TextStamp[1], len(Codes), Width) + CodeData + bytes(Offsets) + bytes(Blob)
+
+
+
+#/***********************************************************/
+#/* Use the data of a compiled index, memory mapped or not. */
+#/***********************************************************/
+	def SetData(self, Data):
+		Magic, MTime, Size, self.Count, self.Width = INDEX_HEADER.unpack_from(Data, 0)
+		self.Data = Data
+		self.OffsetsStart = INDEX_HEADER.size + self.Count * self.Width
+		self.DescriptionsStart = self.OffsetsStart + (self.Count + 1) * INDEX_OFFSET.size
+
+
+
+#/****************************************************************/
+#/* Get the number of trouble codes in this index, not the base. */
+#/****************************************************************/
+	def GetCount(self):
+		return self.Count
+
+
+
+#/***********************************************************/
+#/* Find a trouble code in this index by binary search over */
+#/* the sorted trouble codes. Return its position, or -1.   */
+#/***********************************************************/
+	def Find(self, Code):
+		Key = Code.encode()
+		if len(Key) <= self.Width:
+			Key = Key.ljust(self.Width, b'\0')
+			Low = 0
+			High = self.Count
+			while Low < High:
+				Middle = (Low + High) // 2
+				Start = INDEX_HEADER.size + Middle * self.Width
+				ThisCode = self.Data[Start:Start + self.Width]
+				if ThisCode < Key:
+					Low = Middle + 1
+				elif ThisCode > Key:
+					High = Middle
+				else:
+					return Middle
+		return -1
+
+
+
+#/*************************************************************/
+#/* Get the description of a trouble code, from this index or */
+#/* else the base index. Return Default when not found.       */
+#/*************************************************************/
+	def get(self, Code, Default = None):
+		Position = self.Find(Code)
+		if Position != -1:
+			Start = INDEX_OFFSET.unpack_from(self.Data, self.OffsetsStart + Position * INDEX_OFFSET.size)[0]
+			End = INDEX_OFFSET.unpack_from(self.Data, self.OffsetsStart + (Position + 1) * INDEX_OFFSET.size)[0]
+			return str(self.Data[self.DescriptionsStart + Start:self.DescriptionsStart + End], 'utf-8')
+		elif self.Base != None:
+			return self.Base.get(Code, Default)
+		return Default
+
+
+
+#/*************************************************************/
+#/* Check for a trouble code, in this index or the base index */
+#/* as with the dictionary of descriptions used before.       */
+#/*************************************************************/
+	def __contains__(self, Code):
+		return self.Find(Code) != -1 or (self.Base != None and Code in self.Base)
+
+
+
+#/***********************************************************/
+#/* Get the description of a trouble code, raising KeyError */
+#/* when not found, as with the dictionary used before.     */
+#/***********************************************************/
+	def __getitem__(self, Code):
+		Result = self.get(Code)
+		if Result == None:
+			raise KeyError(Code)
+		return Result
@@ -0,0 +1,136 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#/***************************************************************************/
+#/* Raspberry Pi ELM327 OBBII CAN BUS Diagnostic Software.                  */
+#/*                                                                         */
+#/* (C) Jason Birch 2018-05-15 V1.04                                        */
+#/*                                                                         */
+#/* Class: TroubleCodeSweep                                                 */
+#/* An unchangeable, timestamped set of the stored, pending and permanent   */
+#/* trouble codes of every ECU which answered, read in one pass. One sweep  */
+#/* is shared by the trouble tab and the PDF report, so both show the same  */
+#/* trouble codes without asking the ECUs again.                            */
+#/***************************************************************************/
+
+
+
+import time
+
+
+
+# Kinds of trouble code, by the OBDII mode they are read with.
+KIND_STORED = "STORED"
+KIND_PENDING = "PENDING"
+KIND_PERMANENT = "PERMANENT"
+KINDS = [ KIND_STORED, KIND_PENDING, KIND_PERMANENT ]
+
+# Trouble code fields.
+CODE_ECU = 0
+CODE_KIND = 1
+CODE_CODE = 2
+CODE_DESCRIPTION = 3
+
+
+
+class TroubleCodeSweep:
+	def __init__(self, Codes, ThisTime = None, EndTime = None):
+		if ThisTime == None:
+			ThisTime = time.time()
+		if EndTime == None:
+			EndTime = ThisTime
+		# Trouble codes are held as tuples, so they can't be changed once read.
+		ThisCodes = tuple(tuple(ThisCode) for ThisCode in Codes)
+		Ecus = ()
+		for ThisCode in ThisCodes:
+			if ThisCode[CODE_ECU] not in Ecus:
+				Ecus += (ThisCode[CODE_ECU],)
+		object.__setattr__(self, "Time", ThisTime)
+		object.__setattr__(self, "EndTime", EndTime)
+		object.__setattr__(self, "Codes", ThisCodes)
+		object.__setattr__(self, "Ecus", Ecus)
+
+
+
+#/***************************************/
+#/* Sweeps can't be changed once taken. */
+#/***************************************/
+	def __setattr__(self, Name, Value):
+		raise AttributeError("TROUBLE CODE SWEEP CAN NOT BE CHANGED")
+
+
+
+#/*******************************************/
+#/* Nor can any of their values be removed. */
+#/*******************************************/
+	def __delattr__(self, Name):
+		raise AttributeError("TROUBLE CODE SWEEP CAN NOT BE CHANGED")
+
+
+
+#/******************************************************************/
+#/* Get the time this sweep was taken, in seconds since the epoch. */
+#/******************************************************************/
+	def GetTime(self):
+		return self.Time
+
+
+
+#/***********************************************************/
+#/* Get the number of seconds taken to read all the trouble */
+#/* codes in this sweep.                                    */
+#/***********************************************************/
+	def GetWindow(self):
+		return self.EndTime - self.Time
+
+
+
+#/***********************************************************/
+#/* Get the ECUs which reported trouble codes, in the order */
+#/* they answered. Without headers the ECU is unknown, "".  */
+#/***********************************************************/
+	def GetEcus(self):
+		return self.Ecus
+
+
+
+#/***************************************************************/
+#/* Get the ECU, kind, code and description of each trouble     */
+#/* code, optionally only those of one kind, in the order read. */
+#/***************************************************************/
+	def GetCodes(self, Kind = None):
+		return tuple(ThisCode for ThisCode in self.Codes if Kind == None or ThisCode[CODE_KIND] == Kind)
+
+
+
+#/**************************************************************/
+#/* Get the trouble codes of one kind with their descriptions, */
+#/* in the same form as ELM327.GetTroubleCodeData, any ECU.    */
+#/**************************************************************/
+	def GetCodeData(self, Kind):
+		return { ThisCode[CODE_CODE] : ThisCode[CODE_DESCRIPTION] for ThisCode in self.GetCodes(Kind) }
+
+
+
+#/************************************************************/
+#/* Get the trouble codes of one kind as text lines, sorted, */
+#/* each followed by the ECU which reported it, when known.  */
+#/************************************************************/
+	def GetText(self, Kind):
+		Result = ""
+		for ThisCode in sorted(self.GetCodes(Kind), key = lambda ThisCode: (ThisCode[CODE_CODE], ThisCode[CODE_ECU])):
+			Result += ThisCode[CODE_CODE] + " " + ThisCode[CODE_DESCRIPTION]
+			if ThisCode[CODE_ECU] != "":
+				Result += " [ECU " + ThisCode[CODE_ECU] + "]"
+			Result += "\n"
+		return Result
@@ -0,0 +1,122 @@
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#/***************************************************************************/
+#/* Raspberry Pi ELM327 OBBII CAN BUS Diagnostic Software.                  */
+#/*                                                                         */
+#/* (C) Jason Birch 2018-05-15 V1.04                                        */
+#/*                                                                         */
+#/* Class: VehicleIdentity                                                  */
+#/* Mode 09 vehicle information of each vehicle seen, such as the VIN,      */
+#/* calibration IDs, CVNs and ECU name, kept on disk by VIN. These don't    */
+#/* change between sessions, so are read from the ECU once. The Mode 01     */
+#/* supported PIDs of each vehicle are kept with them, when these differ on */
+#/* connecting again the Mode 09 values are read again.                     */
+#/***************************************************************************/
+
+
+
+import os
+
+
+
+# Key of the Mode 01 supported PIDs of a vehicle.
+KEY_BITMAP = "BITMAP"
+
+# Type of each cached value, the Mode 09 message counts are numbers.
+TYPE_INTEGER = "I"
+TYPE_STRING = "S"
+
+
+
+class VehicleIdentity:
+	def __init__(self, CacheFile = "CONFIG/VEHICLES.CFG"):
+		self.CacheFile = CacheFile
+		# Mode 01 supported PIDs of each vehicle.
+		self.Bitmaps = {}
+		# Mode 09 values of each vehicle, by PID.
+		self.Vehicles = {}
+
+		# Each line is the VIN, then the key, or the PID, type and value.
+		try:
+			if os.path.isfile(self.CacheFile):
+				with open(self.CacheFile) as ThisFile:
+					for ThisLine in ThisFile:
+						Fields = ThisLine.rstrip("\n").split(" ", 3)
+						if len(Fields) > 2 and Fields[1] == KEY_BITMAP:
+							self.Bitmaps[Fields[0]] = Fields[2]
+						elif len(Fields) > 3:
+							Value = Fields[3]
+							if Fields[2] == TYPE_INTEGER:
+								Value = int(Value)
+							self.Vehicles.setdefault(Fields[0], {})[Fields[1]] = Value
+		except Exception as Catch:
+			print(self.CacheFile + " : " + str(Catch))
+			self.Bitmaps = {}
+			self.Vehicles = {}
+
+
+
+#/**********************************************************/
+#/* Get the Mode 01 supported PIDs of a vehicle, as        */
+#/* kept with its Mode 09 values, or None when the vehicle */
+#/* has not been seen before.                              */
+#/**********************************************************/
+	def GetBitmap(self, Vin):
+		return self.Bitmaps.get(Vin)
+
+
+
+#/*************************************************************/
+#/* Get a copy of the Mode 09 values of a vehicle, by PID, or */
+#/* None when the vehicle has not been seen before.           */
+#/*************************************************************/
+	def GetValues(self, Vin):
+		Result = None
+		if Vin in self.Vehicles:
+			Result = dict(self.Vehicles[Vin])
+		return Result
+
+
+
+#/*************************************************************/
+#/* Keep the Mode 01 supported PIDs and Mode 09 values of the */
+#/* vehicle connected to, and save to disk when anything has  */
+#/* changed.                                                  */
+#/*************************************************************/
+	def SetValues(self, Vin, Bitmap, Values):
+		if self.Bitmaps.get(Vin) != Bitmap or self.Vehicles.get(Vin) != Values:
+			self.Bitmaps[Vin] = Bitmap
+			self.Vehicles[Vin] = dict(Values)
+			self.Save()
+
+
+
+#/*******************************************************/
+#/* Save the vehicles to disk, writing a temporary file */
+#/* first so a part written file is never read.         */
+#/*******************************************************/
+	def Save(self):
+		try:
+			with open(self.CacheFile + ".tmp", "w") as ThisFile:
+				for Vin in sorted(self.Vehicles):
+					ThisFile.write(Vin + " " + KEY_BITMAP + " " + self.Bitmaps.get(Vin, "") + "\n")
+					for PID in sorted(self.Vehicles[Vin]):
+						Value = self.Vehicles[Vin][PID]
+						if type(Value) is int:
+							ThisFile.write(Vin + " " + PID + " " + TYPE_INTEGER + " " + str(Value) + "\n")
+						else:
+							ThisFile.write(Vin + " " + PID + " " + TYPE_STRING + " " + str(Value).replace("\n", " ") + "\n")
+			os.replace(self.CacheFile + ".tmp", self.CacheFile)
+		except Exception as Catch:
+			print(self.CacheFile + " : " + str(Catch))